@@ -0,0 +1,337 @@
+from collections import OrderedDict
+
+from bitboard import board_hash, zobrist_keys
+from engine import GRID_HEIGHT, GRID_WIDTH, PIECE_TABLE
+from pieces import ROTATIONS
+
+# 内置 AI：枚举当前方块和下一个方块所有可到达的 (旋转状态, 列)，
+# 用常见的四项启发式（总高度、空洞、凹凸度、消行数）给结果棋盘打分，取最高的
+# 棋盘只用行位掩码、列高度和空洞数表示，候选位置的特征增量计算，不复制 Tetris.grid
+# 棋盘用与 BitBoard 相同的 Zobrist 哈希标识，已展开过的 (棋盘, 方块) 直接复用
+# 不缓存单个候选棋盘的得分：两层搜索中不同分支很少得到相同的棋盘，查表比增量计算还慢
+
+# 启发式权重（Yiyuan Lee 用遗传算法调出的一组常用参数）
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+
+FULL = (1 << GRID_WIDTH) - 1
+BEAM_WIDTH = 3  # 第一层只展开得分最高的几个位置去搜索下一个方块
+MAX_EXPANSIONS = 64  # (棋盘哈希, 方块) -> 展开结果，只需覆盖上一步展开过的棋盘
+KEYS = zobrist_keys(GRID_WIDTH, GRID_HEIGHT)
+
+
+def build_placements():
+    # PLACEMENTS[kind][rotation] -> (state, bottoms, tops, rows, columns)
+    # tops: 每列最高格子的 (dx, dy)；rows: 非空行的 (dy, mask)
+    # columns: 按列从左到右的 (dx, 最高格子的 dy, 最低格子的 dy)，方块占用的列总是连续的
+    table = []
+    for states in PIECE_TABLE:
+        entries = []
+        for state in states:
+            tops = {}
+            for dx, dy in state.cells:
+                tops[dx] = min(tops.get(dx, dy), dy)
+            rows = tuple((dy, mask) for dy, mask in enumerate(state.masks) if mask)
+            tops = tuple(sorted(tops.items()))
+            columns = tuple((dx, top, bottom) for (dx, top), (_, bottom) in zip(tops, state.bottoms))
+            entries.append((state, state.bottoms, tops, rows, columns))
+        table.append(tuple(entries))
+    return tuple(table)
+
+
+PLACEMENTS = build_placements()
+
+
+def build_distinct_rotations():
+    # 形状完全相同的旋转状态（O 的全部、I/S/Z 的后两个）放在同一列得到的棋盘相同，只枚举第一个
+    table = []
+    for states in PIECE_TABLE:
+        shapes = []
+        rotations = []
+        for rotation, state in enumerate(states):
+            if state.shape not in shapes:
+                rotations.append(rotation)
+            shapes.append(state.shape)
+        table.append(frozenset(rotations))
+    return tuple(table)
+
+
+DISTINCT_ROTATIONS = build_distinct_rotations()
+
+
+def collides(rows, state, x, y):
+    # 与 BitBoard.collides 相同，但作用在任意的行列表上
+    if x + state.left < 0 or x + state.right >= GRID_WIDTH:
+        return True
+    for i, mask in enumerate(state.masks):
+        if mask:
+            row = y + i
+            if row >= GRID_HEIGHT or (row >= 0 and rows[row] & (mask << x)):
+                return True
+    return False
+
+
+def board_features(rows):
+    # 从头计算列高度和空洞数（列顶之下的空格）
+    heights = [0] * GRID_WIDTH
+    holes = 0
+    covered = 0  # 已经出现过方块的列
+    for i, row in enumerate(rows):
+        new = row & ~covered
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = GRID_HEIGHT - i
+            new ^= low
+        covered |= row
+        # 已被覆盖但这一行为空的列都是空洞
+        holes += bin(covered & ~row).count('1')
+    return heights, holes
+
+
+def board_score(heights, holes):
+    # 启发式中只取决于棋盘的部分；总分再加上 LINES_WEIGHT * 消行数
+    aggregate = 0
+    bumpiness = 0
+    previous = heights[0]
+    for height in heights:
+        aggregate += height
+        bumpiness += abs(height - previous)
+        previous = height
+    return HEIGHT_WEIGHT * aggregate + HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness
+
+
+def reachable(rows, kind):
+    # 按游戏的操作方式枚举可到达的位置：在出生行依次旋转，再左右移动，最后硬降
+    # 出生区域为空时所有位置都可到达，不必逐个检查
+    # 重复的旋转状态仍要检查能否转过去，但不再产生位置
+    spawn_x = PIECE_TABLE[kind][0].spawn_x
+    distinct = DISTINCT_ROTATIONS[kind]
+    if not (rows[0] | rows[1] | rows[2] | rows[3]):
+        for rotation, entry in enumerate(PLACEMENTS[kind]):
+            if rotation in distinct:
+                state = entry[0]
+                for x in range(-state.left, GRID_WIDTH - state.right):
+                    yield rotation, x
+        return
+    for rotation in range(ROTATIONS):
+        state = PIECE_TABLE[kind][rotation]
+        if collides(rows, state, spawn_x, 0):
+            # rotate_piece 在这里会失败，之后的旋转状态都到不了
+            return
+        if rotation not in distinct:
+            continue
+        yield rotation, spawn_x
+        x = spawn_x - 1
+        while not collides(rows, state, x, 0):
+            yield rotation, x
+            x -= 1
+        x = spawn_x + 1
+        while not collides(rows, state, x, 0):
+            yield rotation, x
+            x += 1
+
+
+def place(rows, heights, holes, kind, rotation, x):
+    # 把方块从出生行硬降到第 x 列，返回 (rows, heights, holes, lines)，放不下时返回 None
+    # 方块落在所有列顶之上时只更新它覆盖的列；消行或卡在悬空部分下时重新计算
+    state, bottoms, tops, masks, _ = PLACEMENTS[kind][rotation]
+    y = landing_y(heights, bottoms, x)
+    if y < 0:
+        y = scan_landing_y(rows, state, x)
+        if y is None:
+            return None
+        rows = list(rows)
+        for dy, mask in masks:
+            rows[y + dy] |= mask << x
+        new_rows = [row for row in rows if row != FULL]
+        lines = GRID_HEIGHT - len(new_rows)
+        rows = [0] * lines + new_rows
+        heights, holes = board_features(rows)
+        return rows, heights, holes, lines
+
+    rows = list(rows)
+    lines = 0
+    for dy, mask in masks:
+        row = rows[y + dy] | (mask << x)
+        rows[y + dy] = row
+        if row == FULL:
+            lines += 1
+    if lines:
+        new_rows = [row for row in rows if row != FULL]
+        rows = [0] * lines + new_rows
+        new_heights, holes = board_features(rows)
+        return rows, new_heights, holes, lines
+    new_heights, holes = stack_features(heights, holes, bottoms, tops, x, y)
+    return rows, new_heights, holes, 0
+
+
+def landing_y(heights, bottoms, x):
+    # 按列高度计算的落点；小于 0 表示方块已经低于某列的列顶
+    y = GRID_HEIGHT
+    for dx, dy in bottoms:
+        candidate = GRID_HEIGHT - 1 - heights[x + dx] - dy
+        if candidate < y:
+            y = candidate
+    return y
+
+
+def scan_landing_y(rows, state, x):
+    # 方块卡在悬空部分之下时只能逐行下落；出生行就放不下时返回 None
+    if collides(rows, state, x, 0):
+        return None
+    y = 0
+    while not collides(rows, state, x, y + 1):
+        y += 1
+    return y
+
+
+def stack_features(heights, holes, bottoms, tops, x, y):
+    # 不消行且落在列顶之上时，只有方块覆盖的列会变化
+    new_heights = list(heights)
+    for (dx, top), (_, bottom) in zip(tops, bottoms):
+        column = x + dx
+        # 方块在每列的格子是连续的，它与原列顶之间的空格都成为空洞
+        holes += GRID_HEIGHT - heights[column] - (y + bottom) - 1
+        new_heights[column] = GRID_HEIGHT - (y + top)
+    return new_heights, holes
+
+
+class TranspositionTable:
+    # 有上限的 LRU 表，记录命中、未命中和淘汰次数
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class AutoPlayer:
+    def __init__(self, beam_width=BEAM_WIDTH, max_expansions=MAX_EXPANSIONS):
+        self.beam_width = beam_width
+        # (棋盘哈希, 方块种类) -> 按得分从高到低排序的 [(得分, rotation, x, lines)]
+        # 本步选中的位置就是下一步的棋盘，所以下一步的第一层可以直接复用
+        self.expansions = TranspositionTable(max_expansions)
+
+    def expand(self, rows, heights, holes, value, kind):
+        key = (value, kind)
+        options = self.expansions.get(key)
+        if options is not None:
+            return options
+        options = []
+        # 父棋盘的总高度和凹凸度，不消行的候选只需修正方块附近的几列
+        aggregate = sum(heights)
+        bumpiness = 0
+        for i in range(GRID_WIDTH - 1):
+            bumpiness += abs(heights[i + 1] - heights[i])
+        for rotation, x in reachable(rows, kind):
+            _, bottoms, _, masks, columns = PLACEMENTS[kind][rotation]
+            y = GRID_HEIGHT
+            for dx, dy in bottoms:
+                candidate = GRID_HEIGHT - 1 - heights[x + dx] - dy
+                if candidate < y:
+                    y = candidate
+            lines = 0
+            if y >= 0:
+                for dy, mask in masks:
+                    if rows[y + dy] | (mask << x) == FULL:
+                        lines += 1
+            if y < 0 or lines:
+                result = place(rows, heights, holes, kind, rotation, x)
+                if result is None:
+                    continue
+                score = board_score(result[1], result[2])
+                lines = result[3]
+            else:
+                # 一次扫过方块覆盖的列，同时修正总高度、空洞和与左右相邻列之间的凹凸度
+                new_aggregate = aggregate
+                new_holes = holes
+                new_bumpiness = bumpiness
+                left = x + columns[0][0]
+                old = new = heights[left - 1] if left > 0 else None
+                for dx, top, bottom in columns:
+                    height = heights[x + dx]
+                    # 方块在每列的格子是连续的，它与原列顶之间的空格都成为空洞
+                    new_holes += GRID_HEIGHT - 1 - y - bottom - height
+                    new_height = GRID_HEIGHT - y - top
+                    new_aggregate += new_height - height
+                    if old is not None:
+                        new_bumpiness += abs(new_height - new) - abs(height - old)
+                    old = height
+                    new = new_height
+                right = x + columns[-1][0] + 1
+                if right < GRID_WIDTH:
+                    height = heights[right]
+                    new_bumpiness += abs(height - new) - abs(height - old)
+                score = (HEIGHT_WEIGHT * new_aggregate + HOLES_WEIGHT * new_holes +
+                         BUMPINESS_WEIGHT * new_bumpiness)
+            options.append((score + LINES_WEIGHT * lines, rotation, x, lines))
+        options.sort(key=lambda option: -option[0])
+        self.expansions.put(key, options)
+        return options
+
+    def choose(self, game):
+        # 返回当前方块的 (rotation, x)；没有可放的位置时返回 None
+        board = game.board
+        kind = game.current_piece.kind
+        _, holes = board_features(board.rows)
+        options = self.expand(board.rows, board.heights, holes, board.hash, kind)
+        if not options:
+            return None
+        next_kind = game.next_piece.kind
+        best = None
+        for option in options[:self.beam_width]:
+            first_score, rotation, x, lines = option
+            new_rows, new_heights, new_holes, _ = place(board.rows, board.heights, holes, kind, rotation, x)
+            # 第二层也经过缓存：选中的那个棋盘就是下一步要评估的棋盘
+            replies = self.expand(new_rows, new_heights, new_holes, board_hash(KEYS, new_rows), next_kind)
+            if replies:
+                # 得分对消行数是线性的，加上第一层的消行即为两层的总分
+                score = replies[0][0] + LINES_WEIGHT * lines
+            else:
+                # 下一个方块放不下，只看这一层
+                score = first_score - 1000
+            if best is None or score > best[0]:
+                best = (score, rotation, x)
+        return best[1], best[2]
+
+    def stats(self):
+        return {'expansions': self.expansions.stats()}
+
+
+def ai_policy(game, rng):
+    # 供 simulate.py 使用的策略；每个进程共用一个 AutoPlayer
+    move = _player.choose(game)
+    if move is None:
+        return game.current_piece.rotation, game.current_piece.x
+    return move
+
+
+_player = AutoPlayer()
@@ -0,0 +1,209 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pygame
+
+from profiler import profiler
+
+# 候选中文字体，按顺序使用第一个存在的文件
+FONT_CANDIDATES = [
+    "C:/Windows/Fonts/msyh.ttc",  # Windows 微软雅黑
+    "/System/Library/Fonts/PingFang.ttc",  # macOS 苹方字体
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",  # Linux Noto
+]
+
+
+def find_font_path():
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+FONT_PATH = find_font_path()
+
+MUSIC_PATH = 'assets/music/background.mp3'
+# 音效名 -> (文件, 音量)
+SOUNDS = {
+    'score': ('assets/sound/score.wav', 0.3),
+}
+
+# 字体样式 -> (使用中文字体时的字号, 使用默认字体时的字号)
+FONT_STYLES = {
+    'big': (36, 48),      # 主菜单标题
+    'small': (24, 28),    # 主菜单选项
+    'title': (24, 32),    # 游戏结束标题
+    'normal': (20, 24),   # 信息栏、菜单和排行榜
+    'hint': (14, 16),     # 提示文字
+}
+
+
+class FontRegistry:
+    # 字体只从磁盘加载一次；渲染好的文字按 (文字, 样式, 颜色) 放入有上限的 LRU 缓存
+    def __init__(self, font_path, max_texts=256):
+        self.font_path = font_path
+        self.max_texts = max_texts
+        self.fonts = {}
+        self.texts = OrderedDict()
+        self.font_loads = 0  # 读取字体文件的次数
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, style):
+        font = self.fonts.get(style)
+        if font is None:
+            with profiler.phase('font'):
+                font = self.load(style)
+            self.font_loads += 1
+            self.fonts[style] = font
+        return font
+
+    def load(self, style):
+        size, fallback_size = FONT_STYLES[style]
+        if self.font_path:
+            try:
+                return pygame.font.Font(self.font_path, size)
+            except (OSError, pygame.error):
+                print(f"无法加载字体 {self.font_path}，改用默认字体")
+                self.font_path = None
+        return pygame.font.Font(None, fallback_size)
+
+    def render(self, text, style, color):
+        # 返回的 Surface 是共享的，调用者只能读取或绘制，不能修改
+        key = (text, style, color)
+        surface = self.texts.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.texts.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.get(style).render(text, True, color)
+        self.texts[key] = surface
+        if len(self.texts) > self.max_texts:
+            self.texts.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def stats(self):
+        return {
+            'font_loads': self.font_loads,
+            'text_hits': self.hits,
+            'text_misses': self.misses,
+            'text_evictions': self.evictions,
+            'cached_texts': len(self.texts),
+        }
+
+
+fonts = FontRegistry(FONT_PATH)
+
+
+class AudioRegistry:
+    # 音效文件在后台线程读入内存，不阻塞第一帧；后台线程不调用 SDL
+    # 混音器由主线程在空闲时调用 prepare() 初始化（SDL 不支持在其它线程初始化音频的同时使用视频和事件），
+    # 初始化后把读好的文件解码成 Sound，在各局之间共用；play() 只播放已经解码好的音效，游戏中不做初始化
+    # 背景音乐默认关闭，第一次打开时才加载
+    def __init__(self, sounds=SOUNDS, music_path=MUSIC_PATH):
+        self.sound_files = sounds
+        self.music_path = music_path
+        self.data = {}  # 后台线程读入的音效文件内容
+        self.sounds = {}
+        self.mixer_ready = False
+        self.mixer_failed = False
+        self.music_loaded = False
+        self.loaded = threading.Event()
+        self.thread = None
+        self.load_time = None  # 后台读文件耗时（秒）
+        self.init_time = None  # 主线程初始化混音器并解码的耗时（秒）
+
+    def start(self):
+        # 开始后台读取；重复调用不会重复读取
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.load, name='audio-loader', daemon=True)
+            self.thread.start()
+
+    def load(self):
+        start = time.perf_counter()
+        for name, (path, _) in self.sound_files.items():
+            try:
+                with open(path, 'rb') as f:
+                    self.data[name] = f.read()
+            except OSError:
+                print("无法加载音效文件")
+        self.load_time = time.perf_counter() - start
+        self.loaded.set()
+
+    def init_mixer(self):
+        # 只在主线程调用；音效文件读完之后才初始化，失败后不再重试
+        if self.mixer_ready or self.mixer_failed:
+            return self.mixer_ready
+        if not self.loaded.is_set():
+            return False
+        start = time.perf_counter()
+        try:
+            pygame.mixer.init()
+            self.mixer_ready = True
+        except pygame.error:
+            print("无法初始化音乐系统")
+            self.mixer_failed = True
+            return False
+        for name, data in self.data.items():
+            try:
+                sound = pygame.mixer.Sound(file=io.BytesIO(data))
+            except pygame.error:
+                print("无法加载音效文件")
+                continue
+            sound.set_volume(self.sound_files[name][1])
+            self.sounds[name] = sound
+        self.data.clear()
+        self.init_time = time.perf_counter() - start
+        return True
+
+    def prepare(self):
+        # 在主线程的空闲时刻调用（主菜单第一帧显示之后），等后台读完音效文件再初始化混音器并解码
+        self.start()
+        self.loaded.wait()
+        return self.init_mixer()
+
+    def play(self, name):
+        # 还没准备好时这次不播放
+        if self.mixer_ready:
+            sound = self.sounds.get(name)
+            if sound is not None:
+                sound.play()
+
+    def set_music(self, on):
+        # 开关音乐是玩家的操作，可以等后台读完音效文件
+        if not self.prepare():
+            print("无法控制音乐")
+            return
+        try:
+            if on:
+                if not self.music_loaded:
+                    pygame.mixer.music.load(self.music_path)
+                    self.music_loaded = True
+                pygame.mixer.music.play(-1)  # 每次打开都从头播放
+            else:
+                pygame.mixer.music.pause()
+        except pygame.error:
+            print("无法控制音乐")
+
+    def close(self, timeout=1):
+        # 在 pygame.quit() 之前调用，等后台线程结束，避免退出时它还在读文件
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'mixer_ready': self.mixer_ready,
+            'sounds': len(self.sounds),
+            'music_loaded': self.music_loaded,
+            'load_ms': None if self.load_time is None else round(self.load_time * 1000, 1),
+            'init_ms': None if self.init_time is None else round(self.init_time * 1000, 1),
+        }
+
+
+audio = AudioRegistry()
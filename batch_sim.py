@@ -0,0 +1,391 @@
+import numpy as np
+
+from engine import FALL_SPEEDS, GRID_HEIGHT, GRID_WIDTH, PIECE_TABLE, SCORE_MULTIPLIERS
+from pieces import ROTATIONS
+from randomizer import Randomizer
+from simulate import INPUT_MS
+
+# 用 NumPy 同时模拟大量棋盘，用于平衡难度参数
+# 棋盘按位压缩保存为 (N, GRID_HEIGHT) 的 uint16 数组（第 j 位对应第 j 列），
+# 落点、固定和消行都对整批棋盘做数组运算
+# 每一步每个棋盘放置一个方块：策略给出 (旋转状态, 列)，与 simulate.play_move 相同，
+# 方块先旋转再逐列平移，每次按键经过 input_ms 的重力时间，最后硬降；
+# 出生、固定、消行和出生碰撞结束游戏的顺序与 TetrisEngine 一致，test_batch_sim.py 逐步对比两者
+
+KINDS = len(PIECE_TABLE)
+
+# 每个旋转状态允许的最小和最大列坐标
+MIN_X = np.array([[-state.left for state in states] for states in PIECE_TABLE], dtype=np.int64)
+MAX_X = np.array([[GRID_WIDTH - 1 - state.right for state in states] for states in PIECE_TABLE],
+                 dtype=np.int64)
+FULL = (1 << GRID_WIDTH) - 1
+COLUMN_BITS = (1 << np.arange(GRID_WIDTH)).astype(np.uint16)
+ROW_NUMBERS = np.arange(GRID_HEIGHT)[:, None]
+
+# 各难度的重力下落间隔（毫秒），与 TetrisEngine.gravity_interval 相同
+GRAVITY_INTERVALS = np.array([max(1, round(FALL_SPEEDS[d] * 1000)) for d in sorted(FALL_SPEEDS)])
+
+# 以 kind * ROTATIONS + rotation 为下标的扁平表，减少花式索引的维数
+MIN_X_FLAT = MIN_X.reshape(-1)
+MAX_X_FLAT = MAX_X.reshape(-1)
+LEFT = -MIN_X_FLAT
+
+
+def pad4(items):
+    # 不足 4 项时重复第一项补齐：重复的下标写入相同的值，可以一次花式赋值完成
+    return list(items) + [items[0]] * (4 - len(items))
+
+
+def build_step_table():
+    # STEP_TABLE[:, :, index] 是 (6, 4) 的表，一次取出 step 需要的所有偏移：
+    # 0/1: 每列最低格子的 dx 和 GRID_HEIGHT - 1 - dy，决定落点
+    # 2/3: 每列最高格子的 dx 和 GRID_HEIGHT - dy，决定固定后的列高度
+    # 4/5: 每个非空行的 dy 和右移 left 位后的行掩码
+    # 下标放在最后一维：取出的 (6, 4, M) 数组每一行是连续的，4 项之间的取最小值等运算都是整行的逐元素运算
+    # 所有偏移都小于 128，用 int8 保存，花式取值搬运的数据最少
+    table = []
+    for states in PIECE_TABLE:
+        for state in states:
+            tops = {}
+            for dx, dy in state.cells:
+                tops[dx] = min(tops.get(dx, dy), dy)
+            rows = [(dy, mask >> state.left) for dy, mask in enumerate(state.masks) if mask]
+            table.append([
+                pad4([dx for dx, _ in state.bottoms]),
+                pad4([GRID_HEIGHT - 1 - dy for _, dy in state.bottoms]),
+                pad4(sorted(tops)),
+                pad4([GRID_HEIGHT - tops[dx] for dx in sorted(tops)]),
+                pad4([dy for dy, _ in rows]),
+                pad4([mask for _, mask in rows]),
+            ])
+    return np.ascontiguousarray(np.array(table, dtype=np.int8).transpose(1, 2, 0))
+
+
+STEP_TABLE = build_step_table()
+
+# 出生位置的列坐标和前两行的位掩码，用于快速判断新方块是否被挡住
+SPAWN_X = np.array([states[0].spawn_x for states in PIECE_TABLE], dtype=np.int64)
+SPAWN_MASKS = np.zeros((KINDS, 2), dtype=np.uint16)
+for _kind, _states in enumerate(PIECE_TABLE):
+    for _row, _mask in enumerate(_states[0].masks):
+        SPAWN_MASKS[_kind, _row] = _mask << _states[0].spawn_x
+
+
+def build_drop_table():
+    # DROP_TABLE[kind] -> [(最小列, 列数, [(dx, 常数)], 编号)]
+    # 方块放在第 x 列时最低格子的行号 = min(常数 - heights[x + dx])，
+    # 对同一旋转状态的所有列可以用 heights 的切片一次算出
+    # 每种方块的所有 (旋转状态, 列) 先按旋转状态再按列编号为 p，比较的键是 行号 * 64 + 63 - p：
+    # 最大的键就是落点最低、相同时编号最小的位置；编号 p 对应的旋转状态和列存在 DROP_MOVES[:, kind, p]
+    table = []
+    moves = np.zeros((2, KINDS, 64), dtype=np.int64)
+    for kind, states in enumerate(PIECE_TABLE):
+        entries = []
+        first = 0
+        for rotation, state in enumerate(states):
+            bottom = max(dy for _, dy in state.cells)
+            terms = [(dx, GRID_HEIGHT - 1 - dy + bottom) for dx, dy in state.bottoms]
+            low = MIN_X[kind, rotation]
+            count = MAX_X[kind, rotation] - low + 1
+            positions = np.arange(first, first + count)
+            entries.append((low, count, terms, (63 - positions).astype(np.int16)[:, None]))
+            moves[0, kind, positions] = rotation
+            moves[1, kind, positions] = low + positions - first
+            first += count
+        table.append(entries)
+    return table, moves
+
+
+DROP_TABLE, DROP_MOVES = build_drop_table()
+
+
+class BatchSimulator:
+    def __init__(self, count, difficulty=1, seed=None, queue_size=256, input_ms=INPUT_MS, seeds=None,
+                 randomizer='random'):
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+        self.board = np.zeros((count, GRID_HEIGHT), dtype=np.uint16)
+        self.heights = np.zeros((count, GRID_WIDTH), dtype=np.int8)
+        self.difficulty = np.broadcast_to(np.asarray(difficulty, dtype=np.int64), (count,)).copy()
+        multipliers = np.array([SCORE_MULTIPLIERS[d] for d in sorted(SCORE_MULTIPLIERS)])
+        self.multiplier = multipliers[self.difficulty]
+        self.score = np.zeros(count, dtype=np.int64)
+        self.lines = np.zeros(count, dtype=np.int64)
+        self.pieces = np.zeros(count, dtype=np.int64)
+        self.game_over = np.zeros(count, dtype=bool)
+        # 重力与 TetrisEngine.advance 相同：每次按键推进 input_ms 毫秒，累计够一个下落间隔就下落一行
+        self.input_ms = input_ms
+        self.interval = GRAVITY_INTERVALS[self.difficulty]
+        self.gravity_accumulator = np.zeros(count, dtype=np.int64)
+        # 每个棋盘各自的方块队列，预先生成一段，用完再补
+        # 给出 seeds 时第 i 个棋盘的方块序列与 TetrisEngine(seed=seeds[i], randomizer=randomizer) 相同
+        self.randomizers = None if seeds is None else [Randomizer(KINDS, s, randomizer) for s in seeds]
+        self.queue_size = queue_size
+        self.queue = self.fresh_pieces(np.full(count, queue_size))
+        self.queue_pos = np.zeros(count, dtype=np.int64)
+        # 每个棋盘当前方块的种类、旋转状态和位置
+        self.current = self.queue[:, 0].copy()
+        self.rotation = np.zeros(count, dtype=np.int64)
+        self.x = SPAWN_X[self.current]
+        self.y = np.zeros(count, dtype=np.int64)
+
+    @property
+    def grid(self):
+        # 展开成 (N, GRID_HEIGHT, GRID_WIDTH) 的 bool 数组，便于分析
+        return (self.board[:, :, None] & COLUMN_BITS) != 0
+
+    def current_kind(self, boards):
+        return self.current[boards]
+
+    def next_kind(self, boards):
+        return self.queue[boards, self.queue_pos[boards] + 1]
+
+    def fresh_pieces(self, counts):
+        # 返回 (N, queue_size) 的新方块，第 i 行只有最后 counts[i] 个会被用到
+        if self.randomizers is None:
+            return self.rng.integers(0, KINDS, size=(self.count, self.queue_size))
+        # 按 TetrisEngine 的生成器逐个取，用不到的位置不取，保证序列不跳号
+        fresh = np.zeros((self.count, self.queue_size), dtype=np.int64)
+        for i, randomizer in enumerate(self.randomizers):
+            if counts[i]:
+                fresh[i, self.queue_size - counts[i]:] = [randomizer.next() for _ in range(counts[i])]
+        return fresh
+
+    def advance_queue(self, boards):
+        # 只有 boards 中的棋盘取下一个方块
+        self.queue_pos[boards] += 1
+        if self.queue_pos.max() + 1 >= self.queue_size:
+            # 把每个棋盘未用完的部分移到队首，尾部补充新方块
+            index = self.queue_pos[:, None] + np.arange(self.queue_size)[None, :]
+            inside = index < self.queue_size
+            kept = np.take_along_axis(self.queue, np.minimum(index, self.queue_size - 1), axis=1)
+            fresh = self.fresh_pieces(self.queue_pos)
+            self.queue = np.where(inside, kept, fresh)
+            self.queue_pos[:] = 0
+        # 返回这些棋盘新的当前方块种类
+        kinds = np.take(self.queue, boards * self.queue_size + self.queue_pos[boards])
+        self.current[boards] = kinds
+        return kinds
+
+    def active_boards(self):
+        return np.flatnonzero(~self.game_over)
+
+    def piece_index(self, boards):
+        # 当前方块在扁平表中的下标 kind * ROTATIONS + rotation
+        return self.current[boards] * ROTATIONS + self.rotation[boards]
+
+    def collides(self, boards, index, xs, ys):
+        # 与 BitBoard.collides 相同：越过左右边界、超出底部或与已有方块重叠
+        outside = (xs < np.take(MIN_X_FLAT, index)) | (xs > np.take(MAX_X_FLAT, index))
+        row_dy, row_mask = np.take(STEP_TABLE[4:], index, axis=2)
+        rows = ys + row_dy
+        below = rows >= GRID_HEIGHT
+        rows = boards * GRID_HEIGHT + np.minimum(rows, GRID_HEIGHT - 1)
+        # 越界的方块移位量可能为负，结果已由 outside 决定，只需保证移位合法
+        shift = np.maximum(xs + np.take(LEFT, index), 0)
+        overlap = np.take(self.board.reshape(-1), rows) & (row_mask << shift)
+        return outside | np.logical_or.reduce(below | (overlap != 0))
+
+    def still_moving(self, boards, placed):
+        # 方块还没被重力固定、游戏也没有结束的棋盘
+        return boards[(self.pieces[boards] == placed[boards]) & ~self.game_over[boards]]
+
+    def press(self, boards, cleared):
+        # 与 simulate.press 相同：一次按键后推进 input_ms 毫秒
+        if self.input_ms:
+            self.gravity_accumulator[boards] += self.input_ms
+            self.gravity(boards, cleared)
+
+    def gravity(self, boards, cleared):
+        # 与 TetrisEngine.advance 相同：累计时间够一个间隔就下落一行，落不下去就固定，
+        # 剩余的时间继续作用在新方块上；游戏在下落时结束则清零，不再下落
+        boards = boards[self.gravity_accumulator[boards] >= self.interval[boards]]
+        while len(boards):
+            self.gravity_accumulator[boards] -= self.interval[boards]
+            ys = self.y[boards] + 1
+            free = ~self.collides(boards, self.piece_index(boards), self.x[boards], ys)
+            self.y[boards[free]] = ys[free]
+            self.lock(boards[~free], cleared)
+            over = self.game_over[boards]
+            self.gravity_accumulator[boards[over]] = 0
+            boards = boards[~over]
+            boards = boards[self.gravity_accumulator[boards] >= self.interval[boards]]
+
+    def step(self, boards, rotations, xs):
+        # 按 simulate.play_move 的方式操作给出的未结束棋盘的当前方块：先旋转，再逐列平移到目标列，
+        # 被挡住就停下，最后硬降；每次按键后推进 input_ms 毫秒，方块可能在到达目标前就被重力固定
+        # rotations/xs 与 boards 一一对应；返回本步每个棋盘消除的行数 (N,)
+        cleared = np.zeros(self.count, dtype=np.int64)
+        placed = self.pieces.copy()
+        turns = np.zeros(self.count, dtype=np.int64)
+        turns[boards] = rotations
+        targets = np.zeros(self.count, dtype=np.int64)
+        targets[boards] = xs
+        moving = boards
+
+        # 旋转：每次转到下一个旋转状态，放不下时保持原状态，但按键照样占用时间
+        for turn in range(int(turns.max(initial=0))):
+            pressing = moving[turns[moving] > turn]
+            if not len(pressing):
+                break
+            rotation = (self.rotation[pressing] + 1) % ROTATIONS
+            index = self.current[pressing] * ROTATIONS + rotation
+            fits = ~self.collides(pressing, index, self.x[pressing], self.y[pressing])
+            self.rotation[pressing[fits]] = rotation[fits]
+            self.press(pressing, cleared)
+            moving = self.still_moving(moving, placed)
+
+        # 平移：方向在旋转之后确定，每次一列，被挡住的棋盘不再平移
+        directions = np.where(targets > self.x, 1, -1)
+        shifting = moving[self.x[moving] != targets[moving]]
+        while len(shifting):
+            xs = self.x[shifting] + directions[shifting]
+            fits = ~self.collides(shifting, self.piece_index(shifting), xs, self.y[shifting])
+            shifting = shifting[fits]
+            self.x[shifting] = xs[fits]
+            self.press(shifting, cleared)
+            shifting = self.still_moving(shifting, placed)
+            shifting = shifting[self.x[shifting] != targets[shifting]]
+        moving = self.still_moving(moving, placed)
+
+        # 硬降：与 BitBoard.landing_y 相同，先按列高度算落点，方块已在悬空部分之下时逐行下移
+        index = self.piece_index(moving)
+        bottom_dx, bottom_y = np.take(STEP_TABLE[:2], index, axis=2)  # 各为 (4, M)
+        columns = moving * GRID_WIDTH + self.x[moving]  # 方块左上角所在列在扁平 heights 中的下标
+        landing = np.minimum.reduce(bottom_y - np.take(self.heights.reshape(-1), columns + bottom_dx))
+        under = landing < self.y[moving]
+        self.y[moving[~under]] = landing[~under]
+        sliding = moving[under]
+        while len(sliding):
+            ys = self.y[sliding] + 1
+            free = ~self.collides(sliding, self.piece_index(sliding), self.x[sliding], ys)
+            sliding = sliding[free]
+            self.y[sliding] = ys[free]
+        self.lock(moving, cleared)
+        return cleared
+
+    def lock(self, boards, cleared):
+        # 固定当前方块、消行、换下一个方块并检查出生位置，顺序与 TetrisEngine.drop_piece 相同
+        if not len(boards):
+            return
+        board = self.board.reshape(-1)
+        heights = self.heights.reshape(-1)
+        index = self.piece_index(boards)
+        xs = self.x[boards]
+        ys = self.y[boards]
+        top_dx, top_height, row_dy, row_mask = np.take(STEP_TABLE[2:], index, axis=2)
+        rows = boards * GRID_HEIGHT + ys + row_dy  # 在扁平 board 中的下标
+        board[rows] |= (row_mask << (xs + np.take(LEFT, index))).astype(np.uint16)
+        # 方块可能停在悬空部分之下，列高度取原高度和方块在该列最高格子的较大值
+        columns = boards * GRID_WIDTH + xs + top_dx
+        heights[columns] = np.maximum(np.take(heights, columns), top_height - ys)
+        self.pieces[boards] += 1
+
+        # 只有方块覆盖的行可能被填满
+        full = np.logical_or.reduce(np.take(board, rows) == FULL)
+        if full.any():
+            target = boards[full]
+            # 转置成 (GRID_HEIGHT, T)，每一行是所有棋盘的同一行
+            # 按从上到下的顺序检查方块覆盖的行，满行及以上的部分整体下移一行：
+            # 下移不改变下面各行的行号，补齐用的重复行此时已换成上一行的内容，不会是满行
+            lines = self.board[target].T
+            columns = np.arange(len(target))
+            counts = np.zeros(len(target), dtype=np.int64)
+            for row in (ys + row_dy)[:, full]:
+                filled = lines[row, columns] == FULL
+                counts += filled
+                shifted = np.empty_like(lines)
+                shifted[0] = 0
+                shifted[1:] = lines[:-1]
+                lines = np.where((ROW_NUMBERS <= row) & filled, shifted, lines)
+            self.board[target] = lines.T
+            cleared[target] += counts
+            # 消行后重新计算这些棋盘的列高度：从上往下累积按位或，每列有格子的行数就是列高度
+            covered = np.bitwise_or.accumulate(lines, axis=0).astype('<u2', copy=False)
+            bits = np.unpackbits(covered.view(np.uint8).reshape(GRID_HEIGHT, -1, 2), axis=2,
+                                 bitorder='little')
+            self.heights[target] = bits.sum(axis=0, dtype=np.int8)[:, :GRID_WIDTH]
+            self.lines[target] += counts
+            # 与 TetrisEngine.clear_lines 相同的计分方式
+            self.score[target] += np.floor(counts * 100 * self.multiplier[target]).astype(np.int64)
+
+        # 换下一个方块，出生位置被占用时游戏结束
+        kinds = self.advance_queue(boards)
+        self.rotation[boards] = 0
+        self.x[boards] = SPAWN_X[kinds]
+        self.y[boards] = 0
+        spawn = np.take(SPAWN_MASKS, kinds, axis=0)
+        top = boards * GRID_HEIGHT
+        blocked = ((board[top] & spawn[:, 0]) | (board[top + 1] & spawn[:, 1])) != 0
+        self.game_over[boards[blocked]] = True
+
+    def run(self, policy, max_pieces=1000):
+        # 与 simulate.play_game 相同：每个棋盘运行到结束或达到方块数上限
+        while True:
+            boards = np.flatnonzero(~self.game_over & (self.pieces < max_pieces))
+            if not len(boards):
+                break
+            rotations, xs = policy(self, boards)
+            self.step(boards, rotations, xs)
+        return self.results()
+
+    def results(self):
+        return {
+            'score': self.score.copy(),
+            'lines': self.lines.copy(),
+            'pieces': self.pieces.copy(),
+            'difficulty': self.difficulty.copy(),
+            'game_over': self.game_over.copy(),
+        }
+
+
+# 策略接收模拟器和未结束棋盘的编号，返回对应的 (旋转状态, 列) 数组
+
+def random_policy(sim, boards):
+    # 随机选择旋转状态和列
+    kinds = sim.current_kind(boards)
+    rotations = sim.rng.integers(0, ROTATIONS, size=len(boards))
+    index = kinds * ROTATIONS + rotations
+    low = np.take(MIN_X_FLAT, index)
+    high = np.take(MAX_X_FLAT, index)
+    xs = low + (sim.rng.random(len(boards)) * (high - low + 1)).astype(np.int64)
+    return rotations, xs
+
+
+def lowest_policy(sim, boards):
+    # 在所有 (旋转状态, 列) 中选择落点最低的位置，落点相同时取旋转状态和列最小的
+    # 棋盘按方块种类排序，每种方块是连续的一段；列高度转置成 (GRID_WIDTH, M)，
+    # 每个旋转状态的所有列都是整行的切片运算，循环次数只与方块种类和旋转状态的数量有关
+    kinds = sim.current_kind(boards)
+    order = np.argsort(kinds, kind='stable')
+    kinds = kinds[order]
+    heights = np.ascontiguousarray(sim.heights[boards[order]].T, dtype=np.int16)
+    bounds = np.searchsorted(kinds, np.arange(KINDS + 1))
+    best = np.empty(len(boards), dtype=np.int16)
+    for kind, entries in enumerate(DROP_TABLE):
+        start, stop = bounds[kind], bounds[kind + 1]
+        if start == stop:
+            continue
+        group = heights[:, start:stop]
+        keys = []
+        for low, count, terms, priority in entries:
+            depth = None
+            for dx, constant in terms:
+                column = constant - group[low + dx:low + dx + count]
+                depth = column if depth is None else np.minimum(depth, column, out=depth)
+            depth *= 64
+            depth += priority
+            keys.append(depth.max(axis=0))
+        best[start:stop] = np.maximum.reduce(keys)
+    positions = 63 - (best & 63)
+    rotations = np.empty(len(boards), dtype=np.int64)
+    xs = np.empty(len(boards), dtype=np.int64)
+    rotations[order] = DROP_MOVES[0, kinds, positions]
+    xs[order] = DROP_MOVES[1, kinds, positions]
+    return rotations, xs
+
+
+POLICIES = {
+    'random': random_policy,
+    'lowest': lowest_policy,
+}
@@ -0,0 +1,107 @@
+# 内置 AI 决策耗时基准测试
+# 固定种子的若干局，统计每个方块的决策耗时；--runs 多次时每个百分位取最快的一次（机器噪声大时使用）
+# 结果写入 benchmarks/bench_ai.json（与机器相关，提交的那份是修改 ai.py 时的对比记录）
+# --reference 指定另一份 ai.py（例如 git show 某个提交:ai.py > /tmp/ai_old.py），两者交替运行并记录加速比
+# 运行方式：python benchmarks/bench_ai.py [--games 5] [--max-pieces 2000] [--runs 3] [--reference 文件] [--output 路径]
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ai import AutoPlayer
+from engine import TetrisEngine
+from profiler import percentile
+from simulate import play_move
+
+RESULTS = os.path.join(ROOT, 'benchmarks', 'bench_ai.json')
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))
+
+
+def load_player(path):
+    # 从文件加载另一份 ai.py 的 AutoPlayer，与当前版本使用同一个引擎
+    spec = importlib.util.spec_from_file_location('reference_ai', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.AutoPlayer
+
+
+def run(games, max_pieces, verbose=True, player_class=AutoPlayer):
+    player = player_class()
+    times = []
+    pieces = 0
+    for seed in range(games):
+        game = TetrisEngine(seed % 3, seed)
+        while not game.game_over and game.pieces < max_pieces:
+            start = time.perf_counter()
+            rotation, x = player.choose(game)
+            times.append(time.perf_counter() - start)
+            play_move(game, rotation, x)
+        pieces += game.pieces
+        if verbose:
+            print(f"game {seed}: pieces={game.pieces} lines={game.lines} score={game.score}")
+    times.sort()
+    result = {name: percentile(times, fraction) * 1000 for name, fraction in PERCENTILES}
+    result['pieces'] = pieces
+    return result, player.stats() if hasattr(player, 'stats') else None
+
+
+def fastest(best, result):
+    if best is None:
+        return result
+    return {name: min(value, result[name]) for name, value in best.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='内置 AI 每个方块的决策耗时')
+    parser.add_argument('--games', type=int, default=5)
+    parser.add_argument('--max-pieces', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=1, help='重复运行的次数，每个百分位取最快的一次')
+    parser.add_argument('--reference', help='对照的另一份 ai.py')
+    parser.add_argument('--output', default=RESULTS, help='结果文件（JSON）')
+    args = parser.parse_args(argv)
+
+    reference_class = load_player(args.reference) if args.reference else None
+    best = None
+    reference = None
+    for i in range(args.runs):
+        result, stats = run(args.games, args.max_pieces, verbose=i == 0)
+        best = fastest(best, result)
+        if reference_class is not None:
+            reference = fastest(reference, run(args.games, args.max_pieces, False, reference_class)[0])
+    for name, _ in PERCENTILES:
+        line = f"{name:>5}: {best[name]:.3f} ms/piece"
+        if reference is not None:
+            line += f"  对照 {reference[name]:.3f} ms/piece ({reference[name] / best[name]:.2f}x)"
+        print(line)
+    for name, table in stats.items():
+        print(f"{name:>10}: hit rate {table['hit_rate']:.1%}  ({table['hits']} hits, "
+              f"{table['misses']} misses, {table['evictions']} evictions)")
+    report = {
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'date': time.strftime('%Y-%m-%d %H:%M:%S')},
+        'games': args.games,
+        'max_pieces': args.max_pieces,
+        'runs': args.runs,
+        'ms_per_piece': {name: round(best[name], 4) for name, _ in PERCENTILES},
+        'pieces': best['pieces'],
+        'stats': stats,
+    }
+    if reference is not None:
+        report['reference'] = {
+            'file': args.reference,
+            'ms_per_piece': {name: round(reference[name], 4) for name, _ in PERCENTILES},
+            'speedup': {name: round(reference[name] / best[name], 2) for name, _ in PERCENTILES},
+        }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
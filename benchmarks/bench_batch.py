@@ -0,0 +1,46 @@
+# 批量模拟基准测试：逐个运行 TetrisEngine vs NumPy 批量模拟
+# 运行方式：python benchmarks/bench_batch.py [棋盘数] [重复次数]
+# 吞吐量以每秒放置的方块数计；两边各重复运行几次取最快的一次（机器噪声大时多跑几次）
+# 两边使用相同的难度和每次按键时间 INPUT_MS，模拟规则一致（见 test_batch_sim.py）
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from batch_sim import POLICIES, BatchSimulator
+from simulate import POLICIES as ENGINE_POLICIES
+from simulate import INPUT_MS, play_game
+
+
+def bench_engine(games, policy):
+    # 逐个运行 TetrisEngine，与 simulate.py 中单进程运行相同
+    start = time.perf_counter()
+    pieces = sum(play_game(i, i % 3, ENGINE_POLICIES[policy], 100000, input_ms=INPUT_MS)['pieces']
+                 for i in range(games))
+    return pieces / (time.perf_counter() - start)
+
+
+def bench_batch(count, policy):
+    sim = BatchSimulator(count, difficulty=np.arange(count) % 3, seed=1,
+                         input_ms=INPUT_MS)
+    start = time.perf_counter()
+    results = sim.run(POLICIES[policy], max_pieces=5000)
+    return results['pieces'].sum() / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    # 每种策略分别与逐个运行 TetrisEngine 的同一策略对比
+    for policy, games in (('random', 2000), ('lowest', 200)):
+        engine_rate = max(bench_engine(games, policy) for _ in range(repeats))
+        rate = max(bench_batch(count, policy) for _ in range(repeats))
+        print(f"{policy:>8}: engine {engine_rate:10,.0f}/s  batch {rate:12,.0f}/s  "
+              f"({rate / engine_rate:.0f}x, N={count})")
+
+
+if __name__ == '__main__':
+    main()
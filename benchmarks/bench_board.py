@@ -0,0 +1,113 @@
+# 棋盘表示基准测试：原先的二维列表网格 vs 位棋盘
+# 运行方式：python benchmarks/bench_board.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitboard import BitBoard
+from engine import GRID_HEIGHT, GRID_WIDTH, PIECE_TABLE
+
+
+class ListBoard:
+    # 原先 Tetris 中基于二维列表的实现，作为对照
+    def __init__(self):
+        self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+
+    def valid_move(self, state, x, y):
+        shape = state.shape
+        for i in range(len(shape)):
+            for j in range(len(shape[0])):
+                if shape[i][j]:
+                    if (x + j < 0 or x + j >= GRID_WIDTH or
+                        y + i >= GRID_HEIGHT or
+                        (y + i >= 0 and self.grid[y + i][x + j])):
+                        return False
+        return True
+
+    def lock(self, state, x, y):
+        shape = state.shape
+        for i in range(len(shape)):
+            for j in range(len(shape[0])):
+                if shape[i][j]:
+                    self.grid[y + i][x + j] = 1
+
+    def clear_lines(self):
+        lines_cleared = 0
+        for i in range(GRID_HEIGHT):
+            if all(self.grid[i]):
+                lines_cleared += 1
+                del self.grid[i]
+                self.grid.insert(0, [0 for _ in range(GRID_WIDTH)])
+        return lines_cleared
+
+
+class BitBoardAdapter:
+    def __init__(self):
+        self.board = BitBoard(GRID_WIDTH, GRID_HEIGHT)
+
+    def valid_move(self, state, x, y):
+        return not self.board.collides(state.masks, state.left, state.right, x, y)
+
+    def lock(self, state, x, y):
+        self.board.lock(state.masks, x, y)
+
+    def clear_lines(self):
+        return len(self.board.clear_lines())
+
+
+def make_script(count, seed=2024):
+    # 固定种子生成放置序列：(形状, 旋转次数, 目标列)
+    rng = random.Random(seed)
+    return [(rng.randrange(len(PIECE_TABLE)), rng.randrange(4), rng.randrange(GRID_WIDTH))
+            for _ in range(count)]
+
+
+def run(board_cls, script):
+    board = board_cls()
+    lines = 0
+    for kind, rotations, target in script:
+        state = PIECE_TABLE[kind][rotations]
+        x = state.spawn_x
+        if not board.valid_move(state, x, 0):
+            # 顶出后重新开始
+            board = board_cls()
+            continue
+        # 逐格左右移动到目标列，再逐行下落，与游戏中的按键处理一致
+        step = 1 if target > x else -1
+        while x != target and board.valid_move(state, x + step, 0):
+            x += step
+        y = 0
+        while board.valid_move(state, x, y + 1):
+            y += 1
+        board.lock(state, x, y)
+        lines += board.clear_lines()
+    return lines
+
+
+def bench(board_cls, script, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = run(board_cls, script)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(script) / best, lines
+
+
+def main():
+    script = make_script(20000)
+    results = {}
+    for name, board_cls in (("list", ListBoard), ("bitboard", BitBoardAdapter)):
+        rate, lines = bench(board_cls, script)
+        results[name] = (rate, lines)
+        print(f"{name:>10}: {rate:12,.0f} placements/s  (lines={lines})")
+    if results["list"][1] != results["bitboard"][1]:
+        print("警告：两种实现消除的行数不一致")
+    print(f"   speedup: {results['bitboard'][0] / results['list'][0]:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
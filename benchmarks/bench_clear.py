@@ -0,0 +1,110 @@
+# 消行基准测试：逐行删除/插入 vs 单次遍历 + 切片压缩
+# 运行方式：python benchmarks/bench_clear.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitboard import BitBoard
+from engine import GRID_HEIGHT, GRID_WIDTH
+
+FULL = (1 << GRID_WIDTH) - 1
+
+
+def make_fixture(lines, gap=False):
+    # 底部若干满行，上面是带空洞的杂乱行；gap=True 时满行之间夹着未满的行
+    rows = [0] * GRID_HEIGHT
+    for i in range(8, GRID_HEIGHT):
+        rows[i] = FULL ^ (1 << (i % GRID_WIDTH))
+    bottom = GRID_HEIGHT - 1
+    step = 2 if gap else 1
+    for k in range(lines):
+        rows[bottom - k * step] = FULL
+    return rows
+
+
+def clear_list_grid(grid):
+    # 原先 Tetris.clear_lines 的二维列表实现
+    lines_cleared = 0
+    for i in range(GRID_HEIGHT):
+        if all(grid[i]):
+            lines_cleared += 1
+            del grid[i]
+            grid.insert(0, [0 for _ in range(GRID_WIDTH)])
+    return lines_cleared
+
+
+def clear_delete_insert(board):
+    # 位棋盘上的逐行删除/插入，消行后整列重新计算高度（上一版实现）
+    rows = board.rows
+    lines_cleared = 0
+    for i in range(GRID_HEIGHT):
+        if rows[i] == FULL:
+            lines_cleared += 1
+            del rows[i]
+            rows.insert(0, 0)
+    if lines_cleared:
+        board.update_heights()
+    return lines_cleared
+
+
+def time_case(func, make_board, iterations):
+    # 每次都从同一个夹具复制出新棋盘，复制开销对各实现相同
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func(make_board())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / iterations * 1e6
+
+
+def make_board_factory(rows):
+    board = BitBoard(GRID_WIDTH, GRID_HEIGHT)
+    board.rows = list(rows)
+    board.update_heights()
+    heights = board.heights
+
+    def make_board():
+        board.rows = list(rows)
+        board.heights = list(heights)
+        return board
+    return make_board
+
+
+def single_pass(board):
+    return board.clear_lines()
+
+
+def single_pass_ranged(board):
+    # 引擎实际的调用方式：只检查刚固定方块覆盖的 4 行
+    return board.clear_lines(GRID_HEIGHT - 4, GRID_HEIGHT)
+
+
+def main(iterations=20000):
+    print(f"{'case':>12} {'list grid':>10} {'del/insert':>11} {'single':>8} {'ranged':>8}  (us/clear)")
+    for lines in range(0, 5):
+        for gap in (False, True):
+            if gap and lines < 2:
+                continue
+            rows = make_fixture(lines, gap)
+            grid = [[(row >> j) & 1 for j in range(GRID_WIDTH)] for row in rows]
+            make_board = make_board_factory(rows)
+            results = [
+                time_case(clear_list_grid, lambda: [list(r) for r in grid], iterations),
+                time_case(clear_delete_insert, make_board, iterations),
+                time_case(single_pass, make_board, iterations),
+            ]
+            if lines <= 2 or not gap:
+                results.append(time_case(single_pass_ranged, make_board, iterations))
+                ranged = f"{results[3]:8.2f}"
+            else:
+                ranged = f"{'-':>8}"
+            name = f"{lines} lines" + (" gap" if gap else "")
+            print(f"{name:>12} {results[0]:10.2f} {results[1]:11.2f} {results[2]:8.2f} {ranged}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# 训练环境单步耗时基准测试：预分配观测缓冲区 vs 每步复制 Tetris.grid
+# 运行方式：python benchmarks/bench_env.py [步数]
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from env import TetrisEnv, VectorEnv
+
+
+def bench_env(mode, steps, copy_grid):
+    # copy_grid 时每步额外从 game.grid 构造新的观测数组，作为对照
+    rng = random.Random(1)
+    env = TetrisEnv(mode, max_pieces=500)
+    env.reset(0)
+    start = time.perf_counter()
+    for _ in range(steps):
+        _, _, terminated, truncated, _ = env.step(rng.randrange(env.actions))
+        if copy_grid:
+            np.array(env.game.grid, dtype=np.uint8)
+        if terminated or truncated:
+            env.reset()
+    return (time.perf_counter() - start) / steps
+
+
+def bench_vector(count, steps):
+    env = VectorEnv(count, 'place', seed=0, max_pieces=500)
+    env.reset()
+    rng = np.random.default_rng(1)
+    start = time.perf_counter()
+    for _ in range(steps // count):
+        env.step(rng.integers(0, env.actions, count))
+    return (time.perf_counter() - start) / (steps // count * count)
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    for mode in ('keys', 'place'):
+        copied = bench_env(mode, steps, True)
+        buffered = bench_env(mode, steps, False)
+        print(f"{mode:>6}: grid copy {copied * 1e6:6.1f} us/step  buffer {buffered * 1e6:6.1f} us/step  "
+              f"({copied / buffered:.1f}x)")
+    for count in (16, 256):
+        print(f"vector N={count:<4} {bench_vector(count, steps) * 1e6:6.1f} us/step")
+
+
+if __name__ == '__main__':
+    main()
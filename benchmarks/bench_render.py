@@ -0,0 +1,82 @@
+# 方块绘制基准测试：逐格 pygame.draw.rect vs 贴图集一次 blits
+# 在 SDL dummy 视频驱动下运行，不需要显示器
+# 运行方式：python benchmarks/bench_render.py [帧数]
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+import tetris
+from engine import GRID_HEIGHT, GRID_WIDTH
+
+
+def random_cells(fill, seed=1):
+    # 随机占用 fill 比例的格子，模拟接近堆满的棋盘
+    rng = random.Random(seed)
+    return [(x, y) for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH) if rng.random() < fill]
+
+
+def draw_rects(screen, cells):
+    # 原先的绘制方式，作为对照
+    size = tetris.BLOCK_SIZE
+    for x, y in cells:
+        pygame.draw.rect(screen, tetris.RETRO_DARK,
+                         [x * size + 1, y * size + 1, size - 2, size - 2])
+
+
+def draw_atlas(screen, rows):
+    # 与 Tetris.draw_full 相同：按行取缓存的序列项，一次 blits
+    tiles = tetris.tiles.get(tetris.BLOCK_SIZE, 12)
+    blits = []
+    for y, row in enumerate(rows):
+        if row:
+            blits += tiles.row('block', y, row)
+    screen.blits(blits, doreturn=False)
+
+
+def to_rows(cells):
+    rows = [0] * GRID_HEIGHT
+    for x, y in cells:
+        rows[y] |= 1 << x
+    return rows
+
+
+def bench(draw, screen, background, cells, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        screen.blit(background, (0, 0))
+        draw(screen, cells)
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    screen = tetris.init_display()
+    background = tetris.get_background(1)
+    # 先确认两种方式画出的像素完全相同
+    cells = random_cells(0.75)
+    screen.blit(background, (0, 0))
+    draw_rects(screen, cells)
+    expected = pygame.image.tobytes(screen, 'RGB')
+    screen.blit(background, (0, 0))
+    draw_atlas(screen, to_rows(cells))
+    assert pygame.image.tobytes(screen, 'RGB') == expected, "贴图与 draw.rect 的结果不一致"
+
+    base = bench(lambda screen, cells: None, screen, background, [], frames)
+    for fill in (0.25, 0.5, 0.75, 1.0):
+        cells = random_cells(fill)
+        rects = bench(draw_rects, screen, background, cells, frames) - base
+        atlas = bench(draw_atlas, screen, background, to_rows(cells), frames) - base
+        print(f"{len(cells):>4} 格: draw.rect {rects * 1e6:7.1f} us  blits {atlas * 1e6:7.1f} us  "
+              f"({rects / atlas:.1f}x)")
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# 对局服务器压测：同一进程内启动服务器，在本机回环上连接模拟选手和观众
+# 选手随机操作 duration 秒后停止，等几轮广播后逐个比较客户端拼出的棋盘与服务器上的对局
+# 报告每轮推进耗时、发送的帧数和字节数，以及与每次重发完整棋盘相比的字节数
+# 客户端与服务器在同一进程中，测得的是两者合计的负载
+# 运行方式：python benchmarks/bench_server.py [选手数] [每局观众数] [秒数]
+import asyncio
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import (HOST, SNAPSHOT_HEAD, SNAPSHOT_ROWS, STATUS, GameClient,
+                    GameServer, HEADER, simulated_player)
+
+CONNECT_BATCH = 200  # 每批同时建立的连接数
+SETTLE_TICKS = 4  # 停止操作后等待的轮数
+
+
+def raise_file_limit(connections):
+    # 每个连接在服务器和客户端两边各占一个文件描述符
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    need = connections * 2 + 64
+    if soft < need:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(need, hard), hard))
+
+
+async def connect_all(count, port, start):
+    clients = []
+    for i in range(0, count, CONNECT_BATCH):
+        batch = await asyncio.gather(*[GameClient.connect(HOST, port)
+                                       for _ in range(min(CONNECT_BATCH, count - i))])
+        for client in batch:
+            start(client, len(clients))
+            clients.append(client)
+    return clients
+
+
+def check(server, clients):
+    # 返回与服务器不一致的仍在进行的对局数和已结束的对局数
+    mismatches = 0
+    finished = 0
+    for client in clients:
+        board = client.board
+        game = server.games.get(board.game_id)
+        if game is None:
+            finished += 1
+            continue
+        rows, status = game.view
+        if board.rows != rows or board.status != status:
+            mismatches += 1
+    return mismatches, finished
+
+
+async def run(players, watchers, duration):
+    server = GameServer()
+    port = await server.start(HOST, 0)
+    started = time.perf_counter()
+
+    def start_player(client, i):
+        # 每 4 局使用同一种子，模拟比赛
+        client.play(seed=i // 4)
+
+    player_clients = await connect_all(players, port, start_player)
+    for client in player_clients:
+        await client.receive()
+        client.listen()
+    game_ids = [client.board.game_id for client in player_clients]
+    watcher_clients = await connect_all(players * watchers, port,
+                                        lambda client, i: client.watch(game_ids[i % players]))
+    for client in watcher_clients:
+        client.listen()
+    print(f"{players} 局，{players * watchers} 个观众，建立连接 {time.perf_counter() - started:.1f} s")
+
+    ticks = server.ticks
+    frames = server.frames_sent
+    sent = server.bytes_sent
+    server.tick_times.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*[simulated_player(client, random.Random(i), duration=duration)
+                           for i, client in enumerate(player_clients)])
+    elapsed = time.perf_counter() - start
+    ticks = server.ticks - ticks
+    frames = server.frames_sent - frames
+    sent = server.bytes_sent - sent
+    stats = server.stats()
+    await asyncio.sleep(SETTLE_TICKS * server.tick_ms / 1000)
+
+    mismatches, finished = check(server, player_clients + watcher_clients)
+    errors = sum(client.error is not None for client in player_clients + watcher_clients)
+    # 同样的帧数如果每次都发送完整棋盘（快照去掉对局信息）需要的字节数
+    full = frames * (HEADER.size + SNAPSHOT_HEAD.size + SNAPSHOT_ROWS.size + STATUS.size)
+    print(f"{ticks} 轮（{ticks / elapsed:.1f} 轮/秒），每轮耗时 p50 {stats['tick_p50_ms']:.2f} ms  "
+          f"p99 {stats['tick_p99_ms']:.2f} ms  最长 {stats['tick_max_ms']:.2f} ms")
+    print(f"发送 {frames} 帧 {sent / 1024:.0f} KB，平均 {sent / max(frames, 1):.1f} 字节/帧，"
+          f"每局 {sent / players / elapsed:.0f} 字节/秒；每次发完整棋盘需要 {full / 1024:.0f} KB "
+          f"({full / max(sent, 1):.1f}x)")
+    print(f"丢弃操作 {stats['dropped_inputs']}，拥塞跳过 {stats['congested_ticks']}，"
+          f"拥塞断开 {stats['lag_disconnects']}，错误 {errors}")
+    print(f"已结束 {finished} 个连接的对局，仍在进行的对局中客户端与服务器不一致: {mismatches}")
+
+    for client in player_clients + watcher_clients:
+        await client.close()
+    await server.close()
+    return 1 if mismatches or errors else 0
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    watchers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    raise_file_limit(players * (watchers + 1))
+    return asyncio.run(run(players, watchers, duration))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
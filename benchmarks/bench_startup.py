@@ -0,0 +1,58 @@
+# 启动和重开一局的耗时基准测试（SDL dummy 驱动）
+# 启动到第一帧：在新进程中从导入 tetris 到主菜单第一次显示；重开一局：构造 Tetris 的平均耗时
+# 运行方式：python benchmarks/bench_startup.py [启动次数] [重开次数]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from profiler import percentile
+
+FIRST_FRAME = """
+import time
+start = time.perf_counter()
+import tetris
+tetris.init_display()
+tetris.audio.start()
+tetris.Menu().draw(tetris.screen)
+print(time.perf_counter() - start)
+"""
+
+
+def first_frame():
+    output = subprocess.run([sys.executable, '-c', FIRST_FRAME], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    return float(output.split()[-1])
+
+
+def restart(count):
+    import tetris
+    tetris.init_display()
+    tetris.audio.start()
+    tetris.audio.loaded.wait()
+    with tempfile.TemporaryDirectory() as directory:
+        leaderboard = tetris.Leaderboard(os.path.join(directory, 'scores.db'))
+        start = time.perf_counter()
+        for seed in range(count):
+            tetris.Tetris(seed % 3, seed, leaderboard=leaderboard)
+        elapsed = (time.perf_counter() - start) / count
+        leaderboard.close()
+    return elapsed
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    restarts = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    times = sorted(first_frame() for _ in range(runs))
+    print(f"启动到第一帧: 中位数 {percentile(times, 0.5) * 1000:.1f} ms  最快 {times[0] * 1000:.1f} ms")
+    print(f"重开一局: {restart(restarts) * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
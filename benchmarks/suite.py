@@ -0,0 +1,341 @@
+# 引擎和绘制热点的基准测试套件
+# 所有用例使用固定种子和固定棋盘，结果写入 JSON，并与保存的基线比较，超过阈值的用例视为性能退化
+# 绘制用例在 SDL dummy 视频驱动下运行，不需要显示器
+# 运行方式：
+#   python benchmarks/suite.py                     运行全部用例，与 benchmarks/baseline.json 比较
+#   python benchmarks/suite.py --filter engine.    只运行名字包含该字符串的用例
+#   python benchmarks/suite.py --save-baseline     运行后把结果保存为新的基线
+#   python benchmarks/suite.py --runs 3            整套运行 3 次取最快，适合噪声大的机器
+# 有用例退化时退出码为 1；基线与机器相关，换机器后需要重新保存
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame
+
+import tetris
+from engine import GRID_HEIGHT, GRID_WIDTH, TetrisEngine
+from pieces import Piece
+from profiler import percentile
+from replay import LEFT, RIGHT
+from simulate import lowest_policy, play_game
+
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results.json')
+THRESHOLD = 0.15  # 比基线慢 15% 以上视为退化
+RENDER_THRESHOLD = 0.25  # 绘制用例波动更大
+REPEATS = 9
+ROUND_SECONDS = 0.1  # 每轮计时的目标时长
+FULL = (1 << GRID_WIDTH) - 1
+FIXTURE_SEED = 20240601
+
+
+# 固定棋盘
+
+def fixture_rows(filled, full_lines=0, seed=FIXTURE_SEED):
+    # 底部 filled 行随机占用且每行至少留一个空格；最底下 full_lines 行是满行
+    rng = random.Random(seed)
+    rows = [0] * GRID_HEIGHT
+    for i in range(GRID_HEIGHT - filled, GRID_HEIGHT):
+        rows[i] = rng.getrandbits(GRID_WIDTH) & ~(1 << rng.randrange(GRID_WIDTH))
+    for i in range(GRID_HEIGHT - full_lines, GRID_HEIGHT):
+        rows[i] = FULL
+    return rows
+
+
+def load_fixture(game, rows):
+    board = game.board
+    board.rows[:] = rows
+    board.update_heights()
+    board.compute_hash()
+
+
+def fixture_game(filled, full_lines=0, kind=2):
+    # 带固定棋盘的对局，当前方块放在棋盘上方的空白区域
+    game = TetrisEngine(1, FIXTURE_SEED)
+    load_fixture(game, fixture_rows(filled, full_lines))
+    game.current_piece = Piece(kind, 0, 4, 2)
+    return game
+
+
+# 用例：每个函数做好准备，返回 (计时的函数, 每次调用包含的操作数)
+
+def bench_valid_move():
+    game = fixture_game(10)
+    piece = game.current_piece
+    positions = [(x, y, rotation) for rotation in range(4) for x in range(-1, GRID_WIDTH)
+                 for y in (2, 9, 12)]
+
+    def run():
+        for x, y, rotation in positions:
+            game.valid_move(piece, x, y, rotation)
+    return run, len(positions)
+
+
+def bench_rotate_piece():
+    game = fixture_game(10)
+    piece = game.current_piece
+
+    def run():
+        for _ in range(4):
+            game.rotate_piece(piece)
+    return run, 4
+
+
+def bench_drop_piece():
+    # 软降一行，不固定；每次先把方块放回原处
+    game = fixture_game(10)
+    piece = game.current_piece
+
+    def run():
+        piece.y = 2
+        game.drop_piece()
+    return run, 1
+
+
+def bench_hard_drop():
+    # 硬降、固定、检查消行、生成新方块；每次先恢复棋盘
+    game = fixture_game(10)
+    rows = fixture_rows(10)
+
+    def run():
+        load_fixture(game, rows)
+        game.current_piece = Piece(2, 0, 4, 0)
+        game.hard_drop()
+    return run, 1
+
+
+def bench_clear_lines(lines):
+    # 底部 lines 行为满行，检查方块覆盖的底部 4 行；每次先恢复棋盘（包含在计时中）
+    def setup():
+        game = fixture_game(12, lines)
+        rows = fixture_rows(12, lines)
+
+        def run():
+            load_fixture(game, rows)
+            game.clear_lines(GRID_HEIGHT - 4, GRID_HEIGHT)
+        return run, 1
+    return setup
+
+
+def bench_game():
+    # 完整对局：lowest 策略，固定种子，最多 300 个方块
+    pieces = play_game(1, 1, lowest_policy, 300, input_ms=0)['pieces']
+
+    def run():
+        play_game(1, 1, lowest_policy, 300, input_ms=0)
+    return run, pieces
+
+
+class RenderFixture:
+    # 绘制用例共用的窗口、排行榜（临时数据库）和对局
+    def __init__(self):
+        tetris.init_display()
+        self.directory = tempfile.TemporaryDirectory()
+        self.leaderboard = tetris.Leaderboard(os.path.join(self.directory.name, 'scores.db'))
+        self.game = tetris.Tetris(1, FIXTURE_SEED, leaderboard=self.leaderboard)
+        load_fixture(self.game, fixture_rows(12))
+        self.game.current_piece = Piece(2, 0, 4, 2)
+        self.menu = tetris.Menu()
+        self.game.draw()
+
+    def close(self):
+        self.leaderboard.close()
+        self.directory.cleanup()
+        pygame.quit()
+
+
+render_fixture = None
+
+
+def get_render_fixture():
+    global render_fixture
+    if render_fixture is None:
+        render_fixture = RenderFixture()
+    return render_fixture
+
+
+def bench_draw_full():
+    game = get_render_fixture().game
+
+    def run():
+        game.full_redraw = True
+        game.draw()
+    return run, 1
+
+
+def bench_draw_move():
+    # 左右移动一格后的增量绘制
+    game = get_render_fixture().game
+    actions = [LEFT, RIGHT]
+
+    def run():
+        for action in actions:
+            game.apply_action(action)
+            game.draw()
+    return run, len(actions)
+
+
+def bench_menu_draw():
+    fixture = get_render_fixture()
+
+    def run():
+        fixture.menu.draw(tetris.screen)
+    return run, 1
+
+
+# 用例名 -> (准备函数, 退化阈值)
+CASES = {
+    'engine.valid_move': (bench_valid_move, THRESHOLD),
+    'engine.rotate_piece': (bench_rotate_piece, THRESHOLD),
+    'engine.drop_piece': (bench_drop_piece, THRESHOLD),
+    'engine.hard_drop': (bench_hard_drop, THRESHOLD),
+    'engine.clear_lines_0': (bench_clear_lines(0), THRESHOLD),
+    'engine.clear_lines_1': (bench_clear_lines(1), THRESHOLD),
+    'engine.clear_lines_2': (bench_clear_lines(2), THRESHOLD),
+    'engine.clear_lines_3': (bench_clear_lines(3), THRESHOLD),
+    'engine.clear_lines_4': (bench_clear_lines(4), THRESHOLD),
+    'engine.game_lowest_300': (bench_game, THRESHOLD),
+    'render.draw_full': (bench_draw_full, RENDER_THRESHOLD),
+    'render.draw_move': (bench_draw_move, RENDER_THRESHOLD),
+    'render.menu_draw': (bench_menu_draw, RENDER_THRESHOLD),
+}
+
+
+def measure(run, repeats=REPEATS):
+    # 先确定循环次数使每轮约 ROUND_SECONDS 秒，再计时 repeats 轮；返回每次调用的秒数列表
+    # 与 timeit 相同，计时期间关闭垃圾回收
+    gc.collect()
+    gc.disable()
+    try:
+        return measure_rounds(run, repeats)
+    finally:
+        gc.enable()
+
+
+def measure_rounds(run, repeats):
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= ROUND_SECONDS / 10:
+            break
+        loops *= 10
+    loops = max(1, round(loops * ROUND_SECONDS / elapsed))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        times.append((time.perf_counter() - start) / loops)
+    return times, loops
+
+
+def run_suite(names, repeats=REPEATS):
+    results = {}
+    for name in names:
+        setup, _ = CASES[name]
+        run, ops = setup()
+        times, loops = measure(run, repeats)
+        # 取最快一轮作为比较依据，受其它进程干扰最小
+        results[name] = {
+            'best_us': min(times) / ops * 1e6,
+            'median_us': percentile(sorted(times), 0.5) / ops * 1e6,
+            'ops': ops,
+            'loops': loops,
+            'repeats': repeats,
+        }
+        print(f"{name:<26}{results[name]['best_us']:>12.2f} us  (中位数 {results[name]['median_us']:.2f})")
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def compare(results, baseline, scale=1.0):
+    # 返回退化的用例名；只比较两边都有的用例，scale 放大所有阈值（在噪声大的机器上使用）
+    regressions = []
+    print(f"\n{'用例':<26}{'基线':>12}{'本次':>12}{'比值':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<26}{'-':>12}{result['best_us']:>12.2f}{'':>8}  新用例")
+            continue
+        before = baseline[name]['best_us']
+        ratio = result['best_us'] / before
+        status = ''
+        threshold = CASES[name][1] * scale
+        if ratio > 1 + threshold:
+            status = '  退化'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = '  提升'
+        print(f"{name:<26}{before:>12.2f}{result['best_us']:>12.2f}{ratio:>8.2f}{status}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='引擎和绘制热点的基准测试')
+    parser.add_argument('--filter', default='', help='只运行名字包含该字符串的用例')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='每个用例计时的轮数')
+    parser.add_argument('--runs', type=int, default=1, help='整套用例运行的次数，每个用例取最快的一次')
+    parser.add_argument('--output', default=RESULTS, help='结果文件（JSON）')
+    parser.add_argument('--baseline', default=BASELINE, help='基线文件（JSON）')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--threshold-scale', type=float, default=1.0, help='所有退化阈值乘以该系数')
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if args.filter in name]
+    if not names:
+        parser.error(f"没有名字包含 {args.filter} 的用例")
+    # 多次运行时各用例交错进行，机器负载的短时波动不会集中影响某一个用例
+    results = {}
+    try:
+        for _ in range(args.runs):
+            for name, result in run_suite(names, args.repeats).items():
+                if name not in results or result['best_us'] < results[name]['best_us']:
+                    results[name] = result
+    finally:
+        if render_fixture is not None:
+            render_fixture.close()
+    report = {'environment': environment(), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n已保存基线 {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\n没有基线文件 {args.baseline}，用 --save-baseline 保存")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline['results'], args.threshold_scale)
+    if regressions:
+        print(f"\n{len(regressions)} 个用例退化：{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import random
+
+# 位棋盘：每一行用一个整数位掩码表示，第 j 位对应第 j 列
+# 碰撞检测只需少量按位与运算，整行判断只需 row == full
+
+ZOBRIST_SEED = 20240601  # 固定种子，同样大小的棋盘在任何进程中的哈希都相同
+zobrist_tables = {}
+
+
+def zobrist_keys(width, height):
+    # Zobrist 哈希表：keys[i][mask] 是第 i 行内容为 mask 时的随机 64 位数，
+    # 棋盘的哈希是所有行的键异或起来；按整行建表，更新一行只需两次查表
+    keys = zobrist_tables.get((width, height))
+    if keys is None:
+        rng = random.Random(ZOBRIST_SEED)
+        keys = []
+        for _ in range(height):
+            row_keys = [rng.getrandbits(64) for _ in range(1 << width)]
+            row_keys[0] = 0  # 空行不影响哈希，空棋盘的哈希为 0
+            keys.append(row_keys)
+        zobrist_tables[(width, height)] = keys
+    return keys
+
+
+def board_hash(keys, rows):
+    value = 0
+    for row_keys, row in zip(keys, rows):
+        value ^= row_keys[row]
+    return value
+
+
+class BitBoard:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.full = (1 << width) - 1  # 一整行填满时的掩码
+        self.rows = [0] * height
+        # 每列的高度（最高的已占用格子到底部的行数），固定方块和消行时更新
+        self.heights = [0] * width
+        self.keys = zobrist_keys(width, height)
+        self.hash = 0  # 固定方块和消行时增量更新
+
+    def compute_hash(self):
+        # 直接修改 rows 后调用，重新计算哈希
+        self.hash = board_hash(self.keys, self.rows)
+        return self.hash
+
+    def collides(self, masks, left, right, x, y):
+        # 检查形状放在 (x, y) 时是否越界或与已有方块重叠
+        if x + left < 0 or x + right >= self.width:
+            return True
+        rows = self.rows
+        height = self.height
+        for i, mask in enumerate(masks):
+            if mask:
+                row = y + i
+                if row >= height:
+                    return True
+                if row >= 0 and rows[row] & (mask << x):
+                    return True
+        return False
+
+    def lock(self, masks, x, y):
+        # 把形状固定到棋盘上，调用者需保证所有行都在棋盘内
+        rows = self.rows
+        heights = self.heights
+        height = self.height
+        keys = self.keys
+        value = self.hash
+        for i, mask in enumerate(masks):
+            if mask:
+                row = y + i
+                bits = mask << x
+                old = rows[row]
+                rows[row] = old | bits
+                value ^= keys[row][old] ^ keys[row][old | bits]
+                # 更新这一行覆盖到的列的高度
+                column_height = height - row
+                while bits:
+                    low = bits & -bits
+                    column = low.bit_length() - 1
+                    if heights[column] < column_height:
+                        heights[column] = column_height
+                    bits ^= low
+        self.hash = value
+
+    def landing_y(self, bottoms, masks, left, right, x, y):
+        # 计算形状从 (x, y) 直接落下后停住的行坐标
+        heights = self.heights
+        height = self.height
+        target = height
+        for dx, dy in bottoms:
+            # 该列最低格子需要停在列顶之上
+            candidate = height - heights[x + dx] - 1 - dy
+            if candidate < target:
+                target = candidate
+        if target >= y:
+            return target
+        # 方块已经在某列的悬空部分之下，只能逐行检查
+        while not self.collides(masks, left, right, x, y + 1):
+            y += 1
+        return y
+
+    def update_heights(self):
+        # 消行后重新计算每列高度
+        heights = [0] * self.width
+        remaining = self.full
+        for i, row in enumerate(self.rows):
+            hit = row & remaining
+            while hit:
+                low = hit & -hit
+                heights[low.bit_length() - 1] = self.height - i
+                hit ^= low
+            remaining &= ~row
+            if not remaining:
+                break
+        self.heights = heights
+
+    def clear_lines(self, start=0, stop=None):
+        # 一次遍历找出 [start, stop) 内所有满行，其余行用一次切片赋值整体下移
+        # 返回被清除的行号（清除前的坐标，从上到下）
+        rows = self.rows
+        full = self.full
+        if stop is None:
+            stop = self.height
+        segment = rows[start:stop]
+        if full not in segment:
+            return []
+        cleared = [start + i for i, row in enumerate(segment) if row == full]
+        kept = [row for row in segment if row != full]
+        old = rows[:stop]
+        rows[:stop] = [0] * len(cleared) + rows[:start] + kept
+        # 只有 stop 之上的行发生了移动，逐行更新它们在哈希中的贡献
+        keys = self.keys
+        value = self.hash
+        for i in range(stop):
+            if old[i] != rows[i]:
+                value ^= keys[i][old[i]] ^ keys[i][rows[i]]
+        self.hash = value
+        self._heights_after_clear(cleared)
+        return cleared
+
+    def _heights_after_clear(self, cleared):
+        # 满行覆盖所有列，所以每列的顶格不会高于第一条被清除的行：
+        # 顶格更高的列高度直接减去清除行数，顶格正好在该行上的列向下重新查找
+        lines = len(cleared)
+        first = cleared[0]
+        height = self.height
+        heights = self.heights
+        limit = height - first
+        rescan = 0
+        for column in range(self.width):
+            if heights[column] > limit:
+                heights[column] -= lines
+            else:
+                heights[column] = 0
+                rescan |= 1 << column
+        rows = self.rows
+        # 第一条被清除的行之上的行压缩后都位于 first + lines 之上
+        for i in range(first + lines, height):
+            hit = rows[i] & rescan
+            while hit:
+                low = hit & -hit
+                heights[low.bit_length() - 1] = height - i
+                hit ^= low
+            rescan &= ~rows[i]
+            if not rescan:
+                break
+
+    def cell(self, x, y):
+        return (self.rows[y] >> x) & 1
+
+    def to_grid(self):
+        # 转换为与原先 Tetris.grid 相同的二维列表
+        return [[(row >> j) & 1 for j in range(self.width)] for row in self.rows]
@@ -0,0 +1,222 @@
+import time
+
+from bitboard import BitBoard
+from pieces import ROTATIONS, Piece, build_piece_table
+from randomizer import Randomizer
+
+# 纯 Python 的游戏规则核心，不依赖 pygame，可在无显示环境下批量运行
+
+# 游戏设置
+GRID_WIDTH = 10  # 游戏区域宽度（以方块数计）
+GRID_HEIGHT = 20  # 游戏区域高度（以方块数计）
+
+# 定义方块形状
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[1, 1, 1], [0, 1, 0]],  # T
+    [[1, 1, 1], [1, 0, 0]],  # L
+    [[1, 1, 1], [0, 0, 1]],  # J
+    [[1, 1, 0], [0, 1, 1]],  # S
+    [[0, 1, 1], [1, 1, 0]]   # Z
+]
+
+# 导入时展开所有形状的旋转状态：PIECE_TABLE[kind][rotation]
+PIECE_TABLE = build_piece_table(SHAPES, GRID_WIDTH)
+
+# 难度名称
+DIFFICULTY_NAMES = ["简单", "普通", "困难"]
+
+# 根据难度设置的初始下落速度（秒）
+FALL_SPEEDS = {
+    0: 0.8,  # 简单
+    1: 0.5,  # 普通
+    2: 0.3   # 困难
+}
+
+# 根据难度设置的得分倍数
+SCORE_MULTIPLIERS = {
+    0: 1,    # 简单
+    1: 1.5,  # 普通
+    2: 2     # 困难
+}
+
+
+class TetrisEngine:
+    def __init__(self, difficulty=1, seed=None, randomizer='random'):
+        self.board = BitBoard(GRID_WIDTH, GRID_HEIGHT)
+        self.difficulty = difficulty
+        # 方块序列只由种子和随机模式决定，记录这两项即可重现整局
+        self.randomizer = Randomizer(len(SHAPES), seed, randomizer)
+        self.seed = self.randomizer.seed
+        self.score = 0
+        self.lines = 0  # 累计消除行数
+        self.pieces = 0  # 累计固定的方块数
+        self.level = 1
+        self.game_over = False
+        self.last_cleared_rows = []  # 最近一次消除的行号
+        self.current_piece = self.new_piece()
+        self.next_piece = self.new_piece()
+        # 根据难度设置初始速度
+        self.fall_speed = self.get_initial_fall_speed()
+        self.time_ms = 0  # 已推进的游戏时间（毫秒），暂停时不计
+        self.gravity_accumulator = 0  # 距上次重力下落累计的毫秒数
+
+    @property
+    def grid(self):
+        # 兼容旧接口：返回棋盘的二维列表副本
+        return self.board.to_grid()
+
+    def new_piece(self):
+        # 从本局的方块生成器取下一个方块
+        kind = self.randomizer.next()
+        return Piece(kind, 0, PIECE_TABLE[kind][0].spawn_x, 0)
+
+    def upcoming(self, count):
+        # next_piece 之后的方块种类，已经预先生成，查看不改变序列
+        return self.randomizer.peek(count)
+
+    def piece_state(self, piece):
+        # 返回方块当前旋转状态的表项
+        return PIECE_TABLE[piece.kind][piece.rotation]
+
+    def valid_move(self, piece, x, y, rotation=None):
+        # 检查移动是否有效，可指定要检查的旋转状态
+        if rotation is None:
+            rotation = piece.rotation
+        state = PIECE_TABLE[piece.kind][rotation]
+        return not self.board.collides(state.masks, state.left, state.right, x, y)
+
+    def rotate_piece(self, piece):
+        # 旋转方块
+        rotation = (piece.rotation + 1) % ROTATIONS
+        if self.valid_move(piece, piece.x, piece.y, rotation):
+            piece.rotation = rotation
+
+    def landing_y(self, piece):
+        # 方块直接落下后的行坐标，用于硬降和落点预览
+        state = PIECE_TABLE[piece.kind][piece.rotation]
+        return self.board.landing_y(state.bottoms, state.masks, state.left, state.right,
+                                    piece.x, piece.y)
+
+    def hard_drop(self):
+        # 直接移动到落点并固定
+        piece = self.current_piece
+        piece.y = self.landing_y(piece)
+        self.drop_piece()
+
+    def drop_piece(self):
+        piece = self.current_piece
+        if self.valid_move(piece, piece.x, piece.y + 1):
+            piece.y += 1
+        else:
+            # 固定方块到网格
+            if piece.y < 0:
+                self.game_over = True
+                self.on_game_over()
+                return
+            state = self.piece_state(piece)
+            self.board.lock(state.masks, piece.x, piece.y)
+            self.pieces += 1
+
+            # 只有刚固定的方块覆盖的行可能被填满
+            self.clear_lines(piece.y, piece.y + state.height)
+
+            # 更新当前方块和下一个方块
+            self.current_piece = self.next_piece
+            self.next_piece = self.new_piece()
+
+            # 检查游戏是否结束
+            if not self.valid_move(self.current_piece, self.current_piece.x, self.current_piece.y):
+                self.game_over = True
+                self.on_game_over()
+
+    def clear_lines(self, start=0, stop=None):
+        # 清除已完成的行，返回被清除的行号，供动画、计分和统计使用
+        cleared_rows = self.board.clear_lines(start, stop)
+        self.last_cleared_rows = cleared_rows
+
+        # 更新分数，加入难度系数
+        if cleared_rows:
+            lines_cleared = len(cleared_rows)
+            score_multiplier = self.get_score_multiplier()
+            self.score += int(lines_cleared * 100 * score_multiplier)
+            self.lines += lines_cleared
+            self.on_lines_cleared(cleared_rows)
+
+        return cleared_rows
+
+    def gravity_interval(self):
+        # 每次重力下落的间隔（毫秒），用整数保证不同机器上结果一致
+        return max(1, round(self.fall_speed * 1000))
+
+    def advance(self, elapsed_ms):
+        # 推进游戏时间；时间积累够几个下落间隔就下落几行，返回下落次数
+        # 结果只取决于累计的时间，与调用频率无关
+        if self.game_over:
+            return 0
+        end_ms = self.time_ms + elapsed_ms
+        self.gravity_accumulator += elapsed_ms
+        interval = self.gravity_interval()
+        steps = 0
+        while self.gravity_accumulator >= interval:
+            self.gravity_accumulator -= interval
+            # 先把游戏时间推进到这次下落的时刻再下落：游戏在这次下落时结束的话，
+            # on_game_over 和回放记录看到的就是结束的时间，之后的时间不再计入
+            self.time_ms = end_ms - self.gravity_accumulator
+            self.drop_piece()
+            steps += 1
+            if self.game_over:
+                self.gravity_accumulator = 0
+                return steps
+        self.time_ms = end_ms
+        return steps
+
+    def time_until_drop(self):
+        # 距离下一次重力下落还有多少毫秒
+        return self.gravity_interval() - self.gravity_accumulator
+
+    def get_initial_fall_speed(self):
+        # 根据难度返回不同的初始速度
+        return FALL_SPEEDS[self.difficulty]
+
+    def get_score_multiplier(self):
+        # 根据难度返回不同的得分倍数
+        return SCORE_MULTIPLIERS[self.difficulty]
+
+    # 以下钩子由界面层覆盖，用于播放音效、保存分数等副作用
+    def on_lines_cleared(self, cleared_rows):
+        pass
+
+    def on_game_over(self):
+        pass
+
+
+def monotonic_ms():
+    return int(time.monotonic() * 1000)
+
+
+class GameClock:
+    # 用可替换的时钟驱动 TetrisEngine.advance；clock 返回整数毫秒
+    def __init__(self, clock=monotonic_ms):
+        self.clock = clock
+        self.last = clock()
+        self.running = True
+
+    def update(self, game):
+        # 把游戏推进到当前时间，返回下落的行数
+        if not self.running:
+            return 0
+        now = self.clock()
+        elapsed = now - self.last
+        self.last = now
+        return game.advance(elapsed)
+
+    def set_running(self, running):
+        # 暂停期间的时间不计入游戏时间
+        if running and not self.running:
+            self.last = self.clock()
+        self.running = running
+
+    def time_until_drop(self, game):
+        return game.time_until_drop() - (self.clock() - self.last)
@@ -0,0 +1,167 @@
+import numpy as np
+
+from engine import GRID_HEIGHT, GRID_WIDTH, PIECE_TABLE, TetrisEngine
+from pieces import ROTATIONS
+from randomizer import LOOKAHEAD
+from replay import HARD_DROP, apply_action
+from simulate import play_move
+
+# Gym 风格的训练环境：reset(seed) -> (观测, 信息)，step(动作) -> (观测, 奖励, 结束, 截断, 信息)
+# 动作有两种：
+#   'keys'   与 main() 处理的按键相同，0 不操作，1-5 为 replay.py 的操作码；每步执行动作后推进 frame_ms 毫秒
+#   'place'  直接放置：rotation * GRID_WIDTH + 列，按 simulate.play_move 的方式旋转、平移并硬降
+# 观测是预先分配的 NumPy 数组，每步只改写变化的部分并返回同一组数组（不复制）；
+# 需要保留某一步的观测时调用者自己 copy()
+#   board  (GRID_HEIGHT, GRID_WIDTH) uint8，已固定的方块为 1
+#   piece  int16：当前方块的种类、旋转状态、列、行，之后是接下来 PREVIEW 个方块的种类
+# 奖励是这一步增加的分数
+
+ACTION_MODES = ('keys', 'place')
+NOOP = 0
+KEY_ACTIONS = HARD_DROP + 1  # keys 模式的动作数
+PLACEMENTS = ROTATIONS * GRID_WIDTH  # place 模式的动作数
+FRAME_MS = 50  # keys 模式每步推进的游戏时间
+PREVIEW = LOOKAHEAD  # 观测中包含的后续方块数：next_piece 和之后 LOOKAHEAD - 1 个
+PIECE_FIELDS = 4 + PREVIEW
+
+# ROW_CELLS[mask] 是位掩码 mask 展开后的一行格子，更新观测时按行查表
+ROW_CELLS = ((np.arange(1 << GRID_WIDTH)[:, None] >> np.arange(GRID_WIDTH)) & 1).astype(np.uint8)
+ROW_CELLS.flags.writeable = False
+
+
+def build_placement_masks():
+    # PLACEMENT_MASKS[kind] 标出 place 模式中该方块合法的 (旋转状态, 列)
+    masks = np.zeros((len(PIECE_TABLE), PLACEMENTS), dtype=bool)
+    for kind, states in enumerate(PIECE_TABLE):
+        for rotation, state in enumerate(states):
+            start = rotation * GRID_WIDTH
+            masks[kind, start - state.left:start + GRID_WIDTH - state.right] = True
+    masks.flags.writeable = False
+    return masks
+
+
+PLACEMENT_MASKS = build_placement_masks()
+
+
+class TetrisEnv:
+    # board/piece 可以传入外部数组（例如 VectorEnv 中大数组的一行），观测直接写在里面
+    def __init__(self, action_mode='place', difficulty=1, randomizer='random', frame_ms=FRAME_MS,
+                 max_pieces=None, board=None, piece=None):
+        if action_mode not in ACTION_MODES:
+            raise ValueError(f"未知的动作模式 {action_mode}，可选 {', '.join(ACTION_MODES)}")
+        self.action_mode = action_mode
+        self.actions = PLACEMENTS if action_mode == 'place' else KEY_ACTIONS
+        self.difficulty = difficulty
+        self.randomizer = randomizer
+        self.frame_ms = frame_ms
+        self.max_pieces = max_pieces
+        self.board = board if board is not None else np.zeros((GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+        self.piece = piece if piece is not None else np.zeros(PIECE_FIELDS, dtype=np.int16)
+        self.observation = {'board': self.board, 'piece': self.piece}
+        self.shown_rows = None  # board 中已写入的各行位掩码
+        self.game = None
+
+    def reset(self, seed=None):
+        self.game = TetrisEngine(self.difficulty, seed, self.randomizer)
+        self.board[:] = 0
+        self.shown_rows = [0] * GRID_HEIGHT
+        self.update_observation()
+        return self.observation, self.info()
+
+    def step(self, action):
+        game = self.game
+        score = game.score
+        if self.action_mode == 'place':
+            rotation, x = divmod(int(action), GRID_WIDTH)
+            play_move(game, rotation, x)
+        else:
+            if action != NOOP:
+                apply_action(game, action)
+            if not game.game_over:
+                game.advance(self.frame_ms)
+        self.update_observation()
+        terminated = game.game_over
+        truncated = not terminated and self.max_pieces is not None and game.pieces >= self.max_pieces
+        return self.observation, game.score - score, terminated, truncated, self.info()
+
+    def update_observation(self):
+        game = self.game
+        rows = game.board.rows
+        shown = self.shown_rows
+        if rows != shown:
+            board = self.board
+            for i, row in enumerate(rows):
+                if row != shown[i]:
+                    board[i] = ROW_CELLS[row]
+                    shown[i] = row
+        piece = game.current_piece
+        self.piece[:] = [piece.kind, piece.rotation, piece.x, piece.y, game.next_piece.kind,
+                         *game.upcoming(PREVIEW - 1)]
+
+    def action_mask(self):
+        # place 模式中当前方块合法的动作（只读的共享数组，不要修改）
+        return PLACEMENT_MASKS[self.game.current_piece.kind]
+
+    def info(self):
+        game = self.game
+        return {'score': game.score, 'lines': game.lines, 'pieces': game.pieces, 'seed': game.seed}
+
+
+class VectorEnv:
+    # 同时运行 count 个环境；观测是 (count, ...) 的大数组，每个环境直接写入自己的那一行
+    # 某个环境结束或截断后立即重新开始，这一步返回的是新一局的初始观测，
+    # terminated/truncated 标出哪些环境在这一步结束，info['score'] 是它们结束时的分数
+    # 指定 seed 时第 k 局（按开始顺序）使用种子 seed + k，整个运行可以重现
+    def __init__(self, count, action_mode='place', seed=None, **kwargs):
+        self.count = count
+        self.boards = np.zeros((count, GRID_HEIGHT, GRID_WIDTH), dtype=np.uint8)
+        self.pieces = np.zeros((count, PIECE_FIELDS), dtype=np.int16)
+        self.observation = {'board': self.boards, 'piece': self.pieces}
+        self.envs = [TetrisEnv(action_mode, board=self.boards[i], piece=self.pieces[i], **kwargs)
+                     for i in range(count)]
+        self.actions = self.envs[0].actions
+        self.rewards = np.zeros(count, dtype=np.int64)
+        self.terminated = np.zeros(count, dtype=bool)
+        self.truncated = np.zeros(count, dtype=bool)
+        self.scores = np.zeros(count, dtype=np.int64)
+        self.seed = seed
+        self.episodes = 0  # 已开始的局数
+
+    def next_seed(self):
+        if self.seed is None:
+            return None
+        seed = self.seed + self.episodes
+        self.episodes += 1
+        return seed
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+            self.episodes = 0
+        for env in self.envs:
+            env.reset(self.next_seed())
+        self.scores[:] = 0
+        return self.observation, {'score': self.scores}
+
+    def step(self, actions):
+        rewards = []
+        terminated = []
+        truncated = []
+        scores = []
+        for env, action in zip(self.envs, np.asarray(actions).tolist()):
+            _, reward, done, cut, info = env.step(action)
+            rewards.append(reward)
+            terminated.append(done)
+            truncated.append(cut)
+            scores.append(info['score'])
+            if done or cut:
+                env.reset(self.next_seed())
+        self.rewards[:] = rewards
+        self.terminated[:] = terminated
+        self.truncated[:] = truncated
+        self.scores[:] = scores
+        return self.observation, self.rewards, self.terminated, self.truncated, {'score': self.scores}
+
+    def action_masks(self):
+        # (count, PLACEMENTS)，place 模式中各环境当前方块合法的动作
+        return PLACEMENT_MASKS[self.pieces[:, 0]]
@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+# 方块的旋转状态表：导入时把每种形状的所有旋转状态展开成不可变的表，
+# 运行时旋转和绘制只需要查表，不再分配新的形状
+
+# shape: 形状矩阵（元组）
+# cells: 已占用格子相对左上角的偏移 (dx, dy)
+# masks: 每行的位掩码（第 j 位对应第 j 列），供位棋盘使用
+# left/right: 已占用格子的最左列和最右列
+# width/height: 形状的外框宽度和高度
+# spawn_x: 以该状态出现在棋盘顶部时的列坐标
+# bottoms: 每个被占用列的 (dx, 该列最低格子的 dy)，用于直接计算落点
+RotationState = namedtuple(
+    'RotationState',
+    ['shape', 'cells', 'masks', 'left', 'right', 'width', 'height', 'spawn_x', 'bottoms'])
+
+ROTATIONS = 4  # 每种方块的旋转状态数
+
+
+def rotate_shape(shape):
+    # 顺时针旋转形状
+    return tuple(tuple(row) for row in zip(*shape[::-1]))
+
+
+def build_state(shape, grid_width):
+    shape = tuple(tuple(row) for row in shape)
+    cells = []
+    masks = []
+    for dy, row in enumerate(shape):
+        mask = 0
+        for dx, cell in enumerate(row):
+            if cell:
+                cells.append((dx, dy))
+                mask |= 1 << dx
+        masks.append(mask)
+    columns = [dx for dx, _ in cells]
+    width = len(shape[0])
+    bottoms = {}
+    for dx, dy in cells:
+        bottoms[dx] = max(bottoms.get(dx, dy), dy)
+    return RotationState(
+        shape=shape,
+        cells=tuple(cells),
+        masks=tuple(masks),
+        left=min(columns),
+        right=max(columns),
+        width=width,
+        height=len(shape),
+        spawn_x=grid_width // 2 - width // 2,
+        bottoms=tuple(sorted(bottoms.items())),
+    )
+
+
+def build_piece_table(shapes, grid_width):
+    # 返回 table[kind][rotation] -> RotationState
+    table = []
+    for shape in shapes:
+        states = []
+        for _ in range(ROTATIONS):
+            states.append(build_state(shape, grid_width))
+            shape = rotate_shape(shape)
+        table.append(tuple(states))
+    return tuple(table)
+
+
+class Piece:
+    # 当前方块只记录种类、旋转状态和位置
+    __slots__ = ('kind', 'rotation', 'x', 'y')
+
+    def __init__(self, kind, rotation, x, y):
+        self.kind = kind
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+
+    def copy(self):
+        return Piece(self.kind, self.rotation, self.x, self.y)
+
+    def __eq__(self, other):
+        if not isinstance(other, Piece):
+            return NotImplemented
+        return (self.kind == other.kind and self.rotation == other.rotation and
+                self.x == other.x and self.y == other.y)
+
+    def __repr__(self):
+        return f"Piece(kind={self.kind}, rotation={self.rotation}, x={self.x}, y={self.y})"
@@ -0,0 +1,170 @@
+import csv
+import json
+import time
+from collections import namedtuple
+
+# 帧耗时分析：把主循环的每一帧分成几个阶段计时，最近若干帧保存在环形缓冲区里，
+# 用于计算 p50/p95/p99、在界面上显示，以及退出时导出 CSV 或 Chrome trace（chrome://tracing）
+# 阶段可以嵌套（例如硬降时的 clear 在 events 之内），统计时每个阶段只计自身耗时，不含嵌套的子阶段
+#
+#   wait     pygame.event.wait 等待输入或下一次下落（空闲，不计入帧耗时）
+#   events   处理按键
+#   gravity  GameClock 推进重力下落
+#   clear    消行
+#   draw     绘制
+#   flip     display.flip / display.update
+#   font     加载字体文件
+#   audio    初始化混音器并解码音效（主菜单第一帧显示之后一次）
+#   save     保存分数和回放
+
+PHASES = ('wait', 'events', 'gravity', 'clear', 'draw', 'flip', 'font', 'audio', 'save')
+HISTORY = 1024  # 环形缓冲区保存的帧数
+PERCENTILES = (50, 95, 99)
+
+# 时间都是纳秒；elapsed 是整帧时间，work 是去掉等待后的帧耗时；
+# spans 是 [(阶段, 开始时间, 耗时)]，用于导出 trace
+Frame = namedtuple('Frame', ['start', 'elapsed', 'work', 'phases', 'spans'])
+
+
+def percentile(values, fraction):
+    # values 需已排序，取最近秩
+    index = min(len(values) - 1, max(0, round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+class NullPhase:
+    # 未开启分析时使用，不做任何事
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_PHASE = NullPhase()
+
+
+class PhaseTimer:
+    __slots__ = ('profiler', 'name', 'start', 'children')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.children = 0
+
+    def __enter__(self):
+        self.profiler.stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter_ns() - self.start
+        profiler = self.profiler
+        profiler.stack.pop()
+        if profiler.stack:
+            profiler.stack[-1].children += duration
+        profiler.times[self.name] += duration - self.children
+        profiler.spans.append((self.name, self.start, duration))
+
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY):
+        self.enabled = False
+        self.history = history
+        self.frames = [None] * history
+        self.count = 0  # 已记录的总帧数
+        self.frame_start = None
+        self.times = None
+        self.spans = None
+        self.stack = []
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = time.perf_counter_ns()
+        self.times = dict.fromkeys(PHASES, 0)
+        self.spans = []
+        self.stack.clear()
+
+    def phase(self, name):
+        # 用法：with profiler.phase('draw'): ...
+        if self.frame_start is None:
+            return NULL_PHASE
+        return PhaseTimer(self, name)
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        elapsed = time.perf_counter_ns() - self.frame_start
+        # 帧耗时不含空闲等待
+        work = elapsed - self.times['wait']
+        self.frames[self.count % self.history] = Frame(self.frame_start, elapsed, work, self.times,
+                                                       self.spans)
+        self.count += 1
+        self.frame_start = None
+
+    def recent(self, count=None):
+        # 最近的帧，按时间从旧到新
+        available = min(self.count, self.history)
+        if count is None or count > available:
+            count = available
+        return [self.frames[i % self.history] for i in range(self.count - count, self.count)]
+
+    def percentiles(self, phase=None, frames=None):
+        # 帧耗时（或某个阶段耗时）的 p50/p95/p99，单位毫秒
+        if frames is None:
+            frames = self.recent()
+        if not frames:
+            return dict.fromkeys(PERCENTILES, 0.0)
+        values = sorted(frame.work if phase is None else frame.phases[phase] for frame in frames)
+        return {p: percentile(values, p / 100) / 1e6 for p in PERCENTILES}
+
+    def summary(self):
+        # 返回 [(名称, {百分位: 毫秒}, 最大毫秒)]，第一行是整帧
+        frames = self.recent()
+        rows = [('frame', self.percentiles(None, frames),
+                 max((frame.work for frame in frames), default=0) / 1e6)]
+        for phase in PHASES:
+            rows.append((phase, self.percentiles(phase, frames),
+                         max((frame.phases[phase] for frame in frames), default=0) / 1e6))
+        return rows
+
+    def print_summary(self):
+        print(f"最近 {min(self.count, self.history)} 帧（共 {self.count} 帧），单位毫秒")
+        print(f"{'阶段':<10}{'P50':>8}{'P95':>8}{'P99':>8}{'最大':>8}")
+        for name, values, worst in self.summary():
+            print(f"{name:<10}{values[50]:>8.2f}{values[95]:>8.2f}{values[99]:>8.2f}{worst:>8.2f}")
+
+    def dump(self, path):
+        # 按扩展名导出：.json 为 Chrome trace，其它为 CSV
+        if path.endswith('.json'):
+            self.dump_trace(path)
+        else:
+            self.dump_csv(path)
+
+    def dump_csv(self, path):
+        # 每帧一行，时间单位微秒
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'start_us', 'work_us'] + [f'{phase}_us' for phase in PHASES])
+            first = self.count - min(self.count, self.history)
+            for i, frame in enumerate(self.recent(), first):
+                writer.writerow([i, frame.start // 1000, frame.work // 1000] +
+                                [frame.phases[phase] // 1000 for phase in PHASES])
+
+    def dump_trace(self, path):
+        # Chrome trace 的完整事件（ph=X），时间单位微秒；嵌套的阶段按时间自动显示为层级
+        events = []
+        for frame in self.recent():
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': frame.start / 1000, 'dur': frame.elapsed / 1000,
+                           'args': {'work_ms': frame.work / 1e6}})
+            for name, start, duration in frame.spans:
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': start / 1000, 'dur': duration / 1000})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+# 全局实例，默认关闭；关闭时 phase() 返回空操作
+profiler = FrameProfiler()
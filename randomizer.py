@@ -0,0 +1,52 @@
+import random
+from collections import deque
+from itertools import islice
+
+# 方块生成器：每局一个独立的 random.Random(seed)，不与全局 random 共享状态，
+# 同一种子、同一模式总是生成相同的方块序列
+# random: 每个方块独立均匀随机；bag: 7-bag，每 7 个方块是所有种类的一个随机排列
+
+MODES = ('random', 'bag')
+LOOKAHEAD = 6  # 预先生成并可供预览和 AI 查看的方块数
+
+
+def new_seed():
+    # 未指定种子时从系统随机源取一个，同样不影响全局 random
+    return random.SystemRandom().getrandbits(32)
+
+
+class Randomizer:
+    def __init__(self, kinds, seed=None, mode='random', lookahead=LOOKAHEAD):
+        if mode not in MODES:
+            raise ValueError(f"未知的随机模式 {mode}，可选 {', '.join(MODES)}")
+        self.kinds = kinds
+        self.seed = new_seed() if seed is None else seed
+        self.mode = mode
+        self.lookahead = lookahead
+        self.rng = random.Random(self.seed)
+        self.queue = deque()
+        self.count = 0  # 已取出的方块数
+        self.fill()
+
+    def fill(self):
+        rng = self.rng
+        queue = self.queue
+        while len(queue) < self.lookahead:
+            if self.mode == 'bag':
+                bag = list(range(self.kinds))
+                rng.shuffle(bag)
+                queue.extend(bag)
+            else:
+                queue.append(rng.randrange(self.kinds))
+
+    def next(self):
+        # 取出下一个方块种类
+        kind = self.queue.popleft()
+        self.count += 1
+        if len(self.queue) < self.lookahead:
+            self.fill()
+        return kind
+
+    def peek(self, count=LOOKAHEAD):
+        # 接下来会取出的方块种类（不取出），最多 lookahead 个
+        return list(islice(self.queue, count))
@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+
+from engine import TetrisEngine
+from randomizer import MODES
+
+# 对局回放：记录种子、难度、随机模式和带时间戳的操作序列，用 varint 紧凑编码
+# 回放时用 TetrisEngine.advance 推进到每个操作的游戏时间再执行操作，结果与原局完全相同
+#
+# 文件格式（所有整数都是无符号 varint）：
+#   MAGIC, 版本, 种子, 难度, 随机模式序号
+#   每个操作：(距上一个操作的毫秒数 << 3) | 操作码
+#   结束标记：(距最后一个操作的毫秒数 << 3) | END，然后是最终分数、行数、方块数
+
+MAGIC = b'TRPL'
+VERSION = 1
+REPLAY_DIR = 'replays'
+
+# 操作码，与 main() 中处理的按键一一对应
+END = 0
+LEFT = 1
+RIGHT = 2
+ROTATE = 3
+SOFT_DROP = 4
+HARD_DROP = 5
+ACTION_NAMES = {LEFT: 'left', RIGHT: 'right', ROTATE: 'rotate', SOFT_DROP: 'soft_drop',
+                HARD_DROP: 'hard_drop'}
+
+
+class ReplayError(Exception):
+    pass
+
+
+def apply_action(game, action):
+    # 游戏中的按键和回放都通过这里修改游戏状态
+    piece = game.current_piece
+    if action == LEFT:
+        if game.valid_move(piece, piece.x - 1, piece.y):
+            piece.x -= 1
+    elif action == RIGHT:
+        if game.valid_move(piece, piece.x + 1, piece.y):
+            piece.x += 1
+    elif action == ROTATE:
+        game.rotate_piece(piece)
+    elif action == SOFT_DROP:
+        game.drop_piece()
+    elif action == HARD_DROP:
+        game.hard_drop()
+
+
+def write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError("回放文件不完整")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    def __init__(self, seed, difficulty, randomizer='random', events=None,
+                 end_time=0, score=0, lines=0, pieces=0):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.randomizer = randomizer
+        self.events = events if events is not None else []  # [(游戏时间毫秒, 操作码)]
+        self.end_time = end_time
+        self.score = score
+        self.lines = lines
+        self.pieces = pieces
+
+    def to_bytes(self):
+        out = bytearray(MAGIC)
+        for value in (VERSION, self.seed, self.difficulty, MODES.index(self.randomizer)):
+            write_varint(out, value)
+        last = 0
+        for time_ms, action in self.events:
+            write_varint(out, (time_ms - last) << 3 | action)
+            last = time_ms
+        write_varint(out, (self.end_time - last) << 3 | END)
+        for value in (self.score, self.lines, self.pieces):
+            write_varint(out, value)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ReplayError("不是回放文件")
+        pos = len(MAGIC)
+        version, pos = read_varint(data, pos)
+        if version != VERSION:
+            raise ReplayError(f"不支持的回放版本 {version}")
+        seed, pos = read_varint(data, pos)
+        difficulty, pos = read_varint(data, pos)
+        mode, pos = read_varint(data, pos)
+        events = []
+        time_ms = 0
+        while True:
+            value, pos = read_varint(data, pos)
+            time_ms += value >> 3
+            action = value & 7
+            if action == END:
+                break
+            events.append((time_ms, action))
+        score, pos = read_varint(data, pos)
+        lines, pos = read_varint(data, pos)
+        pieces, pos = read_varint(data, pos)
+        return cls(seed, difficulty, MODES[mode], events, time_ms, score, lines, pieces)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 先写到同目录的临时文件并落盘，再整体替换：中途崩溃不会留下半截的回放文件
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self.to_bytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    # 跟随一局游戏记录操作；操作的时间取 game.time_ms，暂停期间不计时
+    def __init__(self, game):
+        self.replay = Replay(game.seed, game.difficulty, game.randomizer.mode)
+        self.finished = False
+
+    def record(self, game, action):
+        self.replay.events.append((game.time_ms, action))
+
+    def finish(self, game):
+        # 写入结束时间和最终结果，返回完整的 Replay
+        replay = self.replay
+        replay.end_time = game.time_ms
+        replay.score = game.score
+        replay.lines = game.lines
+        replay.pieces = game.pieces
+        self.finished = True
+        return replay
+
+
+def replay_path(replay, directory=REPLAY_DIR):
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory, f"{stamp}-{replay.seed}-{replay.score}.replay")
+
+
+def play(replay):
+    # 无界面重新运行回放，返回结束时的游戏
+    game = TetrisEngine(replay.difficulty, replay.seed, replay.randomizer)
+    for time_ms, action in replay.events:
+        game.advance(time_ms - game.time_ms)
+        if game.game_over:
+            break
+        apply_action(game, action)
+    game.advance(replay.end_time - game.time_ms)
+    return game
+
+
+def verify(replay):
+    # 重新运行并与记录的结果比较，不一致时抛出 ReplayError
+    game = play(replay)
+    recorded = (replay.score, replay.lines, replay.pieces)
+    actual = (game.score, game.lines, game.pieces)
+    if actual != recorded:
+        raise ReplayError(f"回放结果不一致：记录 {recorded}，重新运行 {actual}")
+    return game
+
+
+def main(paths):
+    # 运行方式：python replay.py 回放文件...
+    failed = 0
+    for path in paths:
+        replay = Replay.load(path)
+        start = time.perf_counter()
+        try:
+            verify(replay)
+            status = "一致"
+        except ReplayError as e:
+            status = str(e)
+            failed += 1
+        elapsed = time.perf_counter() - start
+        speed = replay.end_time / 1000 / elapsed if elapsed else float('inf')
+        print(f"{path}: 分数 {replay.score}  {len(replay.events)} 个操作  "
+              f"{speed:,.0f} 倍速  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,200 @@
+import mmap
+import os
+import statistics
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from engine import DIFFICULTY_NAMES
+from replay import Replay
+
+# 回放归档：大量回放首尾相接地追加到一个数据文件，另有一个定长记录的索引文件
+#   ARCHIVE.dat  回放的二进制内容（与单个 .replay 文件相同）
+#   ARCHIVE.idx  文件头 + 每局一条定长记录：偏移、长度、分数、日期、难度
+# 读取时两个文件都通过 mmap 映射，只按需访问用到的部分，不把整个归档读入内存
+
+INDEX_MAGIC = b'TRIX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<4sI')
+# 偏移(8) 长度(4) 分数(4) 日期 Unix 秒(4) 难度(1) 填充(3)，共 24 字节
+INDEX_RECORD = struct.Struct('<QIIIB3x')
+
+IndexEntry = namedtuple('IndexEntry', ['offset', 'length', 'score', 'date', 'difficulty'])
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_paths(path):
+    return path + '.dat', path + '.idx'
+
+
+class ArchiveWriter:
+    # 只追加：先写回放数据，再写索引记录，中途中断时索引里不会出现不完整的回放
+    def __init__(self, path):
+        data_path, index_path = archive_paths(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.data = open(data_path, 'ab')
+        self.index = open(index_path, 'ab')
+        if self.index.tell() == 0:
+            self.index.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+        else:
+            # 去掉上次中断时写了一半的索引记录
+            size = self.index.tell()
+            remainder = (size - INDEX_HEADER.size) % INDEX_RECORD.size
+            if remainder:
+                self.index.truncate(size - remainder)
+                self.index.seek(0, os.SEEK_END)
+
+    def append(self, replay, date=None):
+        data = replay.to_bytes()
+        offset = self.data.seek(0, os.SEEK_END)
+        self.data.write(data)
+        self.data.flush()
+        if date is None:
+            date = int(time.time())
+        self.index.write(INDEX_RECORD.pack(offset, len(data), replay.score, date, replay.difficulty))
+        self.index.flush()
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def map_file(path):
+    # 空文件不能映射，返回空的 bytes
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ArchiveReader:
+    # 打开时的归档快照；之后追加的回放需要重新打开才能看到
+    def __init__(self, path):
+        data_path, index_path = archive_paths(path)
+        self.data = self.index = b''
+        try:
+            self.data = map_file(data_path)
+            self.index = map_file(index_path)
+            if len(self.index) < INDEX_HEADER.size:
+                raise ArchiveError(f"{index_path} 不是回放归档索引")
+            magic, version = INDEX_HEADER.unpack_from(self.index, 0)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ArchiveError(f"{index_path} 不是回放归档索引")
+        except Exception:
+            # 打开失败时先解除已经建立的映射再抛出
+            self.unmap()
+            raise
+        self.count = (len(self.index) - INDEX_HEADER.size) // INDEX_RECORD.size
+        self.view = memoryview(self.data)
+        self.index_view = memoryview(self.index)
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return IndexEntry._make(INDEX_RECORD.unpack_from(self.index, INDEX_HEADER.size + i * INDEX_RECORD.size))
+
+    def entries(self):
+        # 按顺序遍历索引记录，不解析回放
+        end = INDEX_HEADER.size + self.count * INDEX_RECORD.size
+        for fields in INDEX_RECORD.iter_unpack(self.index_view[INDEX_HEADER.size:end]):
+            yield IndexEntry._make(fields)
+
+    def select(self, difficulty=None, min_score=None, since=None, until=None):
+        # 只看索引筛选对局，返回 (序号, 索引记录)
+        for i, entry in enumerate(self.entries()):
+            if difficulty is not None and entry.difficulty != difficulty:
+                continue
+            if min_score is not None and entry.score < min_score:
+                continue
+            if since is not None and entry.date < since:
+                continue
+            if until is not None and entry.date >= until:
+                continue
+            yield i, entry
+
+    def raw(self, i):
+        # 第 i 局回放的原始字节，是借出的映射内存视图，不复制
+        # 用完后调用 release() 或用 with 块；close() 之后仍未释放的视图会让映射延迟到它们释放后才解除
+        entry = self.entry(i)
+        return self.view[entry.offset:entry.offset + entry.length]
+
+    def replay(self, i):
+        with self.raw(i) as data:
+            return Replay.from_bytes(data)
+
+    def unmap(self):
+        for mapped in (self.data, self.index):
+            if isinstance(mapped, mmap.mmap):
+                try:
+                    mapped.close()
+                except BufferError:
+                    # 还有借出的视图（raw() 的结果或未遍历完的 entries()），映射在它们释放后随对象回收解除
+                    pass
+        self.data = self.index = b''
+
+    def close(self):
+        self.view.release()
+        self.index_view.release()
+        self.unmap()
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add(path, files):
+    with ArchiveWriter(path) as writer:
+        for name in files:
+            # 用文件的修改时间作为对局日期
+            writer.append(Replay.load(name), int(os.path.getmtime(name)))
+    print(f"已添加 {len(files)} 局到 {path}")
+
+
+def stats(path):
+    # 只读取索引，按难度汇总局数和分数
+    scores = {}
+    with ArchiveReader(path) as archive:
+        for entry in archive.entries():
+            scores.setdefault(entry.difficulty, []).append(entry.score)
+        total = len(archive)
+    print(f"{path}: 共 {total} 局")
+    for difficulty in sorted(scores):
+        values = scores[difficulty]
+        print(f"{DIFFICULTY_NAMES[difficulty]}: {len(values)} 局  平均 {statistics.fmean(values):.1f}  "
+              f"中位数 {statistics.median(values)}  最高 {max(values)}")
+
+
+def main(argv):
+    # 运行方式：
+    #   python replay_archive.py add 归档路径 回放文件...
+    #   python replay_archive.py stats 归档路径
+    if len(argv) >= 2 and argv[0] == 'add':
+        add(argv[1], argv[2:])
+    elif len(argv) == 2 and argv[0] == 'stats':
+        stats(argv[1])
+    else:
+        print("用法: replay_archive.py add 归档路径 回放文件... | stats 归档路径")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,526 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import struct
+import sys
+import time
+
+from engine import DIFFICULTY_NAMES, GRID_HEIGHT, TetrisEngine, monotonic_ms
+from profiler import percentile
+from randomizer import MODES
+from replay import HARD_DROP, LEFT, ReplayRecorder, apply_action
+from replay_archive import ArchiveWriter
+
+# 对局服务器：用 asyncio 托管无界面的权威对局（TetrisEngine），客户端只发送操作，
+# 所有对局由一个定时任务统一推进（每 TICK_MS 一次），每次只广播自上次以来的变化：
+# 变化的行（位掩码）、当前方块位置和分数；完整棋盘只在加入对局时发送一次
+#
+# 消息：帧头（负载长度 u16，类型 u8）+ 负载，整数都是小端
+# 客户端 -> 服务器
+#   JOIN     角色 u8（PLAY/WATCH），难度 u8，随机模式序号 u8，是否指定种子 u8，种子 u32，对局编号 u32
+#            PLAY 开始一局新游戏（比赛时各选手指定同一种子，方块序列相同）；WATCH 观看编号对应的对局
+#   INPUT    操作码 u8（replay.py 的 LEFT..HARD_DROP）
+#   LEAVE    离开当前对局（选手离开时对局结束）
+# 服务器 -> 客户端
+#   SNAPSHOT 对局编号 u32，种子 u32，难度 u8，GRID_HEIGHT 行 u16 位掩码，状态
+#   DELTA    对局编号 u32，变化行标记 u32（第 i 位表示第 i 行变化），各变化行 u16，状态
+#   END      对局编号 u32，分数 u32，行数 u32，方块数 u32
+#   ERROR    UTF-8 文本
+# 状态：方块种类 u8，旋转状态 u8，列 i8，行 i8，下一个方块 u8，分数 u32，行数 u32，方块数 u32
+#
+# 背压：写入从不等待。某个连接的发送缓冲超过 HIGH_WATER 时本轮跳过它，缓冲排空后
+# 发送一条与它上次收到的棋盘比较的合并增量；连续 MAX_LAG_TICKS 轮排不空就断开
+# 每个连接每轮最多处理 MAX_INPUTS_PER_TICK 个操作，多余的丢弃
+
+HOST = '127.0.0.1'
+PORT = 7420
+TICK_MS = 50
+HIGH_WATER = 16 * 1024  # 发送缓冲超过该字节数时视为拥塞
+MAX_LAG_TICKS = 100  # 连续拥塞这么多轮后断开（默认 5 秒）
+MAX_INPUTS_PER_TICK = 8
+HISTORY = 1024  # 统计最近这么多轮的耗时
+BACKLOG = 1024  # 比赛开始时大量连接同时到达，默认的 100 会让一部分连接重试
+
+# 消息类型
+JOIN = 1
+INPUT = 2
+LEAVE = 3
+SNAPSHOT = 16
+DELTA = 17
+END = 18
+ERROR = 19
+
+# JOIN 的角色
+PLAY = 0
+WATCH = 1
+
+HEADER = struct.Struct('<HB')
+JOIN_MESSAGE = struct.Struct('<BBBBII')
+INPUT_MESSAGE = struct.Struct('<B')
+SNAPSHOT_HEAD = struct.Struct('<IIB')
+SNAPSHOT_ROWS = struct.Struct(f'<{GRID_HEIGHT}H')
+DELTA_HEAD = struct.Struct('<II')
+STATUS = struct.Struct('<BBbbBIII')
+END_MESSAGE = struct.Struct('<IIII')
+ROW_VALUES = [struct.Struct(f'<{n}H') for n in range(GRID_HEIGHT + 1)]  # 按变化行数取
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def frame(kind, payload=b''):
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def game_status(game):
+    piece = game.current_piece
+    return (piece.kind, piece.rotation, piece.x, piece.y, game.next_piece.kind,
+            game.score, game.lines, game.pieces)
+
+
+def encode_snapshot(game_id, seed, difficulty, rows, status):
+    return frame(SNAPSHOT, SNAPSHOT_HEAD.pack(game_id, seed, difficulty) + SNAPSHOT_ROWS.pack(*rows)
+                 + STATUS.pack(*status))
+
+
+def encode_delta(game_id, old_rows, new_rows, status):
+    changed = 0
+    values = []
+    if old_rows != new_rows:
+        for i, row in enumerate(new_rows):
+            if row != old_rows[i]:
+                changed |= 1 << i
+                values.append(row)
+    return frame(DELTA, DELTA_HEAD.pack(game_id, changed) + ROW_VALUES[len(values)].pack(*values)
+                 + STATUS.pack(*status))
+
+
+class HostedGame:
+    # 服务器上的一局：权威的 TetrisEngine、选手、观众和最近一次广播的状态
+    # view 是 (各行位掩码, 状态)，每次变化都换成新的元组；连接记住自己收到的 view，
+    # 与对局的 view 是同一个对象就说明已同步
+    def __init__(self, game_id, difficulty=1, seed=None, randomizer='random'):
+        self.id = game_id
+        self.engine = TetrisEngine(difficulty, seed, randomizer)
+        self.recorder = ReplayRecorder(self.engine)
+        self.player = None
+        self.subscribers = set()  # 选手和观众
+        self.view = (self.engine.board.rows.copy(), game_status(self.engine))
+        self.stale = False  # 是否有连接因拥塞还没收到最新的 view
+
+    def snapshot(self):
+        rows, status = self.view
+        return encode_snapshot(self.id, self.engine.seed, self.engine.difficulty, rows, status)
+
+    def input(self, action):
+        engine = self.engine
+        if not engine.game_over:
+            self.recorder.record(engine, action)
+            apply_action(engine, action)
+
+    def broadcast(self):
+        # 状态有变化时，把同一条增量发给所有已同步的连接，其余连接单独合并
+        engine = self.engine
+        rows = engine.board.rows
+        status = game_status(engine)
+        previous = self.view
+        if rows == previous[0] and status == previous[1]:
+            if self.stale:
+                self.stale = not all([conn.catch_up(self) for conn in self.subscribers])
+            return
+        view = self.view = (rows.copy(), status)
+        shared = None
+        stale = False
+        for conn in self.subscribers:
+            if conn.view is previous and not conn.congested():
+                if shared is None:
+                    shared = encode_delta(self.id, previous[0], view[0], status)
+                conn.send(shared)
+                conn.view = view
+                conn.lag = 0
+            elif not conn.catch_up(self):
+                stale = True
+        self.stale = stale
+
+    def result(self):
+        engine = self.engine
+        return frame(END, END_MESSAGE.pack(self.id, engine.score, engine.lines, engine.pieces))
+
+
+class Connection:
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.transport = writer.transport
+        self.game = None
+        self.view = None  # 最近一次发给该连接的对局状态
+        self.lag = 0  # 连续拥塞的轮数
+        self.input_tick = -1
+        self.inputs = 0
+        self.closed = False
+        self.task = None
+
+    def congested(self):
+        return self.transport.get_write_buffer_size() > HIGH_WATER
+
+    def send(self, data):
+        if not self.closed:
+            self.server.frames_sent += 1
+            self.server.bytes_sent += len(data)
+            self.writer.write(data)
+
+    def catch_up(self, game):
+        # 把该连接补到对局的最新状态，返回是否已同步
+        if self.view is game.view or self.closed:
+            return True
+        if self.congested():
+            self.lag += 1
+            self.server.congested_ticks += 1
+            if self.lag > MAX_LAG_TICKS:
+                self.server.lag_disconnects += 1
+                self.close()
+                return True
+            return False
+        rows, status = game.view
+        self.send(encode_delta(game.id, self.view[0], rows, status))
+        self.view = game.view
+        self.lag = 0
+        return True
+
+    def close(self):
+        # 缓冲里的数据不再等待发送；连接的清理在 serve 结束时进行
+        if not self.closed:
+            self.closed = True
+            self.transport.abort()
+
+    async def serve(self):
+        try:
+            while True:
+                length, kind = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+                payload = await self.reader.readexactly(length) if length else b''
+                self.handle(kind, payload)
+        except ProtocolError as e:
+            self.send(frame(ERROR, str(e).encode()))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.closed = True
+            self.leave()
+            self.writer.close()
+
+    def handle(self, kind, payload):
+        try:
+            if kind == INPUT:
+                self.input(*INPUT_MESSAGE.unpack(payload))
+            elif kind == JOIN:
+                self.join(*JOIN_MESSAGE.unpack(payload))
+            elif kind == LEAVE:
+                self.leave()
+            else:
+                raise ProtocolError(f"未知的消息类型 {kind}")
+        except struct.error:
+            raise ProtocolError(f"消息 {kind} 的长度 {len(payload)} 不对")
+
+    def input(self, action):
+        game = self.game
+        if game is None or game.player is not self:
+            return
+        if not LEFT <= action <= HARD_DROP:
+            raise ProtocolError(f"未知的操作码 {action}")
+        tick = self.server.ticks
+        if self.input_tick != tick:
+            self.input_tick = tick
+            self.inputs = 0
+        self.inputs += 1
+        if self.inputs > MAX_INPUTS_PER_TICK:
+            self.server.dropped_inputs += 1
+            return
+        game.input(action)
+
+    def join(self, role, difficulty, randomizer, has_seed, seed, game_id):
+        self.leave()
+        if role == PLAY:
+            if difficulty >= len(DIFFICULTY_NAMES) or randomizer >= len(MODES):
+                raise ProtocolError(f"难度 {difficulty} 或随机模式 {randomizer} 不存在")
+            game = self.server.new_game(difficulty, seed if has_seed else None, MODES[randomizer])
+            game.player = self
+        elif role == WATCH:
+            game = self.server.games.get(game_id)
+            if game is None:
+                self.send(frame(ERROR, f"对局 {game_id} 不存在".encode()))
+                return
+        else:
+            raise ProtocolError(f"未知的角色 {role}")
+        game.subscribers.add(self)
+        self.game = game
+        self.view = game.view
+        self.send(game.snapshot())
+
+    def leave(self):
+        game = self.game
+        if game is None:
+            return
+        self.game = None
+        game.subscribers.discard(self)
+        if game.player is self:
+            self.server.end_game(game)
+
+
+class GameServer:
+    def __init__(self, tick_ms=TICK_MS, archive=None):
+        self.tick_ms = tick_ms
+        self.games = {}
+        self.connections = set()
+        self.game_ids = itertools.count(1)
+        self.archive = ArchiveWriter(archive) if archive else None  # 结束的对局追加到回放归档
+        self.ticks = 0
+        self.tick_times = collections.deque(maxlen=HISTORY)
+        self.games_finished = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.dropped_inputs = 0
+        self.congested_ticks = 0
+        self.lag_disconnects = 0
+        self.server = None
+        self.ticker = None
+
+    async def start(self, host=HOST, port=PORT):
+        self.server = await asyncio.start_server(self.accept, host, port, backlog=BACKLOG)
+        self.ticker = asyncio.create_task(self.run_ticks())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def accept(self, reader, writer):
+        conn = Connection(self, reader, writer)
+        conn.task = asyncio.current_task()
+        self.connections.add(conn)
+        try:
+            await conn.serve()
+        finally:
+            self.connections.discard(conn)
+
+    def new_game(self, difficulty=1, seed=None, randomizer='random'):
+        game = HostedGame(next(self.game_ids), difficulty, seed, randomizer)
+        self.games[game.id] = game
+        return game
+
+    def end_game(self, game):
+        if self.games.pop(game.id, None) is None:
+            return
+        self.games_finished += 1
+        result = game.result()
+        for conn in game.subscribers:
+            conn.catch_up(game)
+            conn.send(result)
+            conn.game = None
+        game.subscribers.clear()
+        if self.archive is not None:
+            self.archive.append(game.recorder.finish(game.engine))
+
+    async def run_ticks(self):
+        # 按固定间隔推进；某一轮太慢时不补跑，下一轮按实际经过的时间推进
+        interval = self.tick_ms / 1000
+        deadline = time.perf_counter()
+        last = monotonic_ms()
+        while True:
+            deadline += interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                deadline = time.perf_counter()
+                await asyncio.sleep(0)
+            now = monotonic_ms()
+            start = time.perf_counter()
+            self.tick(now - last)
+            self.tick_times.append(time.perf_counter() - start)
+            last = now
+
+    def tick(self, elapsed_ms):
+        self.ticks += 1
+        ended = []
+        for game in self.games.values():
+            engine = game.engine
+            if not engine.game_over:
+                engine.advance(elapsed_ms)
+            game.broadcast()
+            if engine.game_over:
+                ended.append(game)
+        for game in ended:
+            self.end_game(game)
+
+    def stats(self):
+        times = sorted(self.tick_times)
+        stats = {
+            'games': len(self.games),
+            'connections': len(self.connections),
+            'games_finished': self.games_finished,
+            'ticks': self.ticks,
+            'frames_sent': self.frames_sent,
+            'bytes_sent': self.bytes_sent,
+            'dropped_inputs': self.dropped_inputs,
+            'congested_ticks': self.congested_ticks,
+            'lag_disconnects': self.lag_disconnects,
+        }
+        if times:
+            for p in (50, 99):
+                stats[f'tick_p{p}_ms'] = percentile(times, p / 100) * 1000
+            stats['tick_max_ms'] = times[-1] * 1000
+        return stats
+
+    async def close(self):
+        if self.ticker is not None:
+            self.ticker.cancel()
+        if self.server is not None:
+            self.server.close()
+        connections = list(self.connections)
+        for conn in connections:
+            conn.close()
+        await asyncio.gather(*[conn.task for conn in connections], return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        for game in list(self.games.values()):
+            self.end_game(game)
+        if self.archive is not None:
+            self.archive.close()
+
+
+class ClientBoard:
+    # 客户端按收到的消息维护的对局状态，rows 与服务器上 TetrisEngine.board.rows 的格式相同
+    def __init__(self):
+        self.game_id = None
+        self.seed = None
+        self.difficulty = None
+        self.rows = [0] * GRID_HEIGHT
+        self.status = None
+        self.result = None  # 对局结束时为 (分数, 行数, 方块数)
+
+    def apply(self, kind, payload):
+        if kind == DELTA:
+            game_id, changed = DELTA_HEAD.unpack_from(payload)
+            if game_id != self.game_id:
+                return
+            offset = DELTA_HEAD.size
+            rows = self.rows
+            i = 0
+            while changed:
+                if changed & 1:
+                    rows[i] = int.from_bytes(payload[offset:offset + 2], 'little')
+                    offset += 2
+                changed >>= 1
+                i += 1
+            self.status = STATUS.unpack_from(payload, offset)
+        elif kind == SNAPSHOT:
+            self.game_id, self.seed, self.difficulty = SNAPSHOT_HEAD.unpack_from(payload)
+            self.rows = list(SNAPSHOT_ROWS.unpack_from(payload, SNAPSHOT_HEAD.size))
+            self.status = STATUS.unpack_from(payload, SNAPSHOT_HEAD.size + SNAPSHOT_ROWS.size)
+            self.result = None
+        elif kind == END:
+            game_id, score, lines, pieces = END_MESSAGE.unpack(payload)
+            if game_id == self.game_id:
+                self.result = (score, lines, pieces)
+        elif kind == ERROR:
+            raise ProtocolError(payload.decode())
+
+
+class GameClient:
+    # 连接服务器的客户端，按收到的消息更新 board
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.board = ClientBoard()
+        self.receiver = None
+        self.error = None  # 服务器返回的错误
+        self.frames = 0
+        self.bytes = 0
+
+    @classmethod
+    async def connect(cls, host=HOST, port=PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def play(self, difficulty=1, seed=None, randomizer='random'):
+        self.writer.write(frame(JOIN, JOIN_MESSAGE.pack(PLAY, difficulty, MODES.index(randomizer),
+                                                        seed is not None, seed or 0, 0)))
+
+    def watch(self, game_id):
+        self.writer.write(frame(JOIN, JOIN_MESSAGE.pack(WATCH, 0, 0, 0, 0, game_id)))
+
+    def send_input(self, action):
+        self.writer.write(frame(INPUT, INPUT_MESSAGE.pack(action)))
+
+    def leave(self):
+        self.writer.write(frame(LEAVE))
+
+    async def receive(self):
+        # 读取并处理一条消息，返回消息类型；连接关闭时抛出 asyncio.IncompleteReadError
+        length, kind = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+        payload = await self.reader.readexactly(length) if length else b''
+        self.frames += 1
+        self.bytes += HEADER.size + length
+        self.board.apply(kind, payload)
+        return kind
+
+    def listen(self):
+        # 在后台持续接收，直到对局结束或连接关闭
+        self.receiver = asyncio.create_task(self.receive_until_end())
+        return self.receiver
+
+    async def receive_until_end(self):
+        try:
+            while await self.receive() != END:
+                pass
+        except ProtocolError as e:
+            self.error = str(e)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def close(self):
+        if self.receiver is not None:
+            self.receiver.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def simulated_player(client, rng, actions_per_second=4, duration=10):
+    # 本机回环测试用的选手：在 duration 秒内随机操作，对局先结束就提前返回
+    # 调用前先 play() 和 listen()，返回后连接仍然打开，可以继续比较 client.board
+    deadline = time.monotonic() + duration
+    while not client.receiver.done() and time.monotonic() < deadline:
+        await asyncio.sleep(rng.expovariate(actions_per_second))
+        # 移动和旋转为主，偶尔硬降
+        client.send_input(HARD_DROP if rng.random() < 0.1 else rng.randint(LEFT, HARD_DROP - 1))
+
+
+async def serve(host, port, tick_ms, archive):
+    server = GameServer(tick_ms, archive)
+    port = await server.start(host, port)
+    print(f"对局服务器已启动 {host}:{port}，每 {tick_ms} ms 推进一次")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        print(server.stats())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='托管权威对局并广播棋盘增量的服务器')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--tick-ms', type=int, default=TICK_MS, help='推进所有对局的间隔（毫秒）')
+    parser.add_argument('--archive', help='结束的对局追加到该回放归档')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.tick_ms, args.archive))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
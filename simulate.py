@@ -0,0 +1,255 @@
+import argparse
+import importlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from ai import ai_policy
+from engine import DIFFICULTY_NAMES, GRID_HEIGHT, GRID_WIDTH, PIECE_TABLE, SCORE_MULTIPLIERS, TetrisEngine
+from pieces import ROTATIONS
+from profiler import percentile
+from randomizer import MODES
+
+# 多进程无界面对局模拟：每局一个种子，结果逐行写入 JSONL 文件，
+# 中断后再次运行会跳过已完成的对局；最后按难度汇总分数分布
+# 运行方式：python simulate.py --games 10000 --policy lowest
+
+DEFAULT_OUTPUT = 'simulations.jsonl'
+GAMES_PER_TASK = 16  # 每个进程任务包含的对局数，减少进程间通信
+INPUT_MS = 150  # 每次按键（旋转或平移一格）占用的游戏时间，重力在这段时间里照常下落
+
+
+# 策略接收游戏和该局的随机数生成器，返回当前方块的目标 (旋转状态, 列)
+
+def random_policy(game, rng):
+    # 随机选择旋转状态和列
+    piece = game.current_piece
+    rotation = rng.randrange(ROTATIONS)
+    state = PIECE_TABLE[piece.kind][rotation]
+    return rotation, rng.randint(-state.left, GRID_WIDTH - 1 - state.right)
+
+
+def lowest_policy(game, rng):
+    # 按列高度计算每个 (旋转状态, 列) 的落点，取最低的
+    piece = game.current_piece
+    heights = game.board.heights
+    best = None
+    for rotation, state in enumerate(PIECE_TABLE[piece.kind]):
+        bottom = max(dy for _, dy in state.cells)
+        for x in range(-state.left, GRID_WIDTH - state.right):
+            depth = min(GRID_HEIGHT - 1 - heights[x + dx] - dy for dx, dy in state.bottoms) + bottom
+            if best is None or depth > best[0]:
+                best = (depth, rotation, x)
+    return best[1], best[2]
+
+
+POLICIES = {
+    'random': random_policy,
+    'lowest': lowest_policy,
+    'ai': ai_policy,
+}
+
+
+def resolve_policy(name):
+    # 内置策略用名字指定，也可以用 "模块:函数" 指定自定义策略
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, function = name.partition(':')
+    if not function:
+        raise ValueError(f"未知策略 {name}，可选 {', '.join(POLICIES)} 或 模块:函数")
+    return getattr(importlib.import_module(module), function)
+
+
+def press(game, piece, input_ms):
+    # 一次按键后推进 input_ms 毫秒；方块已被重力固定或游戏结束时返回 False
+    if input_ms:
+        game.advance(input_ms)
+    return game.current_piece is piece and not game.game_over
+
+
+def play_move(game, rotation, target, input_ms=0):
+    # 与按键操作相同：先旋转，再逐格移动到目标列，最后硬降
+    # input_ms 为 0 时按键不占时间；大于 0 时每次按键后推进游戏时间，下落快的难度里
+    # 方块可能还没到目标列就落到底固定了
+    piece = game.current_piece
+    for _ in range(rotation):
+        game.rotate_piece(piece)
+        if not press(game, piece, input_ms):
+            return
+    step = 1 if target > piece.x else -1
+    while piece.x != target and game.valid_move(piece, piece.x + step, piece.y):
+        piece.x += step
+        if not press(game, piece, input_ms):
+            return
+    game.hard_drop()
+
+
+def play_game(seed, difficulty, policy, max_pieces, randomizer='random', input_ms=INPUT_MS):
+    # 方块序列和策略各用一个由种子决定的随机数生成器，同一种子结果相同
+    rng = random.Random(f"policy:{seed}")
+    start = time.perf_counter()
+    game = TetrisEngine(difficulty, seed, randomizer)
+    while not game.game_over and game.pieces < max_pieces:
+        rotation, x = policy(game, rng)
+        play_move(game, rotation, x, input_ms)
+    return {
+        'seed': seed,
+        'difficulty': difficulty,
+        'input_ms': input_ms,
+        'score': game.score,
+        'lines': game.lines,
+        'pieces': game.pieces,
+        'game_over': game.game_over,
+        'duration': round(time.perf_counter() - start, 6),
+    }
+
+
+def run_task(games, policy_name, max_pieces, randomizer, input_ms):
+    # 在工作进程中运行一组对局
+    policy = resolve_policy(policy_name)
+    results = []
+    for seed, difficulty in games:
+        result = play_game(seed, difficulty, policy, max_pieces, randomizer, input_ms)
+        result['policy'] = policy_name
+        result['randomizer'] = randomizer
+        results.append(result)
+    return results
+
+
+def game_key(record):
+    # 早期的结果没有 randomizer 和 input_ms 字段，都是 random 模式、按键不占时间
+    return (record['seed'], record['difficulty'], record['policy'], record.get('randomizer', 'random'),
+            record.get('input_ms', 0))
+
+
+def load_results(path):
+    # 读取已完成的结果；上次中断时写了一半的最后一行会被截掉
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].decode('utf-8').splitlines():
+        if line.strip():
+            records.append(json.loads(line))
+    return records
+
+
+def plan_games(count, seed, difficulties):
+    # 第 i 局使用种子 seed + i，难度依次轮换
+    return [(seed + i, difficulties[i % len(difficulties)]) for i in range(count)]
+
+
+def run(games, policy_name, output, workers, max_pieces, randomizer='random', input_ms=INPUT_MS):
+    # 只运行 output 中还没有的对局，结果完成一组写一组
+    done = {game_key(record) for record in load_results(output)}
+    pending = [game for game in games
+               if (game[0], game[1], policy_name, randomizer, input_ms) not in done]
+    skipped = len(games) - len(pending)
+    if skipped:
+        print(f"跳过已完成的 {skipped} 局")
+    if not pending:
+        return
+    tasks = [pending[i:i + GAMES_PER_TASK] for i in range(0, len(pending), GAMES_PER_TASK)]
+    finished = 0
+    start = reported = time.perf_counter()
+    with open(output, 'a', encoding='utf-8') as f, ProcessPoolExecutor(workers) as executor:
+        # 同时提交的任务数有上限，避免一次性为大量对局创建 Future
+        tasks = iter(tasks)
+        running = set()
+        while True:
+            while len(running) < workers * 4:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                running.add(executor.submit(run_task, task, policy_name, max_pieces, randomizer, input_ms))
+            if not running:
+                break
+            completed, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                for result in future.result():
+                    f.write(json.dumps(result) + '\n')
+                    finished += 1
+            f.flush()
+            now = time.perf_counter()
+            if now - reported >= 0.5 or not running:
+                reported = now
+                print(f"\r已完成 {finished}/{len(pending)} 局  {finished / (now - start):,.0f} 局/秒",
+                      end='', flush=True)
+    print()
+
+
+def summarize(records):
+    # 按难度汇总分数分布；难度越高下落越快，存活的方块数越少，
+    # 分数除以得分倍数后各难度接近说明倍数正好抵消了难度，用于检查倍数是否平衡
+    summary = {}
+    for difficulty in sorted({record['difficulty'] for record in records}):
+        group = [record for record in records if record['difficulty'] == difficulty]
+        scores = sorted(record['score'] for record in group)
+        multiplier = SCORE_MULTIPLIERS[difficulty]
+        summary[difficulty] = {
+            'games': len(group),
+            'mean': statistics.fmean(scores),
+            'stdev': statistics.pstdev(scores),
+            'min': scores[0],
+            'p10': percentile(scores, 0.1),
+            'p50': percentile(scores, 0.5),
+            'p90': percentile(scores, 0.9),
+            'max': scores[-1],
+            'lines': statistics.fmean(record['lines'] for record in group),
+            'pieces': statistics.fmean(record['pieces'] for record in group),
+            'normalized': statistics.fmean(scores) / multiplier,
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'难度':<6}{'局数':>8}{'平均分':>10}{'标准差':>10}{'P10':>8}{'P50':>8}{'P90':>8}"
+          f"{'最高':>8}{'平均行数':>10}{'平均方块':>10}{'分数/倍数':>10}")
+    for difficulty, row in summary.items():
+        print(f"{DIFFICULTY_NAMES[difficulty]:<6}{row['games']:>8}{row['mean']:>10.1f}"
+              f"{row['stdev']:>10.1f}{row['p10']:>8}{row['p50']:>8}{row['p90']:>8}{row['max']:>8}"
+              f"{row['lines']:>10.2f}{row['pieces']:>10.1f}{row['normalized']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多进程无界面对局模拟')
+    parser.add_argument('--games', type=int, default=1000, help='对局数')
+    parser.add_argument('--seed', type=int, default=0, help='第一局的种子')
+    parser.add_argument('--difficulty', type=int, nargs='+', choices=sorted(SCORE_MULTIPLIERS),
+                        default=sorted(SCORE_MULTIPLIERS), help='轮换使用的难度')
+    parser.add_argument('--policy', default='lowest', help='策略名或 模块:函数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='进程数')
+    parser.add_argument('--randomizer', choices=MODES, default='random', help='方块随机模式')
+    parser.add_argument('--max-pieces', type=int, default=10000, help='每局最多放置的方块数')
+    parser.add_argument('--input-ms', type=int, default=INPUT_MS,
+                        help='每次按键占用的游戏时间（毫秒），0 表示按键不占时间、难度只影响得分倍数')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='结果文件（JSONL）')
+    parser.add_argument('--summary', action='store_true', help='只汇总已有结果，不运行对局')
+    args = parser.parse_args(argv)
+
+    if not args.summary:
+        try:
+            resolve_policy(args.policy)  # 在启动进程前检查策略名
+        except (ValueError, ImportError, AttributeError) as e:
+            parser.error(str(e))
+        games = plan_games(args.games, args.seed, args.difficulty)
+        run(games, args.policy, args.output, args.workers, args.max_pieces, args.randomizer, args.input_ms)
+    records = [record for record in load_results(args.output)
+               if game_key(record)[2:] == (args.policy, args.randomizer, args.input_ms)]
+    if not records:
+        print("没有可汇总的结果")
+        return 1
+    print_summary(summarize(records))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import itertools
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from engine import DIFFICULTY_NAMES
+
+# 分数存储：WAL 模式的 SQLite 数据库，每局一行（分数、难度、时间），
+# 分数、难度和时间都有索引，排行榜和最高分直接查询，不再整文件重写
+# 第一次打开时把旧的 scores.txt 和 high_score.txt 导入数据库（只做一次）
+
+DATABASE = 'scores.db'
+LEGACY_SCORES = 'scores.txt'
+LEGACY_HIGH_SCORE = 'high_score.txt'
+SCHEMA_VERSION = 1  # 记在 PRAGMA user_version 里，0 表示新建的数据库
+WRITE_QUEUE_SIZE = 256  # 后台写入队列的容量
+WRITE_TIMEOUT = 5  # 等待写入线程的最长秒数，超时后记录并丢弃，不让游戏卡住
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    difficulty INTEGER,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+CREATE INDEX IF NOT EXISTS scores_by_difficulty ON scores (difficulty, score DESC);
+CREATE INDEX IF NOT EXISTS scores_by_time ON scores (created_at);
+"""
+
+
+def read_legacy_scores(scores_path, high_score_path):
+    # 旧文件只有分数，没有难度和时间；最高分如果不在排行榜里也作为一条记录
+    scores = []
+    try:
+        with open(scores_path, 'r') as f:
+            scores = [int(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(high_score_path, 'r') as f:
+            high_score = int(f.read())
+        if high_score not in scores:
+            scores.append(high_score)
+    except (OSError, ValueError):
+        pass
+    return [score for score in scores if score > 0]
+
+
+class ScoreStore:
+    def __init__(self, path=DATABASE, legacy_scores=LEGACY_SCORES, legacy_high_score=LEGACY_HIGH_SCORE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 自动提交模式，需要事务时显式 BEGIN
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # WAL 下 NORMAL 只在检查点时同步，写入不再每次等待磁盘
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            self.migrate(legacy_scores, legacy_high_score)
+
+    def migrate(self, legacy_scores, legacy_high_score):
+        # 建表和导入旧文件在同一个事务里，中途失败下次打开会重新导入
+        created_at = int(time.time())
+        rows = [(score, None, created_at)
+                for score in read_legacy_scores(legacy_scores, legacy_high_score)]
+        with self.transaction():
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    self.connection.execute(statement)
+            self.connection.executemany(
+                'INSERT INTO scores (score, difficulty, created_at) VALUES (?, ?, ?)', rows)
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def transaction(self):
+        return Transaction(self.connection)
+
+    def add_scores(self, rows):
+        # 批量写入 (分数, 难度, 时间) ，所有行在一个事务里提交；时间为 None 时取当前时间
+        now = int(time.time())
+        rows = [(score, difficulty, now if created_at is None else created_at)
+                for score, difficulty, created_at in rows]
+        with self.transaction():
+            self.connection.executemany(
+                'INSERT INTO scores (score, difficulty, created_at) VALUES (?, ?, ?)', rows)
+
+    def add_score(self, score, difficulty, created_at=None):
+        self.add_scores([(score, difficulty, created_at)])
+
+    def top(self, count=5, difficulty=None):
+        # 最高的 count 个分数；指定难度时只看该难度（走难度索引）
+        if difficulty is None:
+            cursor = self.connection.execute(
+                'SELECT score FROM scores ORDER BY score DESC LIMIT ?', (count,))
+        else:
+            cursor = self.connection.execute(
+                'SELECT score FROM scores WHERE difficulty = ? ORDER BY score DESC LIMIT ?',
+                (difficulty, count))
+        return [score for score, in cursor]
+
+    def high_score(self, difficulty=None):
+        scores = self.top(1, difficulty)
+        return scores[0] if scores else 0
+
+    def count(self, since=None):
+        if since is None:
+            return self.connection.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM scores WHERE created_at >= ?', (since,)).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Transaction:
+    # with 块正常结束时提交，出错时回滚
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+# 交给写入线程保存的回放文件；replay 需要有 save(path) 方法
+ReplayFile = namedtuple('ReplayFile', ['replay', 'path'])
+
+
+class ScoreWriter:
+    # 后台写入线程：游戏循环只把分数和回放放进有界队列，由线程用自己的连接写入数据库、写回放文件
+    # 每局分配一个 key，同一局的记录只占一行：进行中刷新最高分时先写入，之后更新同一行
+    # 线程每次取出队列中积压的所有记录，同一局只保留最新的一条，在一个事务里提交
+    STOP = object()
+
+    def __init__(self, path=DATABASE):
+        self.path = path
+        self.queue = queue.Queue(WRITE_QUEUE_SIZE)
+        self.keys = itertools.count()
+        self.rows = {}  # 进行中对局的 key -> 数据库行号，只在写入线程中使用
+        self.dropped = 0  # 因写入线程停止或卡住而丢弃的记录数
+        self.stalled = False  # 上一次写入是否等待超时
+        self.thread = threading.Thread(target=self.run, name='score-writer', daemon=True)
+        self.thread.start()
+
+    def new_key(self):
+        return next(self.keys)
+
+    def update(self, key, score, difficulty):
+        # 进行中的最高分；队列已满时丢弃，下一次更新会带上更高的分数
+        try:
+            self.queue.put_nowait((key, score, difficulty, int(time.time()), False))
+        except queue.Full:
+            pass
+
+    def submit(self, key, score, difficulty):
+        # 一局的最终分数；队列满时等待写入线程腾出位置
+        self.put((key, score, difficulty, int(time.time()), True), "分数")
+
+    def save_replay(self, replay, path):
+        self.put(ReplayFile(replay, path), "回放")
+
+    def put(self, item, name):
+        # 写入线程已经退出（例如数据库打不开）或 WRITE_TIMEOUT 内腾不出位置时，记录并丢弃
+        # 超时过一次后，队列有空位之前的写入不再等待
+        deadline = time.monotonic() + (0 if self.stalled else WRITE_TIMEOUT)
+        while self.thread.is_alive():
+            try:
+                self.queue.put(item, timeout=max(0, min(0.1, deadline - time.monotonic())))
+                self.stalled = False
+                return True
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    self.stalled = True
+                    break
+        self.drop(name)
+        return False
+
+    def drop(self, name):
+        # 只提示第一次，总数在 close 时报告
+        self.dropped += 1
+        if self.dropped == 1:
+            reason = "写入线程已停止" if not self.thread.is_alive() else "写入队列已满"
+            print(f"{reason}，丢弃{name}")
+
+    def run(self):
+        try:
+            store = ScoreStore(self.path)
+        except (sqlite3.Error, OSError) as e:
+            # 线程结束；之后的写入在 put 中直接丢弃
+            print(f"无法打开分数数据库 {self.path}: {e}，本次运行的分数和回放不会保存")
+            return
+        try:
+            while True:
+                items = [self.queue.get()]
+                while True:
+                    try:
+                        items.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                # 合并同一局的多条记录；结束标记一旦出现就保留
+                pending = {}
+                replays = []
+                stop = False
+                for item in items:
+                    if item is self.STOP:
+                        stop = True
+                        continue
+                    if isinstance(item, ReplayFile):
+                        replays.append(item)
+                        continue
+                    key, score, difficulty, created_at, final = item
+                    if key in pending:
+                        final = final or pending[key][3]
+                    pending[key] = (score, difficulty, created_at, final)
+                try:
+                    if pending:
+                        self.write(store, pending)
+                except sqlite3.Error as e:
+                    print(f"Error saving scores: {e}")
+                for item in replays:
+                    try:
+                        item.replay.save(item.path)
+                    except OSError:
+                        print("无法保存回放文件")
+                for _ in items:
+                    self.queue.task_done()
+                if stop:
+                    break
+        finally:
+            store.close()
+
+    def write(self, store, pending):
+        rows = {}
+        with store.transaction() as connection:
+            for key, (score, difficulty, created_at, final) in pending.items():
+                row = self.rows.get(key)
+                if row is None:
+                    row = connection.execute(
+                        'INSERT INTO scores (score, difficulty, created_at) VALUES (?, ?, ?)',
+                        (score, difficulty, created_at)).lastrowid
+                else:
+                    connection.execute('UPDATE scores SET score = ? WHERE id = ?', (score, row))
+                rows[key] = None if final else row
+        # 事务提交后才记下行号，回滚时下次仍然插入新行
+        for key, row in rows.items():
+            if row is None:
+                self.rows.pop(key, None)
+            else:
+                self.rows[key] = row
+
+    def flush(self, timeout=WRITE_TIMEOUT):
+        # 等待已放入队列的记录全部提交；超时或写入线程已停止时返回 False
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.thread.is_alive():
+                    return False
+                self.queue.all_tasks_done.wait(min(remaining, 0.1))
+        return True
+
+    def close(self, timeout=WRITE_TIMEOUT):
+        # 写完队列中剩余的记录后结束线程；超时后放弃等待（线程是守护线程，随进程退出）
+        if self.thread.is_alive() and self.put(self.STOP, "结束标记"):
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                print(f"分数写入线程在 {timeout} 秒内没有结束，未写完的分数会丢失")
+        if self.dropped:
+            print(f"共丢弃 {self.dropped} 条分数或回放")
+
+
+def main(argv):
+    # 运行方式：python storage.py [数据库路径]，按难度列出前 5 名
+    path = argv[0] if argv else DATABASE
+    with ScoreStore(path) as store:
+        print(f"{path}: 共 {store.count()} 局，今天 {store.count(int(time.time()) // 86400 * 86400)} 局")
+        print(f"全部: {store.top()}")
+        for difficulty, name in enumerate(DIFFICULTY_NAMES):
+            print(f"{name}: {store.top(5, difficulty)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,74 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from batch_sim import BatchSimulator
+from batch_sim import lowest_policy as batch_lowest_policy
+from engine import TetrisEngine
+from simulate import INPUT_MS, lowest_policy, play_move
+
+# BatchSimulator 与逐局运行的 TetrisEngine 同步对比：同样的种子、难度、策略和按键时间，
+# 每放置一个方块后两边的选择、棋盘、当前方块、重力累计时间、分数和是否结束都必须相同
+
+
+def assert_same(sim, i, game):
+    assert sim.board[i].tolist() == game.board.rows
+    assert sim.heights[i].tolist() == game.board.heights
+    assert (sim.score[i], sim.lines[i], sim.pieces[i]) == (game.score, game.lines, game.pieces)
+    assert sim.game_over[i] == game.game_over
+    if not game.game_over:
+        piece = game.current_piece
+        assert (sim.current[i], sim.rotation[i], sim.x[i], sim.y[i]) == (
+            piece.kind, piece.rotation, piece.x, piece.y)
+        assert sim.next_kind(np.array([i]))[0] == game.next_piece.kind
+        assert sim.gravity_accumulator[i] == game.gravity_accumulator
+
+
+def run_lockstep(count, input_ms, max_pieces=300, queue_size=256):
+    seeds = list(range(count))
+    difficulties = [seed % 3 for seed in seeds]
+    sim = BatchSimulator(count, difficulty=difficulties, input_ms=input_ms, seeds=seeds,
+                         queue_size=queue_size)
+    games = [TetrisEngine(difficulty, seed) for difficulty, seed in zip(difficulties, seeds)]
+    for i, game in enumerate(games):
+        assert_same(sim, i, game)
+    while True:
+        boards = np.flatnonzero(~sim.game_over & (sim.pieces < max_pieces))
+        if not len(boards):
+            break
+        rotations, xs = batch_lowest_policy(sim, boards)
+        sim.step(boards, rotations, xs)
+        for i, rotation, x in zip(boards, rotations, xs):
+            game = games[i]
+            assert lowest_policy(game, None) == (rotation, x)
+            play_move(game, rotation, x, input_ms)
+            assert_same(sim, i, game)
+    return sim, games
+
+
+def test_lockstep_without_gravity():
+    sim, games = run_lockstep(30, 0)
+    assert sim.game_over.any()
+
+
+def test_lockstep_with_gravity():
+    sim, games = run_lockstep(30, INPUT_MS)
+    assert sim.game_over.all()
+    # 同一难度下重力让方块来不及到位，难度之间的存活方块数不再相同
+    assert len({game.pieces for game in games}) > 1
+
+
+def test_lockstep_gravity_locks_before_drop():
+    # 按键时间超过两个下落间隔：重力在一次按键内固定方块后继续让新方块下落
+    sim, games = run_lockstep(30, 650, queue_size=16)
+    assert sim.game_over.all()
+
+
+def test_difficulty_changes_survival():
+    # 同一组种子在三个难度下运行，下落越快放下的方块越少
+    count = 60
+    pieces = []
+    for difficulty in range(3):
+        sim = BatchSimulator(count, difficulty=difficulty, seeds=range(count))
+        pieces.append(sim.run(batch_lowest_policy, max_pieces=1000)['pieces'].mean())
+    assert pieces[0] > pieces[2]
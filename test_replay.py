@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from engine import TetrisEngine
+from replay import (HARD_DROP, LEFT, RIGHT, ROTATE, Replay, ReplayError, ReplayRecorder, apply_action,
+                    read_varint, verify, write_varint)
+
+# 回放：varint 往返编码、Replay 的字节格式，以及 verify 重新运行得到相同结果
+
+
+class RecordedGame(TetrisEngine):
+    # 与 tetris.Tetris 相同：操作记入回放，游戏结束时在 on_game_over 里结束记录
+    def __init__(self, difficulty, seed):
+        super().__init__(difficulty, seed)
+        self.recorder = ReplayRecorder(self)
+        self.replay = None
+
+    def on_game_over(self):
+        self.replay = self.recorder.finish(self)
+
+
+def record_game(seed, difficulty=1, hard_drops=True):
+    # 随机按键并推进时间，直到游戏结束
+    rng = random.Random(seed)
+    actions = [LEFT, RIGHT, ROTATE, HARD_DROP] if hard_drops else [LEFT, RIGHT, ROTATE]
+    game = RecordedGame(difficulty, seed)
+    while not game.game_over:
+        game.advance(rng.randrange(0, 700))
+        if not game.game_over:
+            action = rng.choice(actions)
+            game.recorder.record(game, action)
+            apply_action(game, action)
+    return game
+
+
+def test_varint_round_trip():
+    values = [0, 1, 0x7f, 0x80, 0x3fff, 0x4000, 2 ** 32 - 1, 2 ** 63]
+    out = bytearray()
+    for value in values:
+        write_varint(out, value)
+    assert out[:4] == bytes([0, 1, 0x7f, 0x80])
+    pos = 0
+    for value in values:
+        decoded, pos = read_varint(out, pos)
+        assert decoded == value
+    assert pos == len(out)
+    with pytest.raises(ReplayError):
+        read_varint(bytes([0x80, 0x80]), 0)
+
+
+def test_replay_bytes_round_trip(tmp_path):
+    replay = Replay(12345, 2, 'bag', [(0, LEFT), (0, ROTATE), (999, HARD_DROP), (100000, RIGHT)],
+                    end_time=100500, score=2400, lines=12, pieces=40)
+    path = str(tmp_path / 'replays' / 'game.replay')
+    replay.save(path)
+    loaded = Replay.load(path)
+    assert loaded.to_bytes() == replay.to_bytes()
+    assert (loaded.seed, loaded.difficulty, loaded.randomizer, loaded.events, loaded.end_time) == (
+        12345, 2, 'bag', replay.events, 100500)
+    assert (loaded.score, loaded.lines, loaded.pieces) == (2400, 12, 40)
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(b'NOPE' + replay.to_bytes()[4:])
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(replay.to_bytes()[:-1])
+
+
+def test_verify_recorded_games():
+    for seed in range(10):
+        game = record_game(seed, difficulty=seed % 3)
+        replay = Replay.from_bytes(game.replay.to_bytes())
+        assert replay.events
+        replayed = verify(replay)
+        assert (replayed.score, replayed.lines, replayed.pieces) == (game.score, game.lines, game.pieces)
+        assert replayed.time_ms == game.time_ms == replay.end_time
+
+
+def test_verify_detects_tampering():
+    game = record_game(3)
+    replay = game.replay
+    replay.score += 100
+    with pytest.raises(ReplayError):
+        verify(replay)
+
+
+def test_game_over_by_gravity_records_trimmed_end_time():
+    # 只平移和旋转，方块靠重力堆到顶；结束钩子里记录的时间是最后一次下落的时刻
+    game = record_game(7, hard_drops=False)
+    assert game.replay.end_time == game.time_ms
+    assert game.time_ms % game.gravity_interval() == 0
+    assert verify(Replay.from_bytes(game.replay.to_bytes())).time_ms == game.time_ms
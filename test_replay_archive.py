@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from replay import Replay
+from replay_archive import (INDEX_HEADER, INDEX_RECORD, ArchiveError, ArchiveReader, ArchiveWriter,
+                            archive_paths)
+
+# 回放归档的磁盘格式：往返读写、24 字节索引记录、中断时写了一半的索引记录
+
+
+def make_replays(count):
+    return [Replay(seed, seed % 3, 'bag' if seed % 2 else 'random',
+                   [(100 * k + seed, k % 5 + 1) for k in range(seed + 1)],
+                   end_time=1000 + seed, score=10 * seed, lines=seed, pieces=2 * seed)
+            for seed in range(count)]
+
+
+def write_archive(path, replays, first_date=1700000000):
+    with ArchiveWriter(path) as writer:
+        for i, replay in enumerate(replays):
+            writer.append(replay, first_date + i)
+
+
+def same_replay(a, b):
+    return a.to_bytes() == b.to_bytes()
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'games')
+    replays = make_replays(5)
+    write_archive(path, replays)
+    data_path, index_path = archive_paths(path)
+    assert INDEX_RECORD.size == 24
+    assert os.path.getsize(index_path) == INDEX_HEADER.size + 5 * INDEX_RECORD.size
+    with ArchiveReader(path) as archive:
+        assert len(archive) == 5
+        offset = 0
+        for i, (entry, replay) in enumerate(zip(archive.entries(), replays)):
+            data = replay.to_bytes()
+            assert entry == archive.entry(i)
+            assert (entry.offset, entry.length) == (offset, len(data))
+            assert (entry.score, entry.date, entry.difficulty) == (replay.score, 1700000000 + i,
+                                                                   replay.difficulty)
+            with archive.raw(i) as raw:
+                assert raw == data
+            assert same_replay(archive.replay(i), replay)
+            offset += len(data)
+        assert [i for i, _ in archive.select(difficulty=1)] == [1, 4]
+        assert [i for i, _ in archive.select(min_score=30, until=1700000004)] == [3]
+        with pytest.raises(IndexError):
+            archive.entry(5)
+
+
+def test_append_after_reopen(tmp_path):
+    path = str(tmp_path / 'games')
+    replays = make_replays(4)
+    write_archive(path, replays[:2])
+    write_archive(path, replays[2:])
+    with ArchiveReader(path) as archive:
+        assert len(archive) == 4
+        assert all(same_replay(archive.replay(i), replay) for i, replay in enumerate(replays))
+
+
+def test_torn_index_record(tmp_path):
+    # 写索引记录时中断：读取时忽略不完整的记录，再次打开写入时截掉它
+    path = str(tmp_path / 'games')
+    replays = make_replays(4)
+    write_archive(path, replays[:3])
+    data_path, index_path = archive_paths(path)
+    with open(index_path, 'ab') as f:
+        f.write(INDEX_RECORD.pack(123, 45, 6, 7, 1)[:10])
+    with ArchiveReader(path) as archive:
+        assert len(archive) == 3
+    write_archive(path, replays[3:])
+    assert os.path.getsize(index_path) == INDEX_HEADER.size + 4 * INDEX_RECORD.size
+    with ArchiveReader(path) as archive:
+        assert len(archive) == 4
+        assert all(same_replay(archive.replay(i), replay) for i, replay in enumerate(replays))
+
+
+def test_torn_data_without_index(tmp_path):
+    # 回放数据已写入但索引记录没写：这段数据不可见，之后追加的回放仍然按偏移正确读出
+    path = str(tmp_path / 'games')
+    replays = make_replays(3)
+    write_archive(path, replays[:2])
+    data_path, _ = archive_paths(path)
+    with open(data_path, 'ab') as f:
+        f.write(replays[2].to_bytes()[:5])
+    write_archive(path, replays[2:])
+    with ArchiveReader(path) as archive:
+        assert len(archive) == 3
+        assert same_replay(archive.replay(2), replays[2])
+
+
+def test_close_with_borrowed_views(tmp_path):
+    # raw() 的视图和未遍历完的 entries() 还在时 close() 不出错，映射在它们释放后解除
+    path = str(tmp_path / 'games')
+    replays = make_replays(3)
+    write_archive(path, replays)
+    with ArchiveReader(path) as archive:
+        raws = [archive.raw(i) for i in range(len(archive))]
+        entries = archive.entries()
+        next(entries)
+    assert [bytes(raw) for raw in raws] == [replay.to_bytes() for replay in replays]
+    for raw in raws:
+        raw.release()
+    entries.close()
+
+
+def mapped_paths():
+    with open('/proc/self/maps') as f:
+        return {line.split(None, 5)[-1].strip() for line in f}
+
+
+def test_not_an_archive(tmp_path):
+    path = str(tmp_path / 'games')
+    data_path, index_path = archive_paths(path)
+    for name in (data_path, index_path):
+        with open(name, 'wb') as f:
+            f.write(b'not an archive')
+    with pytest.raises(ArchiveError) as error:
+        ArchiveReader(path)
+    # 异常的 traceback 还引用着打开到一半的对象，映射也已经解除
+    if os.path.exists('/proc/self/maps'):
+        assert not {data_path, index_path} & mapped_paths()
@@ -0,0 +1,69 @@
+import pytest
+
+from engine import GRID_HEIGHT, TetrisEngine
+from server import (DELTA, DELTA_HEAD, END, END_MESSAGE, ERROR, HEADER, SNAPSHOT, STATUS, ClientBoard,
+                    ProtocolError, encode_delta, encode_snapshot, frame, game_status)
+from simulate import lowest_policy, play_move
+
+# 对局服务器的消息编码：完整快照、只含变化行的增量，以及客户端按消息拼出的棋盘
+
+
+def split(message):
+    length, kind = HEADER.unpack_from(message)
+    payload = message[HEADER.size:]
+    assert len(payload) == length
+    return kind, payload
+
+
+def test_delta_encodes_changed_rows_only():
+    status = (1, 2, 3, -1, 4, 500, 6, 70)
+    rows = [0] * GRID_HEIGHT
+    kind, payload = split(encode_delta(9, rows, list(rows), status))
+    assert kind == DELTA
+    assert DELTA_HEAD.unpack_from(payload) == (9, 0)
+    assert len(payload) == DELTA_HEAD.size + STATUS.size
+    assert STATUS.unpack_from(payload, DELTA_HEAD.size) == status
+
+    changed = list(rows)
+    changed[0] = 0x3ff
+    changed[GRID_HEIGHT - 1] = 0x201
+    kind, payload = split(encode_delta(9, rows, changed, status))
+    assert DELTA_HEAD.unpack_from(payload) == (9, 1 | 1 << (GRID_HEIGHT - 1))
+    assert len(payload) == DELTA_HEAD.size + 2 * 2 + STATUS.size
+
+
+def test_client_board_follows_engine():
+    # 客户端从快照开始只靠增量跟上服务器上的对局，每一步的棋盘和状态都相同
+    game = TetrisEngine(1, 42)
+    board = ClientBoard()
+    kind, payload = split(encode_snapshot(5, game.seed, game.difficulty, game.board.rows,
+                                          game_status(game)))
+    assert kind == SNAPSHOT
+    board.apply(kind, payload)
+    assert (board.game_id, board.seed, board.difficulty) == (5, 42, 1)
+    rows = game.board.rows.copy()
+    while not game.game_over:
+        play_move(game, *lowest_policy(game, None))
+        board.apply(*split(encode_delta(5, rows, game.board.rows, game_status(game))))
+        rows = game.board.rows.copy()
+        assert board.rows == game.board.rows
+        assert board.status == game_status(game)
+    assert game.lines > 0
+
+    board.apply(*split(frame(END, END_MESSAGE.pack(5, game.score, game.lines, game.pieces))))
+    assert board.result == (game.score, game.lines, game.pieces)
+
+
+def test_client_board_ignores_other_games():
+    board = ClientBoard()
+    status = (0, 0, 3, 0, 1, 0, 0, 0)
+    board.apply(*split(encode_snapshot(1, 7, 0, [0] * GRID_HEIGHT, status)))
+    changed = [0] * GRID_HEIGHT
+    changed[-1] = 0x1ff
+    board.apply(*split(encode_delta(2, [0] * GRID_HEIGHT, changed, (1, 1, 1, 1, 1, 1, 1, 1))))
+    board.apply(*split(frame(END, END_MESSAGE.pack(2, 10, 1, 5))))
+    assert board.rows == [0] * GRID_HEIGHT
+    assert board.status == status
+    assert board.result is None
+    with pytest.raises(ProtocolError):
+        board.apply(*split(frame(ERROR, '对局不存在'.encode())))
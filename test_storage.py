@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from storage import SCHEMA_VERSION, ScoreStore, read_legacy_scores
+
+# 分数数据库：第一次打开时导入旧的 scores.txt / high_score.txt，并用 PRAGMA user_version 记录已迁移
+
+
+def write_file(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    return str(path)
+
+
+def user_version(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_read_legacy_scores(tmp_path):
+    scores = write_file(tmp_path / 'scores.txt', '100\n50\n\n300\n0\n')
+    assert read_legacy_scores(scores, str(tmp_path / 'missing.txt')) == [100, 50, 300]
+    # 最高分已在排行榜里时不重复
+    assert read_legacy_scores(scores, write_file(tmp_path / 'high.txt', '300')) == [100, 50, 300]
+    assert read_legacy_scores(scores, write_file(tmp_path / 'high.txt', '900')) == [100, 50, 300, 900]
+    # 文件不存在或内容损坏时当作没有旧分数
+    assert read_legacy_scores(write_file(tmp_path / 'bad.txt', 'abc\n'),
+                              write_file(tmp_path / 'high.txt', '')) == []
+
+
+def test_migrate_legacy_files_once(tmp_path):
+    path = str(tmp_path / 'scores.db')
+    scores = write_file(tmp_path / 'scores.txt', '100\n50\n300\n')
+    high_score = write_file(tmp_path / 'high_score.txt', '500')
+    assert not (tmp_path / 'scores.db').exists()
+    with ScoreStore(path, scores, high_score) as store:
+        assert store.top() == [500, 300, 100, 50]
+        assert store.high_score() == 500
+        assert store.high_score(difficulty=1) == 0
+        store.add_score(400, 1)
+    assert user_version(path) == SCHEMA_VERSION
+    # 再次打开不会重新导入，即使旧文件还在或有了变化
+    write_file(tmp_path / 'scores.txt', '100\n50\n300\n700\n')
+    with ScoreStore(path, scores, high_score) as store:
+        assert store.count() == 5
+        assert store.top(2) == [500, 400]
+        assert store.top(5, difficulty=1) == [400]
+
+
+def test_upgrade_unversioned_database(tmp_path):
+    # 没有记录版本的旧数据库（user_version 为 0）：保留已有的行，补建索引、导入旧文件并写入版本号
+    path = str(tmp_path / 'scores.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE scores (id INTEGER PRIMARY KEY, score INTEGER NOT NULL, '
+                       'difficulty INTEGER, created_at INTEGER NOT NULL)')
+    connection.executemany('INSERT INTO scores (score, difficulty, created_at) VALUES (?, ?, ?)',
+                           [(250, 0, 1700000000), (120, 2, 1700000100)])
+    connection.commit()
+    connection.close()
+    assert user_version(path) == 0
+    scores = write_file(tmp_path / 'scores.txt', '80\n')
+    with ScoreStore(path, scores, str(tmp_path / 'missing.txt')) as store:
+        assert store.top() == [250, 120, 80]
+        assert store.count(since=1700000050) == 2
+        indexes = {name for name, in store.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'scores_by_score', 'scores_by_difficulty', 'scores_by_time'} <= indexes
+    assert user_version(path) == SCHEMA_VERSION
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    # 导入失败时整个迁移回滚，版本号仍为 0，下次打开会重新迁移
+    path = str(tmp_path / 'scores.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE scores (id INTEGER PRIMARY KEY, score INTEGER NOT NULL)')
+    connection.commit()
+    connection.close()
+    scores = write_file(tmp_path / 'scores.txt', '100\n')
+    with pytest.raises(sqlite3.Error):
+        ScoreStore(path, scores, str(tmp_path / 'missing.txt'))
+    assert user_version(path) == 0
+    connection = sqlite3.connect(path)
+    try:
+        assert connection.execute('SELECT COUNT(*) FROM scores').fetchone()[0] == 0
+        assert connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index'").fetchone()[0] == 0
+    finally:
+        connection.close()
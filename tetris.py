@@ -1,19 +1,18 @@
+import argparse
+import sqlite3
+import time
+from collections import OrderedDict
+
 import pygame
-import random
-
-# 初始化pygame
-pygame.init()
-
-# 在pygame.init()后添加以下代码来设置中文字体
-try:
-    # Windows系统默认中文字体
-    FONT_PATH = "C:/Windows/Fonts/msyh.ttc"  # 微软雅黑
-except:
-    try:
-        # Linux/Mac系统可能的中文字体路径
-        FONT_PATH = "/System/Library/Fonts/PingFang.ttc"  # 苹方字体
-    except:
-        FONT_PATH = None
+
+from ai import AutoPlayer
+from assets import audio, fonts
+from engine import GRID_WIDTH, GRID_HEIGHT, DIFFICULTY_NAMES, GameClock, TetrisEngine, monotonic_ms
+from pieces import ROTATIONS
+from replay import (HARD_DROP, LEFT, RIGHT, ROTATE, SOFT_DROP, ReplayRecorder, apply_action,
+                    replay_path)
+from profiler import PERCENTILES, profiler
+from storage import DATABASE, ScoreStore, ScoreWriter
 
 # 颜色定义
 BLACK = (0, 0, 0)
@@ -31,55 +30,215 @@ RETRO_LIGHT = (200, 210, 185)
 
 # 游戏设置
 BLOCK_SIZE = 20  # 每个方块的大小
-GRID_WIDTH = 10  # 游戏区域宽度（以方块数计）
-GRID_HEIGHT = 20  # 游戏区域高度（以方块数计）
 SCREEN_WIDTH = BLOCK_SIZE * (GRID_WIDTH + 6)  # 屏幕宽度
 SCREEN_HEIGHT = BLOCK_SIZE * GRID_HEIGHT  # 屏幕高度
 
-# 创建游戏窗口
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("俄罗斯方块")
-
-# 定义方块形状
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1], [1, 1]],  # O
-    [[1, 1, 1], [0, 1, 0]],  # T
-    [[1, 1, 1], [1, 0, 0]],  # L
-    [[1, 1, 1], [0, 0, 1]],  # J
-    [[1, 1, 0], [0, 1, 1]],  # S
-    [[0, 1, 1], [1, 1, 0]]   # Z
-]
+# 右侧信息区域布局
+INFO_X = GRID_WIDTH * BLOCK_SIZE + 10
+PREVIEW_Y = 110
+PREVIEW_SIZE = 60
+SCORE_Y = 190
+
+# 帧耗时图（开启 --profile 时显示在暂停按钮右侧）
+PROFILE_RECT = pygame.Rect(INFO_X + 56, 10, SCREEN_WIDTH - INFO_X - 60, 50)
+PROFILE_SCALE_MS = 20  # 图的高度对应的毫秒数
+PROFILE_COLORS = {50: GREEN, 95: ORANGE, 99: RED}  # 各百分位横线的颜色
+
+# 演示模式：主菜单无人操作这么久之后由内置 AI 自动玩一局
+ATTRACT_DELAY_MS = 15000
+DEMO_INPUT_MS = 150  # 演示中每次按键的间隔
+
+# 游戏窗口，在 init_display() 中创建，导入模块时不初始化 pygame
+screen = None
+
+STARTED = time.perf_counter()  # 导入本模块的时间，用于计算启动到第一帧的耗时
+
+# 按难度缓存的静态背景
+background_cache = {}
 
 # 定义方块颜色
 SHAPE_COLORS = [CYAN, YELLOW, MAGENTA, ORANGE, BLUE, GREEN, RED]
 
+# 游戏控制按键对应的操作，这些操作会被记入回放
+KEY_ACTIONS = {
+    pygame.K_LEFT: LEFT,
+    pygame.K_RIGHT: RIGHT,
+    pygame.K_UP: ROTATE,
+    pygame.K_DOWN: SOFT_DROP,
+    pygame.K_SPACE: HARD_DROP,
+}
+
+def init_display():
+    global screen
+    # 只初始化显示和字体；混音器在第一帧显示之后由 assets.audio.prepare() 初始化，不拖慢第一帧
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("俄罗斯方块")
+    return screen
+
+def get_background(difficulty):
+    # 游戏区域、网格线、按钮边框和文字标签只绘制一次，之后直接复制
+    background = background_cache.get(difficulty)
+    if background is not None:
+        return background
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+
+    # 设置背景色
+    background.fill(RETRO_GREEN)
+
+    # 绘制游戏区域背景
+    game_area = pygame.Rect(0, 0, GRID_WIDTH * BLOCK_SIZE, GRID_HEIGHT * BLOCK_SIZE)
+    pygame.draw.rect(background, RETRO_LIGHT, game_area)
+
+    # 绘制网格线
+    for i in range(GRID_WIDTH + 1):
+        pygame.draw.line(background, RETRO_GREEN,
+                        (i * BLOCK_SIZE, 0),
+                        (i * BLOCK_SIZE, GRID_HEIGHT * BLOCK_SIZE))
+    for i in range(GRID_HEIGHT + 1):
+        pygame.draw.line(background, RETRO_GREEN,
+                        (0, i * BLOCK_SIZE),
+                        (GRID_WIDTH * BLOCK_SIZE, i * BLOCK_SIZE))
+
+    # 绘制暂停按钮
+    pause_rect = pygame.Rect(INFO_X, 10, 50, 50)
+    pygame.draw.rect(background, RETRO_LIGHT, pause_rect, border_radius=8)
+    pygame.draw.rect(background, RETRO_DARK, pause_rect, 2, border_radius=8)
+
+    # 绘制"下一个"文字和预览框
+    next_text = fonts.render("下一个", 'normal', RETRO_DARK)
+    background.blit(next_text, (INFO_X + 5, 80))
+    preview_rect = pygame.Rect(INFO_X, PREVIEW_Y, PREVIEW_SIZE, PREVIEW_SIZE)
+    pygame.draw.rect(background, RETRO_LIGHT, preview_rect, border_radius=5)
+    pygame.draw.rect(background, RETRO_DARK, preview_rect, 2, border_radius=5)
+
+    # 绘制分数和难度标签
+    background.blit(fonts.render("得分", 'normal', RETRO_DARK), (INFO_X + 5, SCORE_Y))
+    background.blit(fonts.render("最高分", 'normal', RETRO_DARK), (INFO_X + 5, SCORE_Y + 70))
+    background.blit(fonts.render("难度", 'normal', RETRO_DARK), (INFO_X + 5, SCORE_Y + 140))
+    background.blit(fonts.render(DIFFICULTY_NAMES[difficulty], 'normal', RETRO_DARK),
+                    (INFO_X + 5, SCORE_Y + 170))
+
+    background_cache[difficulty] = background
+    return background
+
+class OverlayCache:
+    # 半透明遮罩、面板和按钮背景只创建一次，窗口大小变化时才重新创建
+    def __init__(self):
+        self.size = None
+        self.surfaces = {}
+
+    def get(self, target, key, build, *args):
+        size = target.get_size()
+        if size != self.size:
+            self.surfaces.clear()
+            self.size = size
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = build(*args)
+        return surface
+
+    def dimmer(self, target):
+        # 覆盖整个窗口的半透明背景
+        return self.get(target, ('dimmer',), self.build_dimmer)
+
+    def panel(self, target, width, height, fill, border, radius):
+        # 圆角面板或按钮；fill 为 None 时只绘制边框
+        key = ('panel', width, height, fill, border, radius)
+        return self.get(target, key, self.build_panel, width, height, fill, border, radius)
+
+    def build_dimmer(self):
+        overlay = pygame.Surface(self.size).convert()
+        overlay.fill(RETRO_GREEN)
+        overlay.set_alpha(180)
+        return overlay
+
+    def build_panel(self, width, height, fill, border, radius):
+        surface = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
+        rect = surface.get_rect()
+        if fill is not None:
+            pygame.draw.rect(surface, fill, rect, border_radius=radius)
+        pygame.draw.rect(surface, border, rect, 2, border_radius=radius)
+        return surface
+
+overlays = OverlayCache()
+
+class TileAtlas:
+    # 所有方块贴图画在同一张 Surface 上：普通方块、落点空心方块和预览方块
+    # 绘制时把每个格子的 (atlas, 位置, 区域) 收集起来，用一次 screen.blits 提交
+    # 贴图按 (方块大小, 预览方块大小) 生成，大小变化时自动重建
+    # 展开好的棋盘行放入有上限的 LRU 缓存（与 FontRegistry 的文字缓存相同）
+    COLORKEY = (1, 2, 3)  # 透明色，用于空心方块的内部
+
+    def __init__(self, max_rows=512):
+        self.sizes = None
+        self.surface = None
+        self.rects = {}
+        self.max_rows = max_rows
+        self.rows = OrderedDict()  # (贴图, 行号, 位掩码) -> 这一行的 blits 序列项
+
+    def get(self, block_size, preview_size):
+        if (block_size, preview_size) != self.sizes:
+            self.build(block_size, preview_size)
+        return self
+
+    def build(self, block_size, preview_size):
+        # 贴图比格子小 2 像素，与原来 draw.rect 的留边一致；贴图从左到右排成一行
+        tiles = [('block', block_size, RETRO_DARK, 0),
+                 ('ghost', block_size, RETRO_DARK, 1),
+                 ('preview', preview_size, RETRO_DARK, 0)]
+        width = sum(size - 2 for _, size, _, _ in tiles)
+        surface = pygame.Surface((width, block_size - 2)).convert()
+        surface.fill(self.COLORKEY)
+        surface.set_colorkey(self.COLORKEY, pygame.RLEACCEL)
+        self.rects = {}
+        x = 0
+        for name, size, color, border in tiles:
+            rect = pygame.Rect(x, 0, size - 2, size - 2)
+            pygame.draw.rect(surface, color, rect, border)
+            self.rects[name] = rect
+            x += rect.width
+        self.surface = surface
+        self.sizes = (block_size, preview_size)
+        self.rows.clear()
+
+    def cells(self, name, cells, x=0, y=0, size=None):
+        # 格子坐标 -> blits 序列项；(x, y) 是格子 (0, 0) 左上角的像素位置
+        if size is None:
+            size = self.sizes[0]
+        surface = self.surface
+        area = self.rects[name]
+        return [(surface, (x + j * size + 1, y + i * size + 1), area) for j, i in cells]
+
+    def row(self, name, y, mask):
+        # 棋盘第 y 行按位掩码展开的序列项，第一次用到时生成并缓存
+        key = (name, y, mask)
+        entries = self.rows.get(key)
+        if entries is not None:
+            self.rows.move_to_end(key)
+            return entries
+        cells = [(j, y) for j in range(mask.bit_length()) if (mask >> j) & 1]
+        entries = self.rows[key] = self.cells(name, cells)
+        if len(self.rows) > self.max_rows:
+            self.rows.popitem(last=False)
+        return entries
+
+tiles = TileAtlas()
+
 class Menu:
     def __init__(self):
-        if FONT_PATH:
-            self.font_big = pygame.font.Font(FONT_PATH, 36)
-            self.font_small = pygame.font.Font(FONT_PATH, 24)
-        else:
-            self.font_big = pygame.font.Font(None, 48)
-            self.font_small = pygame.font.Font(None, 28)
-        self.difficulty_options = ["简单", "普通", "困难"]  # 添加难度选项
+        self.difficulty_options = DIFFICULTY_NAMES  # 添加难度选项
         self.difficulty = 1  # 0: 简单, 1: 普通, 2: 困难
-        self.music_on = False  # 默认关闭音乐
-        try:
-            pygame.mixer.init()
-            pygame.mixer.music.load('assets/music/background.mp3')
-            pygame.mixer.music.play(-1)  # 加载音乐但立即暂停
-            pygame.mixer.music.pause()  # 默认暂停音乐
-        except:
-            print("无法初始化音乐系统")
+        self.music_on = False  # 默认关闭音乐，第一次打开时才加载
         self.selected = 0
         
     def draw(self, screen):
         screen.fill(RETRO_GREEN)
         
         # 调整标题位置和大小
-        title = self.font_big.render("俄罗斯方块", True, BLACK)
-        subtitle = self.font_small.render("GAME", True, BLACK)
+        title = fonts.render("俄罗斯方块", 'big', BLACK)
+        subtitle = fonts.render("GAME", 'small', BLACK)
         screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 40))
         screen.blit(subtitle, (SCREEN_WIDTH//2 - subtitle.get_width()//2, 90))
         
@@ -99,17 +258,17 @@ class Menu:
             x = SCREEN_WIDTH//2 - button_width//2
             y = start_y + i * button_spacing
             
-            rect = pygame.Rect(x, y, button_width, button_height)
-            pygame.draw.rect(screen, RETRO_LIGHT, rect, border_radius=5)
-            pygame.draw.rect(screen, BLACK, rect, 2, border_radius=5)
+            button = overlays.panel(screen, button_width, button_height, RETRO_LIGHT, BLACK, 5)
+            screen.blit(button, (x, y))
             
             color = WHITE if i == self.selected else BLACK
-            text = self.font_small.render(option, True, color)
+            text = fonts.render(option, 'small', color)
             text_x = x + (button_width - text.get_width())//2
             text_y = y + (button_height - text.get_height())//2
             screen.blit(text, (text_x, text_y))
         
-        pygame.display.flip()
+        with profiler.phase('flip'):
+            pygame.display.flip()
     
     def handle_input(self, event):
         if event.type == pygame.KEYDOWN:
@@ -128,180 +287,158 @@ class Menu:
                     self.difficulty = (self.difficulty + 1) % 3  # 在0、1、2之间循环
                 elif self.selected == 2:  # 音乐设置
                     self.music_on = not self.music_on
-                    try:
-                        if self.music_on:
-                            pygame.mixer.music.rewind()  # 重置音乐到开始位置
-                            pygame.mixer.music.play(-1)  # 重新开始播放
-                        else:
-                            pygame.mixer.music.pause()
-                    except:
-                        print("无法控制音乐")
+                    audio.set_music(self.music_on)
         return False
 
-class Tetris:
-    def __init__(self, difficulty=1):
-        self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        self.current_piece = self.new_piece()
-        self.next_piece = self.new_piece()
-        self.game_over = False
+class Tetris(TetrisEngine):
+    # 在规则核心之上负责绘制、音效和分数保存
+    # leaderboard 必须由调用者传入并在各局之间共用，每个 Leaderboard 都有自己的写入线程
+    def __init__(self, difficulty=1, seed=None, randomizer='random', *, leaderboard):
+        super().__init__(difficulty, seed, randomizer)
+        self.recorder = ReplayRecorder(self)  # 记录本局的操作，结束时保存回放
         self.paused = False
-        self.score = 0
-        self.leaderboard = Leaderboard()  # 先初始化排行榜
-        # 从排行榜中获取最高分
-        self.high_score = max(self.leaderboard.scores[0], self.load_high_score())  # 取排行榜第一名和历史最高分的较大值
-        self.level = 1
-        self.difficulty = difficulty
-        # 根据难度设置初始速度
-        self.fall_speed = self.get_initial_fall_speed()
-        self.fall_time = 0
-        self.clock = pygame.time.Clock()
+        self.leaderboard = leaderboard
+        self.high_score = self.leaderboard.scores[0]  # 排行榜第一名就是历史最高分
+        self.score_key = self.leaderboard.new_game()  # 本局在分数数据库中的记录
+        self.score_saved = False
+        self.timer = GameClock()  # 用单调时钟，不依赖 pygame 的计时器子系统
         self.preview_block_size = 12
         self.pause_menu = PauseMenu()
         self.showing_leaderboard = False
         self.game_over_screen = GameOverScreen(self.leaderboard)
-        try:
-            # 初始化音效
-            self.score_sound = pygame.mixer.Sound('assets/sound/score.wav')
-            self.score_sound.set_volume(0.3)  # 设置音效音量为30%
-        except:
-            print("无法加载音效文件")
+        # 第一帧整屏绘制，之后只更新变化的区域
+        self.full_redraw = True
 
-    def load_high_score(self):
-        try:
-            with open('high_score.txt', 'r') as f:
-                high_score = int(f.read())
-                # 确保最高分也在排行榜中
-                if high_score > 0:
-                    self.leaderboard.add_score(high_score)
-                return high_score
-        except:
-            return 0
-
-    def save_high_score(self):
+    def update_high_score(self):
+        # 刷新最高分时交给后台线程写入，连续刷新会合并成一次写入
         if self.score > self.high_score:
             self.high_score = self.score
-            with open('high_score.txt', 'w') as f:
-                f.write(str(self.high_score))
-            # 当更新最高分时，也更新排行榜
-            self.leaderboard.add_score(self.score)
-
-    def new_piece(self):
-        # 随机选择一个新方块
-        shape = random.choice(SHAPES)
-        return {
-            'shape': shape,
-            'x': GRID_WIDTH // 2 - len(shape[0]) // 2,
-            'y': 0
-        }
+            self.leaderboard.update_high_score(self.score_key, self.score, self.difficulty)
+
+    def on_lines_cleared(self, cleared_rows):
+        # 播放得分音效（各局共用同一个已解码的 Sound）
+        audio.play('score')
+        # 检查是否超过最高分
+        self.update_high_score()
+
+    def on_game_over(self):
+        self.save_game()
+
+    def apply_action(self, action):
+        # 执行玩家操作并记入回放
+        self.recorder.record(self, action)
+        apply_action(self, action)
+
+    def save_game(self):
+        # 结束、放弃或退出时保存本局的分数和回放
+        with profiler.phase('save'):
+            self.save_score()
+            self.save_replay()
+
+    def clear_lines(self, start=0, stop=None):
+        with profiler.phase('clear'):
+            return super().clear_lines(start, stop)
+
+    def save_score(self):
+        # 每局只记一次分数
+        if self.score_saved:
+            return
+        self.score_saved = True
+        self.update_high_score()
+        self.leaderboard.add_score(self.score, self.difficulty, self.score_key)
+
+    def save_replay(self):
+        # 每局只保存一次；没有任何操作的对局不保存
+        if self.recorder.finished:
+            return
+        replay = self.recorder.finish(self)
+        if not replay.events:
+            return
+        # 文件由后台线程写入，结束的这一帧不等待磁盘
+        self.leaderboard.save_replay(replay, replay_path(replay))
+
+    def tiles(self):
+        return tiles.get(BLOCK_SIZE, self.preview_block_size)
 
     def draw_piece(self, piece, x, y):
-        for i in range(len(piece['shape'])):
-            for j in range(len(piece['shape'][0])):
-                if piece['shape'][i][j]:
-                    pygame.draw.rect(screen, RETRO_DARK,
-                                   [x + j * BLOCK_SIZE + 1,
-                                    y + i * BLOCK_SIZE + 1,
-                                    BLOCK_SIZE - 2, BLOCK_SIZE - 2])
+        # 返回 blits 序列项，由调用者统一提交
+        return self.tiles().cells('block', self.piece_state(piece).cells, x, y)
+
+    def draw_ghost_piece(self, piece):
+        # 用空心方块标出当前方块的落点
+        ghost_y = self.landing_y(piece)
+        if ghost_y == piece.y:
+            return []
+        return self.tiles().cells('ghost', self.piece_state(piece).cells,
+                                  piece.x * BLOCK_SIZE, ghost_y * BLOCK_SIZE)
 
     def draw_preview_piece(self, piece, x, y):
-        # 专门用于绘制预览方块的方法，使用较小的方块尺寸
-        for i in range(len(piece['shape'])):
-            for j in range(len(piece['shape'][0])):
-                if piece['shape'][i][j]:
-                    pygame.draw.rect(screen, RETRO_DARK,
-                                   [x + j * self.preview_block_size + 1,
-                                    y + i * self.preview_block_size + 1,
-                                    self.preview_block_size - 2,
-                                    self.preview_block_size - 2])
+        # 预览方块使用较小的方块尺寸
+        return self.tiles().cells('preview', self.piece_state(piece).cells, x, y,
+                                  self.preview_block_size)
 
     def draw(self):
-        # 设置背景色
-        screen.fill(RETRO_GREEN)
-        
-        # 绘制游戏区域背景
-        game_area = pygame.Rect(0, 0, GRID_WIDTH * BLOCK_SIZE, GRID_HEIGHT * BLOCK_SIZE)
-        pygame.draw.rect(screen, RETRO_LIGHT, game_area)
-        
-        # 绘制网格线
-        for i in range(GRID_WIDTH + 1):
-            pygame.draw.line(screen, RETRO_GREEN, 
-                            (i * BLOCK_SIZE, 0), 
-                            (i * BLOCK_SIZE, GRID_HEIGHT * BLOCK_SIZE))
-        for i in range(GRID_HEIGHT + 1):
-            pygame.draw.line(screen, RETRO_GREEN,
-                            (0, i * BLOCK_SIZE),
-                            (GRID_WIDTH * BLOCK_SIZE, i * BLOCK_SIZE))
-        
+        # 有遮罩界面时整屏重绘；否则只重绘变化的格子和文字
+        overlay = self.paused or self.showing_leaderboard or self.game_over
+        if overlay or self.full_redraw:
+            self.draw_full()
+            if profiler.enabled and not overlay:
+                self.draw_profile()
+            # 遮罩关闭后的第一帧仍需整屏重绘
+            self.full_redraw = overlay
+            with profiler.phase('flip'):
+                pygame.display.flip()
+            return
+        dirty = self.draw_changes()
+        if profiler.enabled:
+            dirty.append(self.draw_profile())
+        if dirty:
+            with profiler.phase('flip'):
+                pygame.display.update(dirty)
+
+    def piece_cells(self, piece, y):
+        # 方块放在第 y 行时占据的格子
+        return {(piece.x + j, y + i) for j, i in self.piece_state(piece).cells}
+
+    def draw_full(self):
+        # 绘制静态背景（游戏区域、网格线、文字标签）
+        self.background = get_background(self.difficulty)
+        screen.blit(self.background, (0, 0))
+
         # 绘制已放置的方块和当前方块（移除暂停条件）
-        for i in range(GRID_HEIGHT):
-            for j in range(GRID_WIDTH):
-                if self.grid[i][j]:
-                    pygame.draw.rect(screen, RETRO_DARK,
-                                   [j * BLOCK_SIZE + 1, i * BLOCK_SIZE + 1, 
-                                    BLOCK_SIZE - 2, BLOCK_SIZE - 2])
-        
+        tiles = self.tiles()
+        blits = []
+        for i, row in enumerate(self.board.rows):
+            if row:
+                blits += tiles.row('block', i, row)
+
+        if self.current_piece and not self.game_over:
+            blits += self.draw_ghost_piece(self.current_piece)
+
         if self.current_piece:
-            self.draw_piece(self.current_piece, 
-                          self.current_piece['x'] * BLOCK_SIZE,
-                          self.current_piece['y'] * BLOCK_SIZE)
+            blits += self.draw_piece(self.current_piece,
+                                     self.current_piece.x * BLOCK_SIZE,
+                                     self.current_piece.y * BLOCK_SIZE)
+
+        # 调整预览方块的位置和大小
+        if self.next_piece and not self.paused:
+            blits += self.draw_next_piece()
+
+        # 所有方块一次提交
+        screen.blits(blits, doreturn=False)
 
-        # 绘制右侧信息区域
-        info_x = GRID_WIDTH * BLOCK_SIZE + 10
-        
-        # 绘制暂停按钮
-        pause_rect = pygame.Rect(info_x, 10, 50, 50)
-        pygame.draw.rect(screen, RETRO_LIGHT, pause_rect, border_radius=8)
-        pygame.draw.rect(screen, RETRO_DARK, pause_rect, 2, border_radius=8)
-        
         # 绘制暂停图标
         if not self.paused:
-            pygame.draw.rect(screen, RETRO_DARK, (info_x + 17, 22, 5, 25))
-            pygame.draw.rect(screen, RETRO_DARK, (info_x + 28, 22, 5, 25))
+            pygame.draw.rect(screen, RETRO_DARK, (INFO_X + 17, 22, 5, 25))
+            pygame.draw.rect(screen, RETRO_DARK, (INFO_X + 28, 22, 5, 25))
         else:
-            points = [(info_x + 17, 22), (info_x + 17, 47), (info_x + 37, 35)]
+            points = [(INFO_X + 17, 22), (INFO_X + 17, 47), (INFO_X + 37, 35)]
             pygame.draw.polygon(screen, RETRO_DARK, points)
-        
-        # 绘制"下一个"文字
-        if FONT_PATH:
-            font = pygame.font.Font(FONT_PATH, 20)
-        else:
-            font = pygame.font.Font(None, 24)
-        next_text = font.render("下一个", True, RETRO_DARK)
-        screen.blit(next_text, (info_x + 5, 80))
-        
-        # 修改预览框和预览方块的绘制部分
-        preview_size = 60
-        preview_rect = pygame.Rect(info_x, 110, preview_size, preview_size)
-        pygame.draw.rect(screen, RETRO_LIGHT, preview_rect, border_radius=5)
-        pygame.draw.rect(screen, RETRO_DARK, preview_rect, 2, border_radius=5)
-        
-        # 调整预览方块的位置和大小
-        if self.next_piece and not self.paused:
-            shape_width = len(self.next_piece['shape'][0]) * self.preview_block_size
-            shape_height = len(self.next_piece['shape']) * self.preview_block_size
-            next_piece_x = info_x + (preview_size - shape_width) // 2
-            next_piece_y = 110 + (preview_size - shape_height) // 2
-            self.draw_preview_piece(self.next_piece, next_piece_x, next_piece_y)
-        
-        # 绘制分数区域（调整位置）
-        score_y = 190
-        score_text = font.render("得分", True, RETRO_DARK)
-        score_value = font.render(str(self.score), True, RETRO_DARK)
-        high_score_text = font.render("最高分", True, RETRO_DARK)
-        high_score_value = font.render(str(self.high_score), True, RETRO_DARK)
-        
-        screen.blit(score_text, (info_x + 5, score_y))
-        screen.blit(score_value, (info_x + 5, score_y + 30))
-        screen.blit(high_score_text, (info_x + 5, score_y + 70))
-        screen.blit(high_score_value, (info_x + 5, score_y + 100))
-        
-        # 添加难度显示
-        difficulty_names = ["简单", "普通", "困难"]
-        difficulty_text = font.render("难度", True, RETRO_DARK)
-        difficulty_value = font.render(difficulty_names[self.difficulty], True, RETRO_DARK)
-        screen.blit(difficulty_text, (info_x + 5, score_y + 140))
-        screen.blit(difficulty_value, (info_x + 5, score_y + 170))
-        
+
+        # 绘制分数
+        self.draw_value(self.score, SCORE_Y + 30)
+        self.draw_value(self.high_score, SCORE_Y + 100)
+
         # 如果正在显示排行榜，绘制排行榜
         if self.showing_leaderboard or (self.paused and self.pause_menu.show_leaderboard):
             self.leaderboard.draw(screen)
@@ -311,126 +448,175 @@ class Tetris:
         if self.game_over:
             self.game_over_screen.draw(screen, self.score)
 
-        pygame.display.flip()
-
-    def drop_piece(self):
-        if self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y'] + 1):
-            self.current_piece['y'] += 1
+        # 记录屏幕上已经绘制的内容，供下一帧比较
+        piece = self.current_piece
+        self.shown_rows = list(self.board.rows)
+        self.shown_piece = self.piece_cells(piece, piece.y)
+        if self.game_over:
+            self.shown_ghost = set()
         else:
-            # 固定方块到网格
-            for i in range(len(self.current_piece['shape'])):
-                for j in range(len(self.current_piece['shape'][0])):
-                    if self.current_piece['shape'][i][j]:
-                        if self.current_piece['y'] + i < 0:
-                            self.game_over = True
-                            if self.score > 0:  # 只保存大于0的分数
-                                self.save_high_score()  # 先保存最高分
-                                self.leaderboard.add_score(self.score)  # 再更新排行榜
-                            return
-                        self.grid[self.current_piece['y'] + i][self.current_piece['x'] + j] = 1
-            
-            # 清除完成的行并更新分数
-            self.clear_lines()  # 移除分数更新，由 clear_lines 处理
-            
-            # 更新当前方块和下一个方块
-            self.current_piece = self.next_piece
-            self.next_piece = self.new_piece()
-            
-            # 检查游戏是否结束
-            if not self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y']):
-                self.game_over = True
-                if self.score > 0:  # 只保存大于0的分数
-                    self.save_high_score()  # 先保存最高分
-                    self.leaderboard.add_score(self.score)  # 再更新排行榜
-
-    def valid_move(self, piece, x, y):
-        # 检查移动是否有效
-        for i in range(len(piece['shape'])):
-            for j in range(len(piece['shape'][0])):
-                if piece['shape'][i][j]:
-                    if (x + j < 0 or x + j >= GRID_WIDTH or
-                        y + i >= GRID_HEIGHT or
-                        (y + i >= 0 and self.grid[y + i][x + j])):
-                        return False
-        return True
+            self.shown_ghost = self.piece_cells(piece, self.landing_y(piece)) - self.shown_piece
+        self.shown_next = self.next_piece
+        self.shown_score = self.score
+        self.shown_high_score = self.high_score
 
-    def rotate_piece(self, piece):
-        # 旋转方块
-        new_shape = list(zip(*piece['shape'][::-1]))
-        if self.valid_move({'shape': new_shape, 'x': piece['x'], 'y': piece['y']}, piece['x'], piece['y']):
-            piece['shape'] = new_shape
-
-    def clear_lines(self):
-        # 清除已完成的行
-        lines_cleared = 0
-        for i in range(GRID_HEIGHT):
-            if all(self.grid[i]):
-                lines_cleared += 1
-                del self.grid[i]
-                self.grid.insert(0, [0 for _ in range(GRID_WIDTH)])
-        
-        # 更新分数，加入难度系数
-        if lines_cleared > 0:
-            score_multiplier = self.get_score_multiplier()
-            self.score += int(lines_cleared * 100 * score_multiplier)
-            # 播放得分音效
-            try:
-                self.score_sound.play()
-            except:
-                pass
-            # 检查是否超过最高分
-            if self.score > self.high_score:
-                self.high_score = self.score
-                self.save_high_score()
-        
-        return lines_cleared
+    def draw_changes(self):
+        dirty = []
+        changed = set()
+
+        # 已固定方块中发生变化的格子
+        rows = self.board.rows
+        for y, (old, new) in enumerate(zip(self.shown_rows, rows)):
+            diff = old ^ new
+            while diff:
+                low = diff & -diff
+                changed.add((low.bit_length() - 1, y))
+                diff ^= low
+
+        # 当前方块和落点预览离开和进入的格子
+        piece = self.current_piece
+        piece_cells = self.piece_cells(piece, piece.y)
+        ghost_cells = self.piece_cells(piece, self.landing_y(piece)) - piece_cells
+        changed |= piece_cells ^ self.shown_piece
+        changed |= ghost_cells ^ self.shown_ghost
+        self.shown_rows = list(rows)
+        self.shown_piece = piece_cells
+        self.shown_ghost = ghost_cells
+
+        # 背景和方块按顺序收集起来，一次提交
+        blits = []
+        for x, y in changed:
+            dirty.append(self.draw_cell(x, y, blits))
+
+        if self.next_piece is not self.shown_next:
+            preview_rect = pygame.Rect(INFO_X, PREVIEW_Y, PREVIEW_SIZE, PREVIEW_SIZE)
+            blits.append((self.background, preview_rect, preview_rect))
+            blits += self.draw_next_piece()
+            self.shown_next = self.next_piece
+            dirty.append(preview_rect)
+        if blits:
+            screen.blits(blits, doreturn=False)
+
+        # 只有分数变化时才重新渲染文字
+        if self.score != self.shown_score:
+            dirty.append(self.draw_value(self.score, SCORE_Y + 30))
+            self.shown_score = self.score
+        if self.high_score != self.shown_high_score:
+            dirty.append(self.draw_value(self.high_score, SCORE_Y + 100))
+            self.shown_high_score = self.high_score
+        return dirty
+
+    def draw_cell(self, x, y, blits):
+        # 先用背景覆盖该格子，再按当前内容重画，返回需要更新的区域
+        rect = pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
+        blits.append((self.background, rect, rect))
+        if (self.board.rows[y] >> x) & 1 or (x, y) in self.shown_piece:
+            blits += self.tiles().cells('block', [(x, y)])
+        elif (x, y) in self.shown_ghost:
+            blits += self.tiles().cells('ghost', [(x, y)])
+        return rect
+
+    def draw_profile(self):
+        # 最近每帧一根竖线（不含等待时间），横线标出 p50/p95/p99，左上角是 p99 的毫秒数
+        rect = PROFILE_RECT
+        screen.blit(self.background, rect, rect)
+        pygame.draw.rect(screen, RETRO_DARK, rect, 1)
+        scale = (rect.height - 2) / PROFILE_SCALE_MS
+        bottom = rect.bottom - 2
+        frames = profiler.recent(rect.width - 2)
+        x = rect.right - 1 - len(frames)
+        for i, frame in enumerate(frames):
+            height = min(rect.height - 2, int(frame.work / 1e6 * scale))
+            if height:
+                pygame.draw.line(screen, RETRO_DARK, (x + i, bottom), (x + i, bottom - height + 1))
+        values = profiler.percentiles()
+        for p in PERCENTILES:
+            y = bottom - min(rect.height - 3, int(values[p] * scale))
+            pygame.draw.line(screen, PROFILE_COLORS[p], (rect.left + 1, y), (rect.right - 2, y))
+        screen.blit(fonts.render(f"{values[99]:.1f}", 'hint', RETRO_DARK), (rect.left + 2, rect.top + 1))
+        return rect
+
+    def draw_next_piece(self):
+        next_state = self.piece_state(self.next_piece)
+        shape_width = next_state.width * self.preview_block_size
+        shape_height = next_state.height * self.preview_block_size
+        next_piece_x = INFO_X + (PREVIEW_SIZE - shape_width) // 2
+        next_piece_y = PREVIEW_Y + (PREVIEW_SIZE - shape_height) // 2
+        return self.draw_preview_piece(self.next_piece, next_piece_x, next_piece_y)
+
+    def draw_value(self, value, y):
+        # 清除旧的数字并绘制新的数字，返回需要更新的区域
+        rect = pygame.Rect(INFO_X + 5, y, SCREEN_WIDTH - INFO_X - 5, fonts.get('normal').get_height())
+        screen.blit(self.background, rect, rect)
+        screen.blit(fonts.render(str(value), 'normal', RETRO_DARK), (INFO_X + 5, y))
+        return rect
 
     def handle_pause_menu(self, action, menu):
         if action == 0:  # 继续
             self.paused = False
         elif action == 1:  # 重玩
-            self.__init__(difficulty=self.difficulty)
+            self.save_game()
+            self.__init__(difficulty=self.difficulty, leaderboard=self.leaderboard)
         elif action == 2:  # 排行榜
             self.pause_menu.show_leaderboard = True
         elif action == "toggle_music":  # 音乐控制
             menu.music_on = not menu.music_on
-            try:
-                if menu.music_on:
-                    pygame.mixer.music.rewind()  # 重置音乐到开始位置
-                    pygame.mixer.music.play(-1)  # 重新开始播放
-                else:
-                    pygame.mixer.music.pause()
-            except:
-                print("无法控制音乐")
+            audio.set_music(menu.music_on)
             return None  # 返回 None 表示不关闭暂停菜单
         elif action == 4:  # 返回首页
+            self.save_game()
             return True
         return False
 
-    def get_initial_fall_speed(self):
-        # 根据难度回不同的初始速度
-        speeds = {
-            0: 0.8,  # 简单
-            1: 0.5,  # 普通
-            2: 0.3   # 困难
-        }
-        return speeds[self.difficulty]
-    
-    def get_score_multiplier(self):
-        # 根据难度返回不同的得分倍数
-        multipliers = {
-            0: 1,    # 简单
-            1: 1.5,  # 普通
-            2: 2     # 困难
-        }
-        return multipliers[self.difficulty]
+class DemoGame(Tetris):
+    # 主菜单空闲时的演示局：AutoPlayer 为每个方块选好 (旋转状态, 列)，每 DEMO_INPUT_MS 毫秒按一次键
+    # 旋转、平移到目标列后硬降，重力照常作用；不播放音效、不记分数、不保存回放
+    def __init__(self, difficulty, *, leaderboard):
+        super().__init__(difficulty, leaderboard=leaderboard)
+        self.player = AutoPlayer()
+        self.planned = None  # 已经规划过的方块
+        self.actions = []
+        self.last_input = self.timer.clock()
+
+    def plan(self):
+        # 当前方块换了（硬降或被重力固定）就重新规划这个方块的按键
+        piece = self.current_piece
+        self.planned = piece
+        move = self.player.choose(self)
+        if move is None:
+            self.actions = [HARD_DROP]
+            return
+        rotation, x = move
+        shift = [RIGHT] * (x - piece.x) if x > piece.x else [LEFT] * (piece.x - x)
+        self.actions = [ROTATE] * ((rotation - piece.rotation) % ROTATIONS) + shift + [HARD_DROP]
+
+    def time_until_input(self):
+        return max(1, self.last_input + DEMO_INPUT_MS - self.timer.clock())
+
+    def update(self):
+        # 到了按键时间就执行下一个操作，返回是否执行了
+        now = self.timer.clock()
+        if self.game_over or now - self.last_input < DEMO_INPUT_MS:
+            return False
+        self.last_input = now
+        if self.current_piece is not self.planned:
+            self.plan()
+        apply_action(self, self.actions.pop(0))
+        return True
+
+    def on_lines_cleared(self, cleared_rows):
+        pass
+
+    def save_game(self):
+        pass
+
+    def draw_full(self):
+        super().draw_full()
+        screen.blit(fonts.render("演示", 'normal', RETRO_DARK), (INFO_X + 5, SCREEN_HEIGHT - 60))
+        screen.blit(fonts.render("按任意键返回", 'hint', RETRO_DARK), (INFO_X + 5, SCREEN_HEIGHT - 30))
 
 class PauseMenu:
     def __init__(self):
-        if FONT_PATH:
-            self.font = pygame.font.Font(FONT_PATH, 20)
-        else:
-            self.font = pygame.font.Font(None, 24)
         self.selected = 0
         self.options = [
             ("继续", "►"),
@@ -443,10 +629,7 @@ class PauseMenu:
     
     def draw(self, screen):
         # 创建半透明的背景
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.fill(RETRO_GREEN)
-        overlay.set_alpha(180)
-        screen.blit(overlay, (0, 0))
+        screen.blit(overlays.dimmer(screen), (0, 0))
         
         if self.show_leaderboard:
             # 显示排行榜界面
@@ -460,9 +643,8 @@ class PauseMenu:
         menu_y = SCREEN_HEIGHT // 2 - menu_height // 2
         
         # 绘制菜单背景
-        menu_rect = pygame.Rect(menu_x, menu_y, menu_width, menu_height)
-        pygame.draw.rect(screen, RETRO_LIGHT, menu_rect, border_radius=8)
-        pygame.draw.rect(screen, RETRO_DARK, menu_rect, 2, border_radius=8)
+        screen.blit(overlays.panel(screen, menu_width, menu_height, RETRO_LIGHT, RETRO_DARK, 8),
+                    (menu_x, menu_y))
         
         # 调整按钮参数
         button_height = 35  # 增加按钮高度
@@ -477,17 +659,15 @@ class PauseMenu:
                 button_height
             )
             
-            # 如果是选中的选项，绘制深色背景
-            if i == self.selected:
-                pygame.draw.rect(screen, RETRO_DARK, button_rect, border_radius=5)
-            
-            # 绘制按钮边框
-            pygame.draw.rect(screen, RETRO_DARK, button_rect, 2, border_radius=5)
+            # 选中的选项使用深色背景，其余只绘制边框
+            fill = RETRO_DARK if i == self.selected else None
+            button = overlays.panel(screen, button_rect.width, button_rect.height, fill, RETRO_DARK, 5)
+            screen.blit(button, button_rect)
             
             # 绘制文字和图标
             color = WHITE if i == self.selected else RETRO_DARK
-            text_surface = self.font.render(text, True, color)
-            icon_surface = self.font.render(icon, True, color)
+            text_surface = fonts.render(text, 'normal', color)
+            icon_surface = fonts.render(icon, 'normal', color)
             
             # 调整文字和图标位置
             text_x = button_rect.left + 30
@@ -516,54 +696,45 @@ class PauseMenu:
         return None
 
 class Leaderboard:
-    def __init__(self):
-        if FONT_PATH:
-            self.font = pygame.font.Font(FONT_PATH, 20)
-        else:
-            self.font = pygame.font.Font(None, 24)
-        self.scores = self.load_scores()
-    
-    def load_scores(self):
-        try:
-            with open('scores.txt', 'r') as f:
-                scores = [int(line.strip()) for line in f.readlines() if line.strip()]
-                # 确保至少有5个分数
-                while len(scores) < 5:
-                    scores.append(0)
-                return sorted(scores, reverse=True)[:5]  # 只保留前5个最高分
-        except FileNotFoundError:
-            # 如果文件不存在，创建文件并返回初始分数列表
-            with open('scores.txt', 'w') as f:
-                f.write('0\n' * 5)
-            return [0] * 5
+    # 显示前5名；所有分数保存在 SQLite 数据库中（见 storage.py）
+    # 数据库只在启动时读一次，之后由后台线程写入，游戏循环中不访问磁盘
+    def __init__(self, path=DATABASE):
+        self.scores = self.load_scores(path)
+        self.writer = ScoreWriter(path)
     
-    def save_scores(self):
+    def load_scores(self, path):
+        # 数据库打不开（只读、被锁定）时照常游戏，排行榜显示为空
         try:
-            with open('scores.txt', 'w') as f:
-                # 确保只保存非零分数
-                scores_to_save = [score for score in self.scores if score > 0]
-                # 如果没有非零分数，至少保存一个0
-                if not scores_to_save:
-                    scores_to_save = [0]
-                for score in scores_to_save:
-                    f.write(f"{score}\n")
-        except Exception as e:
-            print(f"Error saving scores: {e}")
+            with ScoreStore(path) as store:
+                scores = store.top(5)
+        except (sqlite3.Error, OSError) as e:
+            print(f"无法读取分数数据库 {path}: {e}")
+            scores = []
+        # 不足5个时用0补齐
+        return scores + [0] * (5 - len(scores))
+
+    def new_game(self):
+        return self.writer.new_key()
+
+    def update_high_score(self, key, score, difficulty):
+        self.writer.update(key, score, difficulty)
     
-    def add_score(self, score):
+    def add_score(self, score, difficulty=None, key=None):
         if score > 0:  # 只添加大于0的分数
-            # 检查是否已经存在相同的数
-            if score not in self.scores:
-                self.scores.append(score)
-                self.scores = sorted(self.scores, reverse=True)[:5]  # 保持前5个最高分
-                self.save_scores()  # 立即保存分数
+            self.writer.submit(self.new_game() if key is None else key, score, difficulty)
+            # 显示的前5名直接在内存中更新
+            self.scores = sorted(self.scores + [score], reverse=True)[:5]
+
+    def save_replay(self, replay, path):
+        self.writer.save_replay(replay, path)
+
+    def close(self):
+        # 退出前写完队列中的所有分数
+        self.writer.close()
     
     def draw(self, screen):
         # 创建半透明背景
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.fill(RETRO_GREEN)
-        overlay.set_alpha(180)
-        screen.blit(overlay, (0, 0))
+        screen.blit(overlays.dimmer(screen), (0, 0))
         
         # 调整排行榜面板尺寸
         panel_width = 140  # 保持宽度
@@ -572,12 +743,11 @@ class Leaderboard:
         panel_y = SCREEN_HEIGHT // 2 - panel_height // 2
         
         # 绘制面板背景
-        panel_rect = pygame.Rect(panel_x, panel_y, panel_width, panel_height)
-        pygame.draw.rect(screen, RETRO_LIGHT, panel_rect, border_radius=8)
-        pygame.draw.rect(screen, RETRO_DARK, panel_rect, 2, border_radius=8)
+        screen.blit(overlays.panel(screen, panel_width, panel_height, RETRO_LIGHT, RETRO_DARK, 8),
+                    (panel_x, panel_y))
         
         # 绘制标题
-        title = self.font.render("排行榜", True, RETRO_DARK)
+        title = fonts.render("排行榜", 'normal', RETRO_DARK)
         title_x = panel_x + (panel_width - title.get_width()) // 2
         screen.blit(title, (title_x, panel_y + 25))
         
@@ -594,13 +764,14 @@ class Leaderboard:
                 panel_width - 20,
                 button_height
             )
-            pygame.draw.rect(screen, RETRO_LIGHT, button_rect, border_radius=5)
-            pygame.draw.rect(screen, RETRO_DARK, button_rect, 2, border_radius=5)
+            button = overlays.panel(screen, button_rect.width, button_rect.height,
+                                    RETRO_LIGHT, RETRO_DARK, 5)
+            screen.blit(button, button_rect)
             
             # 绘制排名和分数
             rank_text = f"#{i + 1}"
-            rank = self.font.render(rank_text, True, RETRO_DARK)
-            score_text = self.font.render(str(score), True, RETRO_DARK)
+            rank = fonts.render(rank_text, 'normal', RETRO_DARK)
+            score_text = fonts.render(str(score), 'normal', RETRO_DARK)
             
             # 调整排名和分数的位置
             rank_x = button_rect.left + 10
@@ -617,20 +788,13 @@ class Leaderboard:
         bottom_margin = remaining_space // 2
         
         # 绘制"按任意键返回"文字
-        hint_font = pygame.font.Font(FONT_PATH, 14) if FONT_PATH else pygame.font.Font(None, 16)
-        hint = hint_font.render("按任意键返回", True, RETRO_DARK)
+        hint = fonts.render("按任意键返回", 'hint', RETRO_DARK)
         hint_x = panel_x + (panel_width - hint.get_width()) // 2
         hint_y = last_button_bottom + bottom_margin - hint.get_height() // 2
         screen.blit(hint, (hint_x, hint_y))
 
 class GameOverScreen:
     def __init__(self, leaderboard):
-        if FONT_PATH:
-            self.font_title = pygame.font.Font(FONT_PATH, 24)
-            self.font = pygame.font.Font(FONT_PATH, 20)  # 用于按钮文字
-        else:
-            self.font_title = pygame.font.Font(None, 32)
-            self.font = pygame.font.Font(None, 24)
         self.leaderboard = leaderboard
         self.selected = 0
         self.options = [
@@ -642,10 +806,7 @@ class GameOverScreen:
     
     def draw(self, screen, current_score):
         # 创建半透明背景
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.fill(RETRO_GREEN)
-        overlay.set_alpha(180)
-        screen.blit(overlay, (0, 0))
+        screen.blit(overlays.dimmer(screen), (0, 0))
         
         if self.show_leaderboard:
             # 显示排行榜界面
@@ -659,17 +820,16 @@ class GameOverScreen:
         dialog_y = SCREEN_HEIGHT // 2 - dialog_height // 2
         
         # 绘制对话框背景
-        dialog_rect = pygame.Rect(dialog_x, dialog_y, dialog_width, dialog_height)
-        pygame.draw.rect(screen, RETRO_LIGHT, dialog_rect, border_radius=8)
-        pygame.draw.rect(screen, RETRO_DARK, dialog_rect, 2, border_radius=8)
+        screen.blit(overlays.panel(screen, dialog_width, dialog_height, RETRO_LIGHT, RETRO_DARK, 8),
+                    (dialog_x, dialog_y))
         
         # 绘制标题
-        title = self.font_title.render("游戏结束", True, RETRO_DARK)
+        title = fonts.render("游戏结束", 'title', RETRO_DARK)
         title_x = dialog_x + (dialog_width - title.get_width()) // 2
         screen.blit(title, (title_x, dialog_y + 20))
         
         # 绘制分数
-        score_text = self.font.render(f"最终得分: {current_score}", True, RETRO_DARK)
+        score_text = fonts.render(f"最终得分: {current_score}", 'normal', RETRO_DARK)
         score_x = dialog_x + (dialog_width - score_text.get_width()) // 2
         screen.blit(score_text, (score_x, dialog_y + 60))
         
@@ -686,17 +846,15 @@ class GameOverScreen:
                 button_height
             )
             
-            # 如果是选中的选项，绘制深色背景
-            if i == self.selected:
-                pygame.draw.rect(screen, RETRO_DARK, button_rect, border_radius=5)
-            
-            # 绘制按钮边框
-            pygame.draw.rect(screen, RETRO_DARK, button_rect, 2, border_radius=5)
+            # 选中的选项使用深色背景，其余只绘制边框
+            fill = RETRO_DARK if i == self.selected else None
+            button = overlays.panel(screen, button_rect.width, button_rect.height, fill, RETRO_DARK, 5)
+            screen.blit(button, button_rect)
             
             # 绘制文字和图标
             color = WHITE if i == self.selected else RETRO_DARK
-            text_surface = self.font.render(text, True, color)
-            icon_surface = self.font.render(icon, True, color)
+            text_surface = fonts.render(text, 'normal', color)
+            icon_surface = fonts.render(icon, 'normal', color)
             
             # 调整文字和图标位置
             text_x = button_rect.left + 30
@@ -730,40 +888,104 @@ class GameOverScreen:
                 return "menu"
         return None
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='俄罗斯方块')
+    parser.add_argument('--profile', action='store_true', help='统计每帧各阶段耗时并显示耗时图')
+    parser.add_argument('--profile-output', help='退出时导出帧耗时（.json 为 Chrome trace，其它为 CSV），隐含 --profile')
+    args = parser.parse_args(argv)
+    profiler.enabled = args.profile or bool(args.profile_output)
+
+    init_display()
+    audio.start()  # 音效文件在后台读取，同时显示主菜单
     menu = Menu()
+    # 在进入主循环之前打开分数数据库（必要时导入旧文件）并读出排行榜，循环中不再访问磁盘
+    leaderboard = Leaderboard()
+    first_frame = None  # 启动到第一帧显示的秒数
     game = None
+    demo = None  # 主菜单空闲时的演示局
+    idle_since = monotonic_ms()  # 最近一次按键的时间，用于进入演示
     in_menu = True
+    needs_redraw = True
+    quitting = False
     
     while True:
-        if in_menu:
-            menu.draw(screen)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-                if menu.handle_input(event):
-                    in_menu = False
-                    game = Tetris(difficulty=menu.difficulty)  # 传入难度参数
+        profiler.begin_frame()
+        # 只在状态变化后重绘画面
+        if needs_redraw:
+            with profiler.phase('draw'):
+                if demo:
+                    demo.draw()
+                elif in_menu:
+                    menu.draw(screen)
+                else:
+                    game.draw()
+            needs_redraw = False
+            if first_frame is None:
+                first_frame = time.perf_counter() - STARTED
+                # 第一帧已经显示，趁玩家还在看菜单准备音效，游戏中播放时不再初始化
+                with profiler.phase('audio'):
+                    audio.prepare()
+
+        # 没有需要更新的内容时阻塞等待事件；游戏进行中最多等到下一次下落，
+        # 主菜单最多等到进入演示，演示中最多等到下一次按键或下落
+        if demo:
+            timeout = max(1, min(demo.time_until_input(), demo.timer.time_until_drop(demo)))
+        elif in_menu:
+            timeout = max(1, idle_since + ATTRACT_DELAY_MS - monotonic_ms())
+        elif game.game_over or game.paused:
+            timeout = 0  # 0 表示一直等待
         else:
-            # 只在非暂停且游戏未结束时更新方块位置
-            if not game.game_over and not game.paused:
-                current_time = pygame.time.get_ticks()
-                if current_time - game.fall_time > game.fall_speed * 1000:
-                    game.drop_piece()
-                    game.fall_time = current_time
-
-            for event in pygame.event.get():
+            timeout = max(1, game.timer.time_until_drop(game))
+        with profiler.phase('wait'):
+            events = [pygame.event.wait(timeout)] + pygame.event.get()
+
+        # 先把重力推进到当前时间，再处理输入；可能一次补上多行
+        with profiler.phase('gravity'):
+            if demo:
+                drops = demo.timer.update(demo)
+                if demo.update() or drops:
+                    needs_redraw = True
+            elif not in_menu and game.timer.update(game):
+                needs_redraw = True
+
+        with profiler.phase('events'):
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-                
+                    # 先离开 events 阶段，保存、结束本帧和导出都在它之外进行
+                    quitting = True
+                    break
+
+                # 窗口被遮挡后重新显示时需要整屏重绘
+                if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                    for shown in (game, demo):
+                        if shown:
+                            shown.full_redraw = True
+                    needs_redraw = True
+
                 if event.type == pygame.KEYDOWN:
+                    idle_since = monotonic_ms()
+
+                if demo:
+                    # 演示中按任意键回到主菜单，这次按键不做其它操作
+                    if event.type == pygame.KEYDOWN:
+                        demo = None
+                        needs_redraw = True
+                    continue
+
+                if in_menu:
+                    if event.type == pygame.KEYDOWN:
+                        needs_redraw = True
+                    if menu.handle_input(event):
+                        in_menu = False
+                        game = Tetris(difficulty=menu.difficulty, leaderboard=leaderboard)  # 传入难度参数
+                    continue
+
+                if event.type == pygame.KEYDOWN:
+                    needs_redraw = True
                     if game.game_over:
                         action = game.game_over_screen.handle_input(event)
                         if action == "restart":
-                            game = Tetris(difficulty=menu.difficulty)
-                            game.fall_speed = 0.5 / menu.difficulty
+                            game = Tetris(difficulty=menu.difficulty, leaderboard=leaderboard)
                         elif action == "menu":  # 只在明确返回菜单时返回
                             in_menu = True
                             game = None
@@ -772,11 +994,9 @@ def main():
                         game.paused = False
                     elif event.key == pygame.K_ESCAPE:
                         in_menu = True
-                        game.leaderboard.add_score(game.score)  # 保存当前分数
+                        game.save_game()  # 保存当前分数和回放
                     elif event.key == pygame.K_p:
                         game.paused = not game.paused
-                        if game.paused:
-                            game.fall_time = pygame.time.get_ticks()
                     elif game.paused:
                         if game.pause_menu.show_leaderboard:
                             game.pause_menu.show_leaderboard = False
@@ -788,25 +1008,38 @@ def main():
                                     game = None
                     # 只在非暂停且游戏未结束时响应游戏控制
                     elif not game.game_over and not game.paused:
-                        if event.key == pygame.K_LEFT:
-                            if game.valid_move(game.current_piece, game.current_piece['x'] - 1, game.current_piece['y']):
-                                game.current_piece['x'] -= 1
-                        elif event.key == pygame.K_RIGHT:
-                            if game.valid_move(game.current_piece, game.current_piece['x'] + 1, game.current_piece['y']):
-                                game.current_piece['x'] += 1
-                        elif event.key == pygame.K_DOWN:
-                            game.drop_piece()
-                        elif event.key == pygame.K_UP:
-                            game.rotate_piece(game.current_piece)
-                        elif event.key == pygame.K_SPACE:
-                            while game.valid_move(game.current_piece, game.current_piece['x'], game.current_piece['y'] + 1):
-                                game.current_piece['y'] += 1
-                            game.drop_piece()
-
-            # 无论是否暂停都需要绘制画面
-            if not in_menu:
-                game.draw()
-                game.clock.tick(60)
+                        action = KEY_ACTIONS.get(event.key)
+                        if action is not None:
+                            game.apply_action(action)
+
+        if quitting:
+            if game:
+                game.save_game()
+            with profiler.phase('save'):
+                leaderboard.close()
+            profiler.end_frame()
+            audio.close()
+            pygame.quit()
+            if profiler.enabled:
+                print(f"启动到第一帧 {first_frame * 1000:.1f} ms，音频 {audio.stats()}，字体 {fonts.stats()}")
+                profiler.print_summary()
+            if args.profile_output:
+                profiler.dump(args.profile_output)
+            return
+
+        # 主菜单无人操作 ATTRACT_DELAY_MS 后开始演示，演示结束后回到主菜单重新计时
+        if demo and demo.game_over:
+            demo = None
+            idle_since = monotonic_ms()
+            needs_redraw = True
+        elif in_menu and not demo and monotonic_ms() - idle_since >= ATTRACT_DELAY_MS:
+            demo = DemoGame(menu.difficulty, leaderboard=leaderboard)
+            needs_redraw = True
+
+        # 只在非暂停且游戏未结束时推进游戏时间
+        if not in_menu:
+            game.timer.set_running(not game.game_over and not game.paused)
+        profiler.end_frame()
 
 if __name__ == '__main__':
     main()